@@ -5,7 +5,9 @@ This module contains the agent implementation that orchestrates tools and servic
 """
 
 from .router_agent import RouterAgent
+from .memory import ConversationMemory
 
 __all__ = [
-    'RouterAgent'
+    'RouterAgent',
+    'ConversationMemory'
 ]
@@ -0,0 +1,192 @@
+"""
+Agent executor that runs independent tool calls from one step concurrently.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentStep
+from utils.deadline import DeadlineExceeded, bind_script_context, current_deadline, remaining_timeout, run_with_deadline
+from utils.metrics import metrics
+from utils.tracing import create_span
+
+# Tools that must not run concurrently with themselves (Slack posting stays ordered)
+DEFAULT_TOOL_CONCURRENCY_LIMITS = {"slack_tool": 1}
+
+_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_semaphores_lock = threading.Lock()
+
+# Tool calls planned in the current step, tracked per agent thread
+_step_state = threading.local()
+
+
+class ToolTimeout(str):
+    """Observation recorded for a tool call that was cancelled at its deadline."""
+
+
+def _tool_semaphore(tool_name: str, limits: Dict[str, int]) -> Optional[threading.BoundedSemaphore]:
+    """Get the process-wide semaphore enforcing a tool's concurrency limit."""
+    limit = limits.get(tool_name)
+    if not limit:
+        return None
+    with _semaphores_lock:
+        if tool_name not in _semaphores:
+            _semaphores[tool_name] = threading.BoundedSemaphore(limit)
+        return _semaphores[tool_name]
+
+
+def acquire_tool_slot(tool_name: str, limits: Dict[str, int] = None) -> Tuple[float, Callable[[], None]]:
+    """
+    Wait for a concurrency slot for a tool.
+
+    Args:
+        tool_name: Name of the tool
+        limits: Per-tool concurrency limits (defaults to DEFAULT_TOOL_CONCURRENCY_LIMITS)
+
+    Returns:
+        Seconds spent waiting for the slot, and a function that releases it
+        (safe to call more than once)
+
+    Raises:
+        DeadlineExceeded: If the current deadline passes before a slot frees up
+    """
+    semaphore = _tool_semaphore(tool_name, DEFAULT_TOOL_CONCURRENCY_LIMITS if limits is None else limits)
+    started = time.perf_counter()
+    if semaphore is None:
+        return time.perf_counter() - started, lambda: None
+    operation = f"tool:{tool_name}"
+    if not semaphore.acquire(timeout=remaining_timeout(operation=operation)):
+        metrics.increment("deadline.timeouts", operation=operation)
+        raise DeadlineExceeded(f"{operation} found no free slot before the deadline")
+    waited = time.perf_counter() - started
+    released = threading.Event()
+    release_lock = threading.Lock()
+
+    def release():
+        with release_lock:
+            if not released.is_set():
+                released.set()
+                semaphore.release()
+
+    return waited, release
+
+
+@contextmanager
+def tool_slot(tool_name: str, limits: Dict[str, int] = None):
+    """
+    Hold a concurrency slot for a tool while it runs.
+
+    Args:
+        tool_name: Name of the tool
+        limits: Per-tool concurrency limits (defaults to DEFAULT_TOOL_CONCURRENCY_LIMITS)
+
+    Yields:
+        Seconds spent waiting for the slot
+    """
+    waited, release = acquire_tool_slot(tool_name, limits)
+    try:
+        yield waited
+    finally:
+        release()
+
+
+class ConcurrentAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor that executes the tool calls of a single agent step
+    concurrently on a bounded thread pool.
+
+    Steps with a single tool call behave exactly like AgentExecutor.
+    """
+
+    max_concurrency: int = 4
+    """Maximum number of tool calls from one step that run at the same time."""
+
+    tool_concurrency_limits: Dict[str, int] = DEFAULT_TOOL_CONCURRENCY_LIMITS
+    """Process-wide concurrency limit per tool name."""
+
+    tool_timeout_s: Optional[float] = None
+    """Maximum seconds a single tool call may take (also bounded by the request deadline)."""
+
+    def _should_continue(self, iterations: int, time_elapsed: float) -> bool:
+        """Stop planning further steps once the request deadline has passed."""
+        deadline = current_deadline()
+        if deadline is not None and deadline.expired():
+            return False
+        return super()._should_continue(iterations, time_elapsed)
+
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        """Take a single step, recording the planned tool calls so they can run concurrently."""
+        step = {"actions": [], "futures": None}
+        previous = getattr(_step_state, "step", None)
+        _step_state.step = step
+        try:
+            for item in super()._iter_next_step(
+                name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager
+            ):
+                if isinstance(item, AgentAction):
+                    step["actions"].append(item)
+                yield item
+        finally:
+            _step_state.step = previous
+
+    def _perform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        """Run a tool call, launching all calls of the current step together on first use."""
+        step = getattr(_step_state, "step", None)
+        actions = step["actions"] if step else []
+        if len(actions) < 2 or not any(action is agent_action for action in actions):
+            return self._run_tool_call(name_to_tool_map, color_mapping, agent_action, run_manager, 1)
+
+        if step["futures"] is None:
+            pool = ThreadPoolExecutor(
+                max_workers=min(self.max_concurrency, len(actions)),
+                thread_name_prefix="agent-tool"
+            )
+            step["futures"] = {
+                id(action): pool.submit(
+                    # Each call gets its own copy of the context so spans nest under this step
+                    contextvars.copy_context().run,
+                    bind_script_context(self._run_tool_call), name_to_tool_map, color_mapping, action, run_manager, len(actions)
+                )
+                for action in actions
+            }
+            pool.shutdown(wait=False)
+
+        return step["futures"][id(agent_action)].result()
+
+    def _run_tool_call(self, name_to_tool_map, color_mapping, agent_action, run_manager, batch_size: int):
+        """Run one tool call under its concurrency limit inside a timed span."""
+        with create_span("tool_call", {
+            "tool": agent_action.tool,
+            "parallel_batch_size": batch_size
+        }) as span:
+            waited = 0.0
+            started = time.perf_counter()
+            try:
+                # An abandoned call keeps its slot until its thread finishes, so limits hold
+                waited, release = acquire_tool_slot(agent_action.tool, self.tool_concurrency_limits)
+                started = time.perf_counter()
+                agent_step = run_with_deadline(
+                    AgentExecutor._perform_agent_action,
+                    self, name_to_tool_map, color_mapping, agent_action, run_manager,
+                    timeout=self.tool_timeout_s,
+                    operation=f"tool:{agent_action.tool}",
+                    on_finish=release
+                )
+            except DeadlineExceeded as e:
+                span.set_attribute("timed_out", True)
+                metrics.increment("tool.timeouts", tool=agent_action.tool)
+                agent_step = AgentStep(
+                    action=agent_action,
+                    observation=ToolTimeout(f"The {agent_action.tool} call timed out and was cancelled ({str(e)}).")
+                )
+            duration = time.perf_counter() - started
+
+            span.set_attribute("queue_wait_s", waited)
+            span.set_attribute("duration_s", duration)
+            metrics.observe("tool.queue_wait_s", waited, tool=agent_action.tool)
+            metrics.observe("tool.duration_s", duration, tool=agent_action.tool)
+            return agent_step
@@ -0,0 +1,256 @@
+"""
+Deterministic fast-path router that dispatches obvious intents
+directly to a tool, skipping the LLM planning call.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from agents.prompts.routing import ROUTING_EXAMPLES, SLACK_SHARE_KEYWORDS, SCRAPE_KEYWORDS
+
+URL_PATTERN = re.compile(r"https?://[^\s<>\"']+", re.IGNORECASE)
+
+# An imperative request to share to Slack: a share verb first, Slack as the destination
+SLACK_SHARE_PATTERN = re.compile(
+    r"^(?:(?:please|pls|ok|okay|now|and|then)[,\s]+)*(?:" + "|".join(map(re.escape, SLACK_SHARE_KEYWORDS)) + r")\b"
+    r".*\b(?:to|in|on|into|via|with)\b.*\bslack\b",
+    re.IGNORECASE | re.DOTALL
+)
+
+# An imperative request to scrape a page: a scrape keyword first
+SCRAPE_COMMAND_PATTERN = re.compile(
+    r"^(?:(?:please|pls|ok|okay|now|and|then)[,\s]+)*(?:" + "|".join(map(re.escape, SCRAPE_KEYWORDS)) + r")\b",
+    re.IGNORECASE
+)
+
+# Characters trimmed from the end of a URL found in text
+URL_TRAILING_PUNCTUATION = ".,;:!?)]}'\""
+
+# Words that open a question rather than a command
+QUESTION_WORDS = {
+    "what", "why", "how", "who", "when", "where", "which", "did", "do", "does", "is", "are", "was",
+    "were", "has", "have", "had", "should", "will", "would", "can", "could",
+}
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "at", "by", "from",
+    "is", "are", "was", "were", "be", "it", "this", "that", "these", "those", "me", "my", "our",
+    "we", "us", "you", "your", "i", "can", "could", "would", "please", "do", "does", "what",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase word tokens, ignoring URLs and stopwords.
+
+    Args:
+        text: The text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    text = URL_PATTERN.sub(" ", text.lower())
+    return [token for token in re.findall(r"[a-z0-9]+", text) if token not in STOPWORDS]
+
+
+class IntentClassifier:
+    """
+    Small TF-IDF nearest-centroid classifier over example requests.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]]):
+        """
+        Train the classifier.
+
+        Args:
+            examples: Mapping of label to example texts
+        """
+        documents = [(label, tokenize(text)) for label, texts in examples.items() for text in texts]
+        document_frequency = Counter(token for _, tokens in documents for token in set(tokens))
+        total = len(documents)
+        self.idf = {
+            token: math.log((1 + total) / (1 + count)) + 1
+            for token, count in document_frequency.items()
+        }
+
+        centroids: Dict[str, Counter] = {}
+        for label, tokens in documents:
+            centroid = centroids.setdefault(label, Counter())
+            for token, weight in self._vectorize(tokens).items():
+                centroid[token] += weight
+        self.centroids = {label: self._normalize(vector) for label, vector in centroids.items()}
+
+    @staticmethod
+    def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if norm == 0:
+            return {}
+        return {token: value / norm for token, value in vector.items()}
+
+    def _vectorize(self, tokens: List[str]) -> Dict[str, float]:
+        counts = Counter(token for token in tokens if token in self.idf)
+        return self._normalize({token: count * self.idf[token] for token, count in counts.items()})
+
+    def predict(self, text: str) -> Tuple[Optional[str], float, float]:
+        """
+        Predict the label of a text.
+
+        Args:
+            text: The text to classify
+
+        Returns:
+            Tuple of (best label, cosine similarity, margin over the runner-up)
+        """
+        vector = self._vectorize(tokenize(text))
+        if not vector:
+            return None, 0.0, 0.0
+
+        scores = sorted(
+            (
+                (sum(weight * centroid.get(token, 0.0) for token, weight in vector.items()), label)
+                for label, centroid in self.centroids.items()
+            ),
+            reverse=True
+        )
+        best_score, best_label = scores[0]
+        runner_up = scores[1][0] if len(scores) > 1 else 0.0
+        return best_label, best_score, best_score - runner_up
+
+
+class FastPathRouter:
+    """
+    Routes high-confidence intents directly to a tool.
+
+    Keyword rules handle URLs and Slack sharing; a local intent classifier
+    handles positioning and knowledge-base questions. Anything uncertain is
+    left to the LLM agent.
+    """
+
+    def __init__(self, tools, examples: Optional[Dict[str, List[str]]] = None,
+                 min_confidence: float = 0.35, min_margin: float = 0.15):
+        """
+        Initialize the fast-path router.
+
+        Args:
+            tools: Tools available for direct dispatch
+            examples: Optional labelled examples (defaults to ROUTING_EXAMPLES; the
+                tool-calling eval questions are held out so the eval stays honest)
+            min_confidence: Minimum classifier similarity to dispatch directly
+            min_margin: Minimum similarity margin over the runner-up label
+        """
+        self.tools = {tool.name: tool for tool in tools}
+        self.classifier = IntentClassifier(examples or ROUTING_EXAMPLES)
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+
+    def config(self) -> Dict[str, Any]:
+        """
+        Describe the rules and thresholds that decide routes (e.g. for eval caching).
+
+        Returns:
+            Dictionary of the keyword rules, classifier thresholds and a digest
+            of the classifier's vocabulary
+        """
+        return {
+            "slack_share_keywords": SLACK_SHARE_KEYWORDS,
+            "slack_share_pattern": SLACK_SHARE_PATTERN.pattern,
+            "question_words": sorted(QUESTION_WORDS),
+            "scrape_keywords": SCRAPE_KEYWORDS,
+            "scrape_command_pattern": SCRAPE_COMMAND_PATTERN.pattern,
+            "stopwords": sorted(STOPWORDS),
+            "min_confidence": self.min_confidence,
+            "min_margin": self.min_margin,
+            "classifier_idf": sorted(self.classifier.idf.items()),
+        }
+
+    def route(self, user_input: str, chat_history: List = None,
+              last_assistant_message: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Decide whether a request can skip the planning call.
+
+        Args:
+            user_input: The user's input
+            chat_history: Optional chat history (used to find content to share)
+            last_assistant_message: Optional full text of the last answer, if
+                the chat history only holds a preview of it
+
+        Returns:
+            Dictionary with tool, tool_input, reason and confidence,
+            or None if the agent should plan the request
+        """
+        text = user_input.lower()
+        urls = self._find_urls(user_input)
+        mentions_slack = re.search(r"\bslack\b", text) is not None
+        slack_intent = mentions_slack and self._is_share_command(user_input)
+
+        if slack_intent and not urls and "slack_tool" in self.tools:
+            content = last_assistant_message or self._last_assistant_message(chat_history or [])
+            if content:
+                return self._decision("slack_tool", content, "rule:slack_share", 1.0)
+            return None
+
+        if len(urls) == 1 and not mentions_slack and "scraping_tool" in self.tools:
+            # Only a bare URL or a scrape command; questions about a URL need the agent
+            if user_input.strip().rstrip(URL_TRAILING_PUNCTUATION) == urls[0]:
+                return self._decision("scraping_tool", urls[0], "rule:url_only", 1.0)
+            if self._is_scrape_command(user_input):
+                return self._decision("scraping_tool", urls[0], "rule:url", 1.0)
+
+        if urls or mentions_slack:
+            return None
+
+        label, confidence, margin = self.classifier.predict(user_input)
+        if label not in ("positioning_tool", "rag_tool") or label not in self.tools:
+            return None
+        if confidence < self.min_confidence or margin < self.min_margin:
+            return None
+        return self._decision(label, user_input, "classifier", confidence)
+
+    @staticmethod
+    def _is_share_command(text: str) -> bool:
+        """Return whether a message commands sharing to Slack, as opposed to asking about it."""
+        text = text.strip()
+        words = re.findall(r"[a-z']+", text.lower())
+        if text.endswith("?") or (words and words[0] in QUESTION_WORDS):
+            return False
+        return SLACK_SHARE_PATTERN.search(text) is not None
+
+    @staticmethod
+    def _is_scrape_command(text: str) -> bool:
+        """Return whether a message commands scraping a page, as opposed to asking about it."""
+        text = text.strip()
+        words = re.findall(r"[a-z']+", text.lower())
+        if text.endswith("?") or (words and words[0] in QUESTION_WORDS):
+            return False
+        return SCRAPE_COMMAND_PATTERN.search(text) is not None
+
+    def _find_urls(self, text: str) -> List[str]:
+        """Find valid URLs in a message."""
+        scraping_tool = self.tools.get("scraping_tool")
+        urls = []
+        for match in URL_PATTERN.findall(text):
+            url = match.rstrip(URL_TRAILING_PUNCTUATION)
+            if scraping_tool is None or scraping_tool._is_valid_url(url):
+                urls.append(url)
+        return urls
+
+    @staticmethod
+    def _last_assistant_message(chat_history: List) -> Optional[str]:
+        """Find the most recent assistant message in the chat history."""
+        for message in reversed(chat_history):
+            if isinstance(message, dict):
+                if message.get("role") == "assistant":
+                    return message.get("content")
+            elif getattr(message, "type", None) == "ai":
+                return message.content
+        return None
+
+    @staticmethod
+    def _decision(tool: str, tool_input: str, reason: str, confidence: float) -> Dict[str, Any]:
+        return {
+            "tool": tool,
+            "tool_input": tool_input,
+            "reason": reason,
+            "confidence": confidence
+        }
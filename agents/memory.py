@@ -0,0 +1,167 @@
+"""
+Token-bounded conversation memory with rolling summarization.
+"""
+
+import uuid
+from typing import Any, Dict, List, Optional
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from utils.llm import chat_model
+from agents.prompts.memory import CONVERSATION_SUMMARY_PROMPT
+from utils.tokens import count_tokens
+
+
+class ConversationMemory:
+    """
+    Keeps the most recent turns verbatim within a token budget and folds
+    older turns into an incrementally updated summary.
+
+    Messages longer than the reference threshold (typically full tool
+    outputs such as a positioning analysis) are stored once by reference;
+    only a short preview is sent back to the model on later turns. A stored
+    message is dropped once its turn is folded into the summary, except for
+    the most recent assistant turn, which stays available to share.
+    """
+
+    def __init__(self, llm=None, max_tokens: int = 3000, max_turns: int = 10,
+                 summary_max_words: int = 250, reference_threshold: int = 1000, preview_chars: int = 600):
+        """
+        Initialize the conversation memory.
+
+        Args:
+            llm: Language model used for summarization (optional)
+            max_tokens: Token budget for the verbatim turns
+            max_turns: Maximum number of verbatim turns
+            summary_max_words: Target length of the rolling summary
+            reference_threshold: Messages above this many tokens are stored by reference
+            preview_chars: Characters of a referenced message kept in context
+        """
+        self.llm = llm
+        self.max_tokens = max_tokens
+        self.max_turns = max_turns
+        self.summary_max_words = summary_max_words
+        self.reference_threshold = reference_threshold
+        self.preview_chars = preview_chars
+
+        self.summary = ""
+        self.turns: List[Dict[str, Any]] = []
+        self.artifacts: Dict[str, str] = {}
+        self._last_assistant_turn: Optional[Dict[str, Any]] = None
+
+    def add_user_message(self, content: str):
+        """Add a user turn."""
+        self._add("user", content)
+
+    def add_assistant_message(self, content: str):
+        """Add an assistant turn."""
+        self._add("assistant", content)
+
+    def messages(self) -> List:
+        """
+        Build the chat history to send to the agent.
+
+        Returns:
+            List of messages: the rolling summary (if any) followed by the verbatim turns
+        """
+        messages = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+        for turn in self.turns:
+            message_class = HumanMessage if turn["role"] == "user" else AIMessage
+            messages.append(message_class(content=turn["content"]))
+        return messages
+
+    def get_artifact(self, ref: str) -> Optional[str]:
+        """
+        Get the full content of a message stored by reference.
+
+        Args:
+            ref: The reference ID
+
+        Returns:
+            The full content or None if unknown
+        """
+        return self.artifacts.get(ref)
+
+    def last_assistant_message(self) -> Optional[str]:
+        """
+        Get the full content of the most recent assistant turn, even if it
+        has been folded into the summary.
+
+        Returns:
+            The message content (resolved if stored by reference) or None
+        """
+        turn = self._last_assistant_turn
+        if turn is None:
+            return None
+        return self.artifacts.get(turn["ref"]) or turn["content"]
+
+    def token_count(self) -> int:
+        """Return the number of tokens currently sent as chat history."""
+        return count_tokens(self.summary) + sum(turn["tokens"] for turn in self.turns)
+
+    def _add(self, role: str, content: str):
+        """Store a turn, by reference if it is large, then enforce the budget."""
+        turn = {"role": role, "content": content, "ref": None}
+        if count_tokens(content) > self.reference_threshold:
+            ref = uuid.uuid4().hex[:8]
+            self.artifacts[ref] = content
+            turn["ref"] = ref
+            turn["content"] = (
+                f"{content[:self.preview_chars].rstrip()}...\n"
+                f"[Full output stored as reference {ref}; {len(content)} characters]"
+            )
+        turn["tokens"] = count_tokens(turn["content"])
+        self.turns.append(turn)
+        if role == "assistant":
+            previous = self._last_assistant_turn
+            self._last_assistant_turn = turn
+            if previous is not None and all(kept is not previous for kept in self.turns):
+                # Its turn was already summarized; it was only kept to be shared
+                self._drop_artifact(previous)
+        self._compact()
+
+    def _compact(self):
+        """Fold the oldest turns into the summary until the window fits the budget."""
+        evicted = []
+        while len(self.turns) > 1 and (
+            len(self.turns) > self.max_turns
+            or sum(turn["tokens"] for turn in self.turns) > self.max_tokens
+        ):
+            evicted.append(self.turns.pop(0))
+
+        if evicted:
+            self.summary = self._summarize(evicted)
+            for turn in evicted:
+                if turn is not self._last_assistant_turn:
+                    self._drop_artifact(turn)
+
+    def _drop_artifact(self, turn: Dict[str, Any]):
+        """Forget the full content of a turn stored by reference."""
+        if turn["ref"] is not None:
+            self.artifacts.pop(turn["ref"], None)
+
+    def _summarize(self, turns: List[Dict[str, Any]]) -> str:
+        """
+        Fold turns into the running summary.
+
+        Args:
+            turns: Turns evicted from the verbatim window
+
+        Returns:
+            The updated summary
+        """
+        transcript = "\n".join(f"{turn['role'].capitalize()}: {turn['content']}" for turn in turns)
+        try:
+            if self.llm is None:
+                self.llm = chat_model(model="gpt-4", temperature=0)
+            prompt = CONVERSATION_SUMMARY_PROMPT.format(
+                summary=self.summary or "(empty)",
+                turns=transcript,
+                max_words=self.summary_max_words
+            )
+            return self.llm.invoke(prompt).content.strip()
+        except Exception as e:
+            print(f"Error summarizing conversation: {str(e)}")
+            # Fall back to keeping the most recent part of the raw transcript
+            combined = f"{self.summary}\n{transcript}".strip()
+            return combined[-self.summary_max_words * 6:]
@@ -0,0 +1,18 @@
+"""
+Prompt templates for conversation memory.
+"""
+
+CONVERSATION_SUMMARY_PROMPT = """You maintain a running summary of a conversation between a product marketer and an AI assistant.
+
+Current summary:
+{summary}
+
+New conversation turns to fold into the summary:
+{turns}
+
+Update the summary to include the new turns. Keep decisions, product and feature names,
+competitors, open questions and any facts the user provided. Drop pleasantries and
+repeated content. Write at most {max_words} words.
+
+Output only the updated summary.
+"""
@@ -20,4 +20,38 @@ Consider:
 - General questions should use RAG
 
 Output only the name of the appropriate tool: "PositioningAgent", "ScrapingAgent", "SlackAgent", or "RAG"
-""" 
\ No newline at end of file
+""" 
+
+# Keyword rules from AGENT_ROUTING_PROMPT used by the fast-path router
+SLACK_SHARE_KEYWORDS = ["share", "post", "send"]
+SCRAPE_KEYWORDS = ["analyze", "analyse", "scrape", "extract", "competitor", "look at", "check out"]
+
+# Example requests per tool for the fast-path intent classifier (never the
+# tool-calling eval questions, which score it)
+ROUTING_EXAMPLES = {
+    "positioning_tool": [
+        "Create a positioning analysis for this feature",
+        "Help me develop the go-to-market positioning",
+        "How should we differentiate this feature from competitors?",
+        "Write a value proposition and positioning statement",
+        "Generate a marketing strategy for the launch",
+    ],
+    "scraping_tool": [
+        "Scrape this competitor page",
+        "Extract pricing and features from this website",
+        "Analyze this product page for me",
+    ],
+    "slack_tool": [
+        "Post this to Slack",
+        "Send the summary to the slack channel",
+        "Share that with the team on Slack",
+    ],
+    "rag_tool": [
+        "What customer problem is the feature designed to solve?",
+        "What did users say about the current workflow in interviews?",
+        "Which alternatives were considered in the PRD?",
+        "What are the main pain points mentioned by customers?",
+        "Does the requirements doc mention a release date?",
+        "Who is the target audience described in our documents?",
+    ],
+}
@@ -2,87 +2,279 @@
 Agent that routes user requests to appropriate tools.
 """
 
-from langchain.agents import AgentExecutor, create_openai_tools_agent
-from langchain_openai import ChatOpenAI
+from langchain.agents import create_openai_tools_agent
+from utils.llm import chat_model
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import SystemMessage, HumanMessage
-from typing import List, Dict, Any
-from utils.tracing import initialize_tracer
+from langchain_core.agents import AgentAction
+from langchain_core.callbacks import BaseCallbackHandler
+from typing import List, Dict, Any, Tuple
+import contextlib
+import threading
+from agents.executor import ConcurrentAgentExecutor, DEFAULT_TOOL_CONCURRENCY_LIMITS, ToolTimeout, acquire_tool_slot
+from agents.fast_router import FastPathRouter
+from agents.memory import ConversationMemory
+from agents.speculation import SpeculativePrefetcher
+from utils.deadline import Deadline, DeadlineExceeded, deadline_scope, run_with_deadline
+from utils.metrics import metrics
+from utils.tracing import initialize_tracer, create_span
+
+ROUTER_SYSTEM_PROMPT = """You are an intelligent AI assistant specializing in product marketing. You have access to several tools:
+
+1. positioning_tool - Use for generating comprehensive product positioning analysis
+2. scraping_tool - Use for extracting data from competitor websites (requires a URL)
+3. slack_tool - Use for formatting and sharing content to Slack channels
+4. rag_tool - Use for answering questions using information from the knowledge base
+
+Your job is to help the user with their product marketing needs by using these tools appropriately.
+Always be helpful, professional, and provide concise but complete answers.
+"""
+
+class _ToolResultCollector(BaseCallbackHandler):
+    """Collects finished tool outputs so a partial answer can be built on timeout."""
+    
+    def __init__(self):
+        self.results: List[Tuple[str, str]] = []
+        self._names = {}
+        self._lock = threading.Lock()
+    
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        with self._lock:
+            self._names[run_id] = (serialized or {}).get("name", "tool")
+    
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        with self._lock:
+            self.results.append((self._names.pop(run_id, "tool"), str(output)))
 
 class RouterAgent:
     """
     Agent responsible for routing user requests to appropriate tools.
     """
     
-    def __init__(self, tools, model="gpt-4"):
+    def __init__(self, tools, model="gpt-4", fast_path=True, max_tool_concurrency=4,
+                 tool_concurrency_limits=None, request_timeout_s=120.0, tool_timeout_s=60.0,
+                 max_iterations=6, speculative_prefetch=True, streaming=False):
         """
         Initialize the router agent.
         
         Args:
             tools: List of tools available to the agent
             model: The model to use for the agent
+            fast_path: Dispatch high-confidence intents without the planning call
+            max_tool_concurrency: Maximum parallel tool calls within one agent step
+            tool_concurrency_limits: Optional per-tool concurrency limits
+                (defaults to serializing slack_tool)
+            request_timeout_s: Default deadline for a whole request
+            tool_timeout_s: Maximum seconds for a single tool call
+            max_iterations: Maximum number of agent planning steps
+            speculative_prefetch: Start retrieval in parallel with the planning call
+            streaming: Stream answer tokens to callback handlers (on_llm_new_token)
         """
         # Initialize Phoenix tracer in the agent
         self.tracer_provider = initialize_tracer()
         
         self.tools = tools
+        self.request_timeout_s = request_timeout_s
+        self.tool_timeout_s = tool_timeout_s
+        self.tool_concurrency_limits = (
+            DEFAULT_TOOL_CONCURRENCY_LIMITS if tool_concurrency_limits is None else tool_concurrency_limits
+        )
         
-        # Define the prompt template
-        system_message = """You are an intelligent AI assistant specializing in product marketing. You have access to several tools:
-
-1. positioning_tool - Use for generating comprehensive product positioning analysis
-2. scraping_tool - Use for extracting data from competitor websites (requires a URL)
-3. slack_tool - Use for formatting and sharing content to Slack channels
-4. rag_tool - Use for answering questions using information from the knowledge base
-
-Your job is to help the user with their product marketing needs by using these tools appropriately.
-Always be helpful, professional, and provide concise but complete answers.
-"""
+        self.max_iterations = max_iterations
         
+        # Define the prompt template
         prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(content=system_message),
+            SystemMessage(content=ROUTER_SYSTEM_PROMPT),
             MessagesPlaceholder(variable_name="chat_history"),
             HumanMessage(content="{input}"),
             MessagesPlaceholder(variable_name="agent_scratchpad")
         ])
         
         # Create the agent
-        self.llm = ChatOpenAI(model=model, temperature=0.7)
+        self.llm = chat_model(model=model, temperature=0.7, streaming=streaming)
         self.agent = create_openai_tools_agent(self.llm, self.tools, prompt)
-        self.agent_executor = AgentExecutor(
+        self.agent_executor = ConcurrentAgentExecutor(
             agent=self.agent,
             tools=self.tools,
             verbose=True,
-            handle_parsing_errors=True
+            handle_parsing_errors=True,
+            return_intermediate_steps=True,
+            max_iterations=max_iterations,
+            max_concurrency=max_tool_concurrency,
+            tool_concurrency_limits=self.tool_concurrency_limits,
+            tool_timeout_s=tool_timeout_s
         )
+        self.fast_router = FastPathRouter(self.tools) if fast_path else None
+        
+        tools_by_name = {tool.name: tool for tool in self.tools}
+        self.prefetcher = None
+        if speculative_prefetch and "rag_tool" in tools_by_name:
+            self.prefetcher = SpeculativePrefetcher(
+                tools_by_name["rag_tool"].vector_store,
+                positioning_tool=tools_by_name.get("positioning_tool")
+            )
     
-    def execute(self, user_input: str, chat_history: List = None) -> Dict[str, Any]:
+    def routing_config(self) -> Dict[str, Any]:
+        """
+        Describe everything besides the model and tools that decides which tool is called.
+        
+        Returns:
+            Dictionary with the system prompt, the planning step limit and the
+            fast-path router's rules and thresholds (None when disabled)
+        """
+        return {
+            "system_prompt": ROUTER_SYSTEM_PROMPT,
+            "max_iterations": self.max_iterations,
+            "fast_path": self.fast_router.config() if self.fast_router is not None else None
+        }
+    
+    def execute(self, user_input: str, chat_history: List = None, callbacks: List = None,
+                memory: ConversationMemory = None, timeout_s: float = None) -> Dict[str, Any]:
         """
         Execute the agent with user input.
         
         Args:
             user_input: The user's input
             chat_history: Optional chat history for context
+            callbacks: Optional LangChain callback handlers for this run
+            memory: Optional conversation memory; replaces chat_history with
+                its token-bounded summary and recent turns
+            timeout_s: Optional deadline for this request (defaults to request_timeout_s)
             
         Returns:
-            Dictionary containing the agent's response and other relevant information
+            Dictionary containing the agent's response and other relevant information.
+            If the deadline expires, the output is a partial answer built from the
+            tool results that finished and "timed_out" is True.
         """
+        deadline = Deadline(timeout_s or self.request_timeout_s)
+        collector = _ToolResultCollector()
         try:
-            if chat_history is None:
-                chat_history = []
+            with deadline_scope(deadline):
+                return self._execute(user_input, chat_history, [*(callbacks or []), collector], memory, deadline)
+        except DeadlineExceeded:
+            return self._partial_response(collector.results)
+        except Exception as e:
+            return {
+                "output": f"An error occurred: {str(e)}",
+                "success": False
+            }
+    
+    def _execute(self, user_input: str, chat_history: List, callbacks: List,
+                 memory: ConversationMemory, deadline: Deadline) -> Dict[str, Any]:
+        """Route and run a request under the current deadline."""
+        last_assistant_message = None
+        if memory is not None:
+            chat_history = memory.messages()
+            last_assistant_message = memory.last_assistant_message()
+        if chat_history is None:
+            chat_history = []
+        
+        decision = None
+        if self.fast_router:
+            decision = self.fast_router.route(user_input, chat_history, last_assistant_message)
+        if decision is not None:
+            return self._execute_fast_path(decision, callbacks)
+        metrics.increment("router.decisions", route="agent")
+        
+        with self._speculate(user_input):
+            response = run_with_deadline(
+                self.agent_executor.invoke,
+                {
+                    "input": user_input,
+                    "chat_history": chat_history
+                },
+                config={"callbacks": callbacks},
+                operation="agent"
+            )
+        
+        intermediate_steps = response.get("intermediate_steps", [])
+        if deadline.expired() and response["output"].startswith("Agent stopped"):
+            # The executor stopped planning at the deadline
+            return self._partial_response(
+                [(action.tool, observation) for action, observation in intermediate_steps],
+                intermediate_steps
+            )
+        
+        return {
+            "output": response["output"],
+            "intermediate_steps": intermediate_steps,
+            "route": "agent",
+            "success": True
+        }
+    
+    def _speculate(self, user_input: str):
+        """Start speculative retrieval for the planning call, if enabled."""
+        if self.prefetcher is None:
+            return contextlib.nullcontext()
+        return self.prefetcher.speculate(user_input)
+    
+    def _partial_response(self, tool_results: List[Tuple[str, str]], intermediate_steps: List = None) -> Dict[str, Any]:
+        """
+        Build a partial answer from the tool results that finished before the deadline.
+        
+        Args:
+            tool_results: (tool name, output) pairs of tool calls; ToolTimeout
+                outputs of cancelled calls are left out
+            intermediate_steps: Optional agent steps to return alongside
             
-            response = self.agent_executor.invoke({
-                "input": user_input,
-                "chat_history": chat_history
-            })
+        Returns:
+            Dictionary in the same shape as the agent's response
+        """
+        metrics.increment("router.timeouts")
+        finished = [(name, str(output)) for name, output in tool_results if not isinstance(output, ToolTimeout)]
+        if not finished:
+            output = "⏱️ The request timed out before any tool finished. Please try again or narrow the request."
+        else:
+            output = "⏱️ I ran out of time before finishing. Here is what I gathered so far:\n\n"
+            output += "\n\n".join(f"**{name}**:\n{result}" for name, result in finished)
+        return {
+            "output": output,
+            "intermediate_steps": intermediate_steps or [],
+            "route": "timeout",
+            "timed_out": True,
+            "success": False
+        }
+    
+    def _execute_fast_path(self, decision: Dict[str, Any], callbacks: List = None) -> Dict[str, Any]:
+        """
+        Run the tool chosen by the fast-path router directly.
+        
+        Args:
+            decision: Routing decision from FastPathRouter.route
+            callbacks: Optional LangChain callback handlers for this run
             
+        Returns:
+            Dictionary in the same shape as the agent's response
+        """
+        with create_span("fast_path_routing", {
+            "tool": decision["tool"],
+            "reason": decision["reason"],
+            "confidence": decision["confidence"]
+        }) as span:
+            tool = self.fast_router.tools[decision["tool"]]
+            _, release = acquire_tool_slot(decision["tool"], self.tool_concurrency_limits)
+            observation = run_with_deadline(
+                tool.run,
+                decision["tool_input"],
+                callbacks=callbacks,
+                timeout=self.tool_timeout_s,
+                operation=f"tool:{decision['tool']}",
+                on_finish=release
+            )
+            
+            # Each fast-path turn skips at least the planning and final-answer LLM calls
+            metrics.increment("router.decisions", route="fast_path", tool=decision["tool"])
+            metrics.increment("router.llm_calls_saved", 2)
+            span.set_attribute("llm_calls_saved", 2)
+            
+            action = AgentAction(
+                tool=decision["tool"],
+                tool_input=decision["tool_input"],
+                log=f"Fast path ({decision['reason']}, confidence {decision['confidence']:.2f})"
+            )
             return {
-                "output": response["output"],
-                "intermediate_steps": response.get("intermediate_steps", []),
+                "output": observation,
+                "intermediate_steps": [(action, observation)],
+                "route": "fast_path",
                 "success": True
             }
-        except Exception as e:
-            return {
-                "output": f"An error occurred: {str(e)}",
-                "success": False
-            } 
\ No newline at end of file
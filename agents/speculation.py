@@ -0,0 +1,210 @@
+"""
+Speculative retrieval that runs while the router is still planning.
+
+The user message alone is usually enough to start the knowledge-base search,
+so the router kicks it off in parallel with the planning LLM call. If the
+planner then selects rag_tool for the same question, the tool claims the
+prefetched documents instead of searching again; otherwise they are dropped.
+"""
+
+import contextvars
+import re
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import List, Optional
+from utils.deadline import DeadlineExceeded, remaining_timeout
+from utils.metrics import metrics
+
+_current_speculation: contextvars.ContextVar = contextvars.ContextVar("speculation", default=None)
+
+
+def _tokens(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+class Speculation:
+    """
+    A prefetched similarity search for one request.
+    """
+
+    def __init__(self, query: str, k: int, min_overlap: float):
+        """
+        Initialize the speculation.
+
+        Args:
+            query: The query being searched
+            k: Number of documents requested
+            min_overlap: Minimum token overlap for a tool query to match
+        """
+        self.query = query
+        self.k = k
+        self.min_overlap = min_overlap
+        self.future: Future = Future()
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.claimed = False
+        self._claim_lock = threading.Lock()
+
+    def claim(self) -> bool:
+        """
+        Claim the prefetched documents; only the first caller succeeds.
+
+        Concurrent tool calls of one step share the request's speculation,
+        so the check and the update must be atomic.
+
+        Returns:
+            True if this caller claimed them
+        """
+        with self._claim_lock:
+            if self.claimed:
+                return False
+            self.claimed = True
+            return True
+
+    def matches(self, query: str, k: int) -> bool:
+        """Check whether the prefetched search can serve a tool query."""
+        if k > self.k:
+            return False
+        if query.strip().lower() == self.query.strip().lower():
+            return True
+        ours, theirs = _tokens(self.query), _tokens(query)
+        if not ours or not theirs:
+            return False
+        return len(ours & theirs) / len(ours | theirs) >= self.min_overlap
+
+
+class SpeculativePrefetcher:
+    """
+    Starts retrieval (and positioning context warm-up) alongside the planning
+    call, within a budget of concurrent speculative searches.
+    """
+
+    def __init__(self, vector_store, k: int = 5, max_in_flight: int = 2,
+                 min_overlap: float = 0.8, positioning_tool=None):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            vector_store: Vector store to search
+            k: Number of documents to prefetch (matches RAGTool)
+            max_in_flight: Maximum speculative searches running at once
+            min_overlap: Minimum token overlap between the user message and the
+                tool query for the prefetched documents to be used
+            positioning_tool: Optional PositioningTool whose context to warm
+        """
+        self.vector_store = vector_store
+        self.k = k
+        self.min_overlap = min_overlap
+        self.positioning_tool = positioning_tool
+        self._budget = threading.BoundedSemaphore(max_in_flight)
+
+    @contextmanager
+    def speculate(self, user_input: str):
+        """
+        Speculatively start retrieval for a request.
+
+        Args:
+            user_input: The user's message
+
+        Yields:
+            The Speculation, or None if the budget was exhausted
+        """
+        speculation = self._start(user_input)
+        if self.positioning_tool is not None:
+            self._warm_positioning()
+        token = _current_speculation.set(speculation)
+        try:
+            yield speculation
+        finally:
+            _current_speculation.reset(token)
+            if speculation is not None and not speculation.claimed:
+                metrics.increment("speculation.wasted")
+
+    def _start(self, user_input: str) -> Optional[Speculation]:
+        """Start the speculative search if the budget allows."""
+        if not self._budget.acquire(blocking=False):
+            metrics.increment("speculation.skipped")
+            return None
+
+        speculation = Speculation(user_input, self.k, self.min_overlap)
+        context = contextvars.copy_context()
+
+        def search():
+            try:
+                documents = context.run(self.vector_store.similarity_search, user_input, k=self.k)
+                speculation.finished_at = time.perf_counter()
+                speculation.future.set_result(documents)
+            except Exception as e:
+                speculation.finished_at = time.perf_counter()
+                speculation.future.set_exception(e)
+            finally:
+                self._budget.release()
+
+        metrics.increment("speculation.started")
+        threading.Thread(target=search, name="speculative-retrieval", daemon=True).start()
+        return speculation
+
+    def _warm_positioning(self):
+        """Refresh the positioning context cache in the background if it is stale."""
+        if not self.positioning_tool.context_is_stale():
+            return
+        if not self._budget.acquire(blocking=False):
+            metrics.increment("speculation.skipped")
+            return
+
+        def warm():
+            try:
+                self.positioning_tool.warm_context()
+                metrics.increment("speculation.positioning_warmed")
+            except Exception as e:
+                print(f"Error warming positioning context: {str(e)}")
+            finally:
+                self._budget.release()
+
+        threading.Thread(target=warm, name="positioning-warmup", daemon=True).start()
+
+    @staticmethod
+    def hit_rate() -> float:
+        """Fraction of started speculations that were used by a tool."""
+        started = metrics.counter("speculation.started")
+        return metrics.counter("speculation.hits") / started if started else 0.0
+
+
+def claim_prefetched(query: str, k: int) -> Optional[List]:
+    """
+    Claim the current request's prefetched documents for a tool query.
+
+    Args:
+        query: The query the tool is about to search
+        k: Number of documents the tool needs
+
+    Returns:
+        The prefetched documents, or None if the tool should search itself
+    """
+    speculation = _current_speculation.get()
+    if speculation is None or speculation.claimed:
+        return None
+    if not speculation.matches(query, k):
+        metrics.increment("speculation.misses")
+        return None
+    if not speculation.claim():
+        return None
+
+    claimed_at = time.perf_counter()
+    try:
+        documents = speculation.future.result(timeout=remaining_timeout(operation="speculative_retrieval"))
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"Speculative retrieval failed, searching again: {str(e)}")
+        metrics.increment("speculation.errors")
+        return None
+
+    # Time the search had already been running before the tool needed it
+    finished_at = speculation.finished_at or time.perf_counter()
+    saved = min(claimed_at, finished_at) - speculation.started_at
+    metrics.increment("speculation.hits")
+    metrics.observe("speculation.latency_saved_s", saved)
+    return documents[:k]
@@ -0,0 +1,13 @@
+"""
+Feature Positioning Copilot API Module
+
+This module contains the headless ASGI service that exposes the agent,
+document ingestion, competitor scraping and Slack sharing over HTTP.
+"""
+
+from .server import app, create_app
+
+__all__ = [
+    'app',
+    'create_app',
+]
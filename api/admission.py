@@ -0,0 +1,107 @@
+"""
+Bounded request concurrency with a wait queue and load shedding.
+"""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from utils.metrics import metrics
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; answered with 429."""
+
+    def __init__(self, retry_after_s: int):
+        super().__init__(f"Server is busy, retry after {retry_after_s}s")
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionController:
+    """
+    Admits at most max_concurrency requests at a time, queues up to max_queue
+    more, and rejects the rest with a Retry-After estimate.
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 4, max_queue: int = 16,
+                 queue_timeout_s: float = 30.0, initial_duration_s: float = 10.0):
+        """
+        Initialize the admission controller.
+
+        Args:
+            name: Name of the request pool, used as a metrics label
+            max_concurrency: Maximum requests running at once
+            max_queue: Maximum requests waiting for a slot
+            queue_timeout_s: Maximum seconds a request waits before being rejected
+            initial_duration_s: Assumed request duration until one has been measured
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.avg_duration_s = initial_duration_s
+        self.active = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def retry_after(self) -> int:
+        """Estimate the seconds until a slot frees up for a new request."""
+        backlog = self.waiting + 1
+        return max(1, math.ceil(backlog * self.avg_duration_s / self.max_concurrency))
+
+    async def acquire(self) -> float:
+        """
+        Wait for a slot.
+
+        Returns:
+            The time the slot was acquired, to pass to release()
+
+        Raises:
+            Overloaded: If the queue is full or the wait times out
+        """
+        if self._semaphore is None:
+            # Created lazily so it binds to the server's event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            metrics.increment("api.rejected", pool=self.name, reason="queue_full")
+            raise Overloaded(self.retry_after())
+
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            metrics.increment("api.rejected", pool=self.name, reason="queue_timeout")
+            raise Overloaded(self.retry_after())
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        acquired = time.perf_counter()
+        metrics.observe("api.queue_wait_s", acquired - started, pool=self.name)
+        return acquired
+
+    def release(self, acquired: float):
+        """
+        Give back a slot.
+
+        Args:
+            acquired: The time returned by acquire()
+        """
+        duration = time.perf_counter() - acquired
+        # Exponentially weighted average keeps Retry-After close to recent load
+        self.avg_duration_s = 0.8 * self.avg_duration_s + 0.2 * duration
+        self.active -= 1
+        self._semaphore.release()
+        metrics.observe("api.request_duration_s", duration, pool=self.name)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a slot for the enclosed block."""
+        acquired = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(acquired)
@@ -0,0 +1,126 @@
+"""
+Process-level resources shared by every request an API worker serves.
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from agents.memory import ConversationMemory
+from agents.router_agent import RouterAgent
+from services.document_service import DocumentService
+from services.scraping_service import ScrapingService
+from tools.positioning_tool import PositioningTool
+from tools.scraping_tool import ScrapingTool
+from tools.slack_tool import SlackTool
+from tools.rag_tool import RAGTool
+from utils.vector_store import VectorStoreManager
+
+
+class CopilotResources:
+    """
+    The vector store, services, tools and agent, built once per process.
+    """
+
+    def __init__(self, model: str = "gpt-4", streaming: bool = True):
+        """
+        Initialize the resources.
+
+        Args:
+            model: The model to use for the agent
+            streaming: Stream answer tokens from the agent's LLM
+        """
+        self.vector_store = VectorStoreManager.initialize()
+        self.document_service = DocumentService(self.vector_store)
+        self.scraping_service = ScrapingService()
+
+        self.positioning_tool = PositioningTool(self.vector_store)
+        self.scraping_tool = ScrapingTool(self.scraping_service, self.document_service)
+        self.slack_tool = SlackTool()
+        self.rag_tool = RAGTool(self.vector_store)
+
+        self.router_agent = RouterAgent(
+            tools=[self.positioning_tool, self.scraping_tool, self.slack_tool, self.rag_tool],
+            model=model,
+            streaming=streaming
+        )
+
+
+_resources: Optional[CopilotResources] = None
+_resources_lock = threading.Lock()
+
+
+def get_resources() -> CopilotResources:
+    """
+    Get the process-wide resources, building them on first use.
+
+    Returns:
+        The shared CopilotResources
+    """
+    global _resources
+    if _resources is None:
+        with _resources_lock:
+            if _resources is None:
+                load_dotenv()
+                _resources = CopilotResources()
+    return _resources
+
+
+class Session:
+    """
+    Conversation state of one API client.
+    """
+
+    def __init__(self, session_id: str):
+        """
+        Initialize the session.
+
+        Args:
+            session_id: The session ID
+        """
+        self.session_id = session_id
+        self.memory = ConversationMemory()
+        # Turns of one session run one at a time so memory stays in order
+        self.lock = threading.Lock()
+
+
+class SessionStore:
+    """
+    In-process store of conversation sessions, evicting the least recently used.
+
+    Sessions live in the worker that created them, so multi-worker
+    deployments should route a session to the same worker (sticky sessions).
+    """
+
+    def __init__(self, max_sessions: int = 1000):
+        """
+        Initialize the session store.
+
+        Args:
+            max_sessions: Maximum number of sessions kept in memory
+        """
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str] = None) -> Tuple[str, Session]:
+        """
+        Get a session, creating it if it is new or unknown.
+
+        Args:
+            session_id: Optional ID of an existing session
+
+        Returns:
+            Tuple of (session ID, session)
+        """
+        with self._lock:
+            session_id = session_id or uuid.uuid4().hex
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+            return session_id, session
@@ -0,0 +1,305 @@
+"""
+Headless ASGI API for the Feature Positioning Copilot.
+
+Every worker process builds the vector store, services, tools and agent once
+and shares them across requests. Chat and ingestion requests run in bounded
+pools; when a pool's queue is full the API answers 429 with Retry-After.
+
+Run several workers behind a load balancer, for example:
+
+    uvicorn api.server:app --host 0.0.0.0 --port 8000 --workers 4
+"""
+
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from langchain_core.callbacks import BaseCallbackHandler
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from api.admission import AdmissionController, Overloaded
+from api.resources import Session, SessionStore, get_resources
+from services.document_service import UploadedDocument
+from utils.metrics import metrics
+
+DOC_TYPES = ("requirements", "interviews", "strategy")
+
+# Seconds between SSE keep-alive comments while the agent is working
+HEARTBEAT_S = 15.0
+
+
+class ChatRequest(BaseModel):
+    message: str = Field(..., min_length=1, description="The user's message")
+    session_id: Optional[str] = Field(default=None, description="Session to continue (a new one is created if omitted)")
+    timeout_s: Optional[float] = Field(default=None, gt=0, description="Deadline for this request in seconds")
+
+
+class CompetitorRequest(BaseModel):
+    url: str = Field(..., min_length=1, description="Competitor product page to analyze")
+    crawl: bool = Field(default=False, description="Also analyze the site's pricing, feature and solution pages")
+
+
+class ExpireSourcesRequest(BaseModel):
+    max_age_days: float = Field(..., gt=0, description="Delete sources not refreshed for this many days")
+    doc_type: Optional[str] = Field(default="competitor", description="Only expire sources of this type")
+
+
+class SlackRequest(BaseModel):
+    content: str = Field(..., min_length=1, description="Content to share to Slack")
+
+
+class _EventStreamHandler(BaseCallbackHandler):
+    """Forwards agent progress from the worker thread to an SSE stream."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+
+    def _emit(self, event: str, data: Dict[str, Any]):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (event, data))
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self._emit("tool_start", {"tool": (serialized or {}).get("name", "tool"), "input": input_str})
+
+    def on_tool_end(self, output, **kwargs):
+        self._emit("tool_end", {"output": str(output)})
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        if token:
+            self._emit("token", {"token": token})
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _run_turn(session: Session, message: str, timeout_s: Optional[float],
+              callbacks: List = None) -> Dict[str, Any]:
+    """
+    Run one chat turn and record it in the session's memory.
+
+    Args:
+        session: The conversation session
+        message: The user's message
+        timeout_s: Optional deadline for the request
+        callbacks: Optional LangChain callback handlers
+
+    Returns:
+        The agent's response
+    """
+    with session.lock:
+        response = get_resources().router_agent.execute(
+            message,
+            callbacks=callbacks,
+            memory=session.memory,
+            timeout_s=timeout_s
+        )
+        session.memory.add_user_message(message)
+        session.memory.add_assistant_message(response["output"])
+    return response
+
+
+def _chat_payload(session_id: str, response: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert an agent response to JSON."""
+    return {
+        "session_id": session_id,
+        "output": response["output"],
+        "route": response.get("route"),
+        "success": response.get("success", False),
+        "timed_out": response.get("timed_out", False),
+        "tool_calls": [
+            {"tool": action.tool, "tool_input": action.tool_input}
+            for action, _ in response.get("intermediate_steps", [])
+        ]
+    }
+
+
+def create_app() -> FastAPI:
+    """
+    Create the API application.
+
+    Pool sizes are read from FPC_API_CHAT_CONCURRENCY, FPC_API_CHAT_QUEUE,
+    FPC_API_INGEST_CONCURRENCY and FPC_API_INGEST_QUEUE.
+
+    Returns:
+        The FastAPI application
+    """
+    app = FastAPI(title="Feature Positioning Copilot API")
+    chat_pool = AdmissionController(
+        "chat",
+        max_concurrency=int(os.environ.get("FPC_API_CHAT_CONCURRENCY", 8)),
+        max_queue=int(os.environ.get("FPC_API_CHAT_QUEUE", 32))
+    )
+    ingest_pool = AdmissionController(
+        "ingest",
+        max_concurrency=int(os.environ.get("FPC_API_INGEST_CONCURRENCY", 2)),
+        max_queue=int(os.environ.get("FPC_API_INGEST_QUEUE", 8)),
+        initial_duration_s=30.0
+    )
+    sessions = SessionStore()
+
+    @app.on_event("startup")
+    async def startup():
+        # Build the shared resources before the worker accepts traffic
+        await run_in_threadpool(get_resources)
+
+    @app.exception_handler(Overloaded)
+    async def overloaded(request, exc: Overloaded):
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(exc)},
+            headers={"Retry-After": str(exc.retry_after_s)}
+        )
+
+    @app.get("/health")
+    async def health():
+        return {
+            "status": "ok",
+            "chat": {"active": chat_pool.active, "waiting": chat_pool.waiting},
+            "ingest": {"active": ingest_pool.active, "waiting": ingest_pool.waiting}
+        }
+
+    @app.get("/metrics")
+    async def get_metrics():
+        return metrics.snapshot()
+
+    @app.post("/chat")
+    async def chat(request: ChatRequest):
+        session_id, session = sessions.get(request.session_id)
+        async with chat_pool.slot():
+            response = await run_in_threadpool(_run_turn, session, request.message, request.timeout_s)
+        return _chat_payload(session_id, response)
+
+    @app.post("/chat/stream")
+    async def chat_stream(request: ChatRequest):
+        session_id, session = sessions.get(request.session_id)
+        # Admit before streaming starts so overload is still answered with 429
+        acquired = await chat_pool.acquire()
+
+        events: asyncio.Queue = asyncio.Queue()
+        handler = _EventStreamHandler(asyncio.get_running_loop(), events)
+        turn = asyncio.ensure_future(
+            run_in_threadpool(_run_turn, session, request.message, request.timeout_s, [handler])
+        )
+        # The slot is held until the turn finishes, even if the client disconnects
+        turn.add_done_callback(lambda _: chat_pool.release(acquired))
+
+        async def stream():
+            yield _sse("session", {"session_id": session_id})
+            while True:
+                next_event = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait(
+                    {next_event, turn}, timeout=HEARTBEAT_S, return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_event in done:
+                    yield _sse(*next_event.result())
+                    continue
+                next_event.cancel()
+
+                if not turn.done():
+                    yield ": keep-alive\n\n"
+                    continue
+
+                while not events.empty():
+                    yield _sse(*events.get_nowait())
+                if turn.exception() is not None:
+                    yield _sse("error", {"detail": str(turn.exception())})
+                else:
+                    yield _sse("message", _chat_payload(session_id, turn.result()))
+                return
+
+        return StreamingResponse(
+            stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    @app.post("/documents")
+    async def upload_document(file: UploadFile = File(...), doc_type: str = Form("requirements"),
+                              group_by: Optional[str] = Form(None)):
+        if doc_type not in DOC_TYPES:
+            raise HTTPException(status_code=422, detail=f"doc_type must be one of {', '.join(DOC_TYPES)}")
+        document = UploadedDocument(file.filename, await file.read())
+        report = {}
+        async with ingest_pool.slot():
+            success = await run_in_threadpool(
+                get_resources().document_service.process_file, document, doc_type, group_by=group_by, report=report
+            )
+        if not success:
+            raise HTTPException(status_code=500, detail=f"Error processing {file.filename}")
+        return {"filename": file.filename, "doc_type": doc_type, "success": True, **report}
+
+    @app.post("/documents/batch")
+    async def upload_documents(files: List[UploadFile] = File(...), doc_type: str = Form("requirements"),
+                               group_by: Optional[str] = Form(None)):
+        if doc_type not in DOC_TYPES:
+            raise HTTPException(status_code=422, detail=f"doc_type must be one of {', '.join(DOC_TYPES)}")
+        documents = [UploadedDocument(file.filename, await file.read()) for file in files]
+        async with ingest_pool.slot():
+            report = await run_in_threadpool(
+                get_resources().document_service.process_files, documents, doc_type, group_by=group_by
+            )
+        return {"doc_type": doc_type, **report}
+
+    @app.get("/documents/dedup")
+    async def dedup_stats():
+        deduplicator = get_resources().document_service.deduplicator
+        if deduplicator is None:
+            return {"enabled": False}
+        return {"enabled": True, "threshold": deduplicator.threshold, **deduplicator.stats()}
+
+    @app.get("/sources")
+    async def list_sources(doc_type: Optional[str] = None):
+        return {"sources": get_resources().document_service.list_sources(doc_type)}
+
+    @app.delete("/sources")
+    async def delete_source(source: str):
+        document_service = get_resources().document_service
+        if not any(entry["source"] == source for entry in document_service.list_sources()):
+            raise HTTPException(status_code=404, detail=f"Unknown source: {source}")
+        async with ingest_pool.slot():
+            return await run_in_threadpool(document_service.delete_source, source)
+
+    @app.post("/sources/expire")
+    async def expire_sources(request: ExpireSourcesRequest):
+        async with ingest_pool.slot():
+            return await run_in_threadpool(
+                get_resources().document_service.expire_sources, request.max_age_days, request.doc_type
+            )
+
+    @app.post("/sources/compact")
+    async def compact_sources():
+        async with ingest_pool.slot():
+            return await run_in_threadpool(get_resources().document_service.compact)
+
+    @app.post("/competitors")
+    async def analyze_competitor(request: CompetitorRequest):
+        scraping_tool = get_resources().scraping_tool
+        if not scraping_tool._is_valid_url(request.url):
+            raise HTTPException(status_code=422, detail=f"Invalid URL: {request.url}")
+        analyze = scraping_tool.analyze_site if request.crawl else scraping_tool._run
+        async with ingest_pool.slot():
+            analysis = await run_in_threadpool(analyze, request.url)
+        return {"url": request.url, "analysis": analysis}
+
+    @app.post("/slack")
+    async def share_to_slack(request: SlackRequest):
+        async with chat_pool.slot():
+            result = await run_in_threadpool(get_resources().slack_tool._run, request.content)
+        if result.startswith("Error"):
+            raise HTTPException(status_code=502, detail=result)
+        return {"success": True, "detail": result}
+
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api.server:app", host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
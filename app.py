@@ -8,6 +8,7 @@ import re
 # Import services
 from services.document_service import DocumentService
 from services.scraping_service import ScrapingService
+from services.ingestion_jobs import IngestionJobs
 
 # Import tools
 from tools.positioning_tool import PositioningTool
@@ -17,6 +18,7 @@ from tools.rag_tool import RAGTool
 
 # Import agent
 from agents.router_agent import RouterAgent
+from agents.memory import ConversationMemory
 
 load_dotenv()
 
@@ -42,6 +44,13 @@ scraping_tool = ScrapingTool(scraping_service, document_service)
 slack_tool = SlackTool()
 rag_tool = RAGTool(vector_store)
 
+@st.cache_resource
+def get_ingestion_jobs(_document_service, _scraping_tool):
+    """Create the background job queue once per process (it survives reruns)."""
+    return IngestionJobs(_document_service, _scraping_tool)
+
+ingestion_jobs = get_ingestion_jobs(document_service, scraping_tool)
+
 # Create the agent with all tools (tracing is initialized within RouterAgent)
 router_agent = RouterAgent(
     tools=[positioning_tool, scraping_tool, slack_tool, rag_tool],
@@ -53,7 +62,7 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
     st.session_state.current_analysis = None
     st.session_state.show_examples = True
-    st.session_state.chat_history = []
+    st.session_state.memory = ConversationMemory()
 
 # Add helper text in main area
 st.markdown("""
@@ -73,35 +82,111 @@ with st.sidebar:
     
     # Requirements upload
     with st.expander("Upload Product Requirements"):
-        requirements_file = st.file_uploader("Upload PRD", type=["pdf", "txt"], key="requirements")
-        if requirements_file is not None:
+        requirements_files = st.file_uploader(
+            "Upload PRDs", type=["pdf", "txt"], key="requirements", accept_multiple_files=True
+        )
+        if requirements_files:
             if st.button("Process Requirements"):
-                with st.spinner("Processing requirements document..."):
-                    success = document_service.process_file(requirements_file, "requirements")
-                    if success:
-                        st.success("✅ Requirements processed successfully!")
-                    else:
-                        st.error("❌ Error processing requirements.")
+                ingestion_jobs.submit_files(requirements_files, "requirements")
+                st.info(f"⏳ {len(requirements_files)} requirements file(s) queued for processing.")
     
     # User interviews upload
     with st.expander("Upload User Research"):
-        interviews_file = st.file_uploader("Upload Interviews", type=["pdf", "txt"], key="interviews")
-        if interviews_file is not None:
+        interviews_files = st.file_uploader(
+            "Upload Interviews", type=["pdf", "txt", "csv", "tsv", "xlsx"], key="interviews",
+            accept_multiple_files=True
+        )
+        group_by = st.text_input(
+            "Group spreadsheet rows by column", placeholder="respondent_id",
+            help="For CSV, TSV and Excel exports: rows with the same value are stored together."
+        )
+        if interviews_files:
             if st.button("Process Interviews"):
-                with st.spinner("Processing user interviews..."):
-                    success = document_service.process_file(interviews_file, "interviews")
-                    if success:
-                        st.success("✅ User interviews processed successfully!")
-                    else:
-                        st.error("❌ Error processing interviews.")
+                ingestion_jobs.submit_files(interviews_files, "interviews", group_by=group_by or None)
+                st.info(f"⏳ {len(interviews_files)} interview file(s) queued for processing.")
     
     # Competitor analysis
     with st.expander("Analyze Competitor Website"):
         competitor_url = st.text_input("Competitor URL", placeholder="https://example.com/product")
+        crawl_site = st.checkbox(
+            "Crawl the whole site", help="Also find and analyze the site's pricing, feature and solution pages."
+        )
         if st.button("Analyze Competitor") and competitor_url:
-            with st.spinner("Analyzing competitor website..."):
-                response = scraping_tool._run(competitor_url)
-                st.write(response)
+            ingestion_jobs.submit_competitor(competitor_url, crawl=crawl_site)
+            st.info("⏳ Competitor analysis queued.")
+
+    # Stored sources; uploading a file again replaces its previous version
+    with st.expander("Knowledge Base"):
+        sources = document_service.list_sources()
+        if not sources:
+            st.caption("No documents yet.")
+        for entry in sources:
+            if st.button(f"🗑️ {entry['source']} ({entry['doc_type']}, {entry['chunk_count']} chunks)",
+                         key=f"delete-{entry['source']}"):
+                result = document_service.delete_source(entry["source"])
+                st.info(f"Deleted {result['chunks_deleted']} chunks.")
+                if result["reingest_sources"]:
+                    st.warning(f"Upload again to restore their deduplicated chunks: {', '.join(result['reingest_sources'])}")
+        if st.button("Reclaim stale chunks"):
+            result = document_service.compact()
+            st.info(f"Reclaimed {result['chunks_reclaimed']} chunks.")
+
+    # Background job status
+    st.subheader("Jobs")
+    
+    def render_jobs():
+        """Show the status, progress and stage timings of recent jobs."""
+        jobs = ingestion_jobs.queue.list(limit=10)
+        if not jobs:
+            st.caption("No jobs yet.")
+        for job in jobs:
+            label = job["payload"].get("name") or job["payload"].get("url")
+            icon = {"queued": "🕒", "running": "⏳", "succeeded": "✅", "failed": "❌"}[job["status"]]
+            with st.expander(f"{icon} {label}", expanded=job["status"] == "running"):
+                if job["status"] in ("queued", "running"):
+                    st.progress(job["progress"], text=job["stage"] or "Queued")
+                elif job["status"] == "failed":
+                    st.error(job["error"])
+                elif isinstance(job["result"], str):
+                    st.markdown(job["result"])
+                elif isinstance(job["result"], dict) and "files" in job["result"]:
+                    for result in job["result"]["files"]:
+                        if result["success"]:
+                            rows = f" from {result['rows']} rows" if "rows" in result else ""
+                            skipped = result.get("duplicates_skipped")
+                            duplicates = f", {skipped} duplicates skipped" if skipped else ""
+                            st.caption(f"✅ {result['name']}: {result['chunk_count']} chunks{rows}{duplicates}")
+                        else:
+                            st.caption(f"❌ {result['name']}: {result['error']}")
+                if isinstance(job["result"], dict) and job["result"].get("reingest_sources"):
+                    st.warning(f"Upload again to restore their content: {', '.join(job['result']['reingest_sources'])}")
+                if job["stage_timings"]:
+                    st.caption(" · ".join(f"{stage} {seconds:.1f}s" for stage, seconds in job["stage_timings"].items()))
+    
+    # Slack delivery status
+    def render_slack_deliveries():
+        """Show the delivery status of recent Slack messages."""
+        deliveries = slack_tool.outbox.recent(limit=5)
+        if not deliveries:
+            return
+        st.subheader("Slack Deliveries")
+        for delivery in deliveries:
+            icon = {"pending": "🕒", "sending": "📤", "sent": "✅", "failed": "❌"}[delivery["status"]]
+            preview = delivery["content"][:60].replace("\n", " ")
+            st.caption(f"{icon} #{delivery['id']} → {delivery['channel']}: {preview}…")
+            if delivery["status"] == "failed" or (delivery["status"] == "pending" and delivery["error"]):
+                st.caption(f"⚠️ {delivery['error']} (attempt {delivery['attempts']})")
+    
+    def render_activity():
+        render_jobs()
+        render_slack_deliveries()
+    
+    # Poll for progress without rerunning the whole page (when supported)
+    if hasattr(st, "fragment"):
+        st.fragment(render_activity, run_every=2)()
+    else:
+        render_activity()
+        st.button("Refresh")
 
 # Display chat history
 for message in st.session_state.messages:
@@ -110,9 +195,8 @@ for message in st.session_state.messages:
 
 # Chat input at the bottom
 if prompt := st.chat_input("Ask me anything about the analyzed products and documents"):
-    # Add user message to chat history
+    # Add user message to the transcript
     st.session_state.messages.append({"role": "user", "content": prompt})
-    st.session_state.chat_history.append({"role": "user", "content": prompt})
     
     # Display user message
     with st.chat_message("user"):
@@ -121,9 +205,10 @@ if prompt := st.chat_input("Ask me anything about the analyzed products and docu
     # Display assistant response
     with st.chat_message("assistant"):
         with st.spinner("Thinking..."):
-            response = router_agent.execute(prompt, st.session_state.chat_history)
+            response = router_agent.execute(prompt, memory=st.session_state.memory)
             st.markdown(response["output"])
     
-    # Add assistant response to chat history
+    # Add assistant response to the transcript and the agent's memory
     st.session_state.messages.append({"role": "assistant", "content": response["output"]})
-    st.session_state.chat_history.append({"role": "assistant", "content": response["output"]}) 
\ No newline at end of file
+    st.session_state.memory.add_user_message(prompt)
+    st.session_state.memory.add_assistant_message(response["output"]) 
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+Local results store for incremental evaluations.
+
+Each eval case is fingerprinted from the inputs that can change its verdict
+(question, document texts, judge prompt template, tool names/descriptions and
+judge model). Cached verdicts are reused until the fingerprint changes.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+DEFAULT_CACHE_PATH = "evals/.eval_cache.json"
+
+
+def fingerprint(*parts: Any) -> str:
+    """
+    Compute a stable content hash over the given parts.
+
+    Args:
+        *parts: JSON-serializable values that determine an eval verdict
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def tool_definitions_digest(tools: Iterable[Any], names: Iterable[str]) -> Dict[str, str]:
+    """
+    Hash the name and description of the named tools only.
+
+    Args:
+        tools: All available tools
+        names: Names of the tools that affect a case
+
+    Returns:
+        Mapping of tool name to definition hash (unknown tools map to None)
+    """
+    by_name = {tool.name: tool for tool in tools}
+    digest = {}
+    for name in sorted(set(names)):
+        tool = by_name.get(name)
+        digest[name] = fingerprint(tool.name, tool.description) if tool is not None else None
+    return digest
+
+
+class EvalCache:
+    """JSON-backed store of eval verdicts keyed by case and fingerprint."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        """
+        Initialize the cache and load any previous results.
+
+        Args:
+            path: Location of the JSON results store
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._records = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Ignoring unreadable eval cache {path}: {str(e)}")
+                self._records = {}
+
+    def record(self, case_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the stored record for a case regardless of its fingerprint.
+
+        Args:
+            case_key: Stable identifier of the case
+
+        Returns:
+            The stored record or None
+        """
+        with self._lock:
+            return self._records.get(case_key)
+
+    def get(self, case_key: str, case_fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached result for a case if its fingerprint is unchanged.
+
+        Args:
+            case_key: Stable identifier of the case
+            case_fingerprint: Fingerprint of the case's current inputs
+
+        Returns:
+            The cached result or None if the case must be re-judged
+        """
+        record = self.record(case_key)
+        if record is None or record.get("fingerprint") != case_fingerprint:
+            return None
+        return record["result"]
+
+    def put(self, case_key: str, case_fingerprint: str, result: Dict[str, Any], **extra):
+        """
+        Store the result for a case.
+
+        Args:
+            case_key: Stable identifier of the case
+            case_fingerprint: Fingerprint of the inputs the result was computed from
+            result: JSON-serializable result to cache
+            **extra: Additional fields needed to recompute the fingerprint later
+        """
+        with self._lock:
+            self._records[case_key] = {"fingerprint": case_fingerprint, "result": result, **extra}
+
+    def save(self):
+        """Write the store to disk."""
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._records, f, indent=2, sort_keys=True, default=str)
+            os.replace(tmp_path, self.path)
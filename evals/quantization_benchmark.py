@@ -0,0 +1,222 @@
+"""
+Reduced-dimension and quantized embedding benchmark.
+
+Embeds the RAG test-case documents plus synthetic distractor chunks once at
+full size (text-embedding-3-large, 3072 dimensions), then compares search
+configurations against exact float32 search over the full vectors, the
+current setup:
+
+- fewer dimensions, as returned by the model's `dimensions` parameter
+- int8 and binary first-stage search, with and without re-ranking from the
+  full-precision side store
+
+and reports recall@k against the exact results, recall of the labelled
+relevant documents, query latency and the memory each configuration scans.
+
+Usage:
+    python -m evals.quantization_benchmark --size 20000 -k 5
+
+Embeddings are cached in --cache, so repeated runs cost no embedding tokens.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from evals.results_history import ResultsHistory
+from evals.retrieval_benchmark import benchmark_corpus, synthetic_chunks
+from utils.llm import embedding_model
+from utils.quantized_store import QuantizedVectorStore, normalize, reduce_dimensions
+from utils.rate_limiter import EVAL, set_default_priority
+
+DEFAULT_CACHE = ".fpc/quantization_benchmark.npz"
+
+# (name, dimensions or None for all, quantization, rescore factor)
+CONFIGURATIONS = [
+    ("float32_3072", None, "none", 1),
+    ("float32_1024", 1024, "none", 1),
+    ("float32_256", 256, "none", 1),
+    ("int8_3072", None, "int8", 1),
+    ("int8_3072_rescored", None, "int8", 4),
+    ("int8_1024_rescored", 1024, "int8", 4),
+    ("binary_3072", None, "binary", 1),
+    ("binary_3072_rescored", None, "binary", 10),
+]
+
+
+def embed_corpus(size: int, cache: str, batch_size: int = 256, seed: int = 0) -> Dict[str, Any]:
+    """
+    Embed the labelled documents, distractors and queries, or load them from the cache.
+
+    Args:
+        size: Number of distractor chunks
+        cache: Path of the .npz cache
+        batch_size: Texts per embedding call
+        seed: Seed for distractor generation
+
+    Returns:
+        Dictionary with the corpus 'vectors', their 'doc_ids', the 'queries',
+        their 'query_vectors' and the 'relevant' document IDs per query
+    """
+    texts, metadatas, relevant = benchmark_corpus()
+    doc_ids = [metadata["benchmark_doc_id"] for metadata in metadatas] + [f"synthetic-{i}" for i in range(size)]
+    queries = list(relevant)
+
+    if os.path.exists(cache):
+        cached = np.load(cache)
+        if cached["vectors"].shape[0] == len(doc_ids) and cached["query_vectors"].shape[0] == len(queries):
+            print(f"Loaded embeddings from {cache}")
+            return {
+                "vectors": cached["vectors"], "doc_ids": doc_ids, "queries": queries,
+                "query_vectors": cached["query_vectors"], "relevant": relevant,
+            }
+
+    embeddings = embedding_model("text-embedding-3-large")
+    corpus = texts + synthetic_chunks(size, seed=seed)
+    print(f"Embedding {len(corpus)} chunks and {len(queries)} queries...")
+    vectors = []
+    for start in range(0, len(corpus), batch_size):
+        vectors.extend(embeddings.embed_documents(corpus[start:start + batch_size]))
+    vectors = np.asarray(vectors, dtype=np.float32)
+    query_vectors = np.asarray([embeddings.embed_query(query) for query in queries], dtype=np.float32)
+
+    os.makedirs(os.path.dirname(cache) or ".", exist_ok=True)
+    np.savez(cache, vectors=vectors, query_vectors=query_vectors)
+    return {
+        "vectors": vectors, "doc_ids": doc_ids, "queries": queries,
+        "query_vectors": query_vectors, "relevant": relevant,
+    }
+
+
+def exact_top_k(vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> List[set]:
+    """Return the rows of the exact top-k results of each query over full vectors."""
+    scores = normalize(query_vectors) @ normalize(vectors).T
+    return [set(np.argsort(-row)[:k].tolist()) for row in scores]
+
+
+def measure(store: QuantizedVectorStore, corpus: Dict[str, Any], query_vectors: np.ndarray,
+            truth: List[set], k: int, repeats: int) -> List[Dict[str, Any]]:
+    """
+    Query a store and record recall and latency.
+
+    Args:
+        store: The loaded store
+        corpus: The embedded corpus from embed_corpus()
+        query_vectors: Query embeddings, shortened like the store's vectors
+        truth: Exact top-k rows per query
+        k: Number of results to retrieve
+        repeats: Timed repetitions per query
+
+    Returns:
+        One row per query repetition
+    """
+    rows = []
+    for index, query in enumerate(corpus["queries"]):
+        relevant_ids = corpus["relevant"][query]
+        for repeat in range(repeats):
+            started = time.perf_counter()
+            results = store.search_vectors(query_vectors[index], k=k)
+            latency_s = time.perf_counter() - started
+
+            retrieved = [row for row, _ in results]
+            retrieved_ids = {corpus["doc_ids"][row] for row in retrieved}
+            rows.append({
+                "query": query,
+                "repeat": repeat,
+                "latency_s": latency_s,
+                "recall_vs_exact": len(truth[index] & set(retrieved)) / k,
+                "recall_at_k": len(relevant_ids & retrieved_ids) / len(relevant_ids) if relevant_ids else np.nan,
+            })
+    return rows
+
+
+def run_benchmark(size: int = 20000, k: int = 5, repeats: int = 5, cache: str = DEFAULT_CACHE,
+                  seed: int = 0) -> pd.DataFrame:
+    """
+    Run every configuration over the same embedded corpus.
+
+    Args:
+        size: Number of distractor chunks
+        k: Number of results to retrieve
+        repeats: Timed repetitions per query
+        cache: Path of the embedding cache
+        seed: Seed for distractor generation
+
+    Returns:
+        DataFrame with one row per configuration and query repetition
+    """
+    corpus = embed_corpus(size, cache, seed=seed)
+    truth = exact_top_k(corpus["vectors"], corpus["query_vectors"], k)
+    texts = corpus["doc_ids"]
+
+    rows = []
+    for name, dimensions, quantization, rescore_factor in CONFIGURATIONS:
+        vectors, query_vectors = corpus["vectors"], corpus["query_vectors"]
+        if dimensions:
+            vectors = reduce_dimensions(vectors, dimensions)
+            query_vectors = reduce_dimensions(query_vectors, dimensions)
+
+        with tempfile.TemporaryDirectory() as path:
+            store = QuantizedVectorStore(None, path=path, quantization=quantization, rescore_factor=rescore_factor)
+            started = time.perf_counter()
+            for start in range(0, len(vectors), 10_000):
+                store.add_vectors(vectors[start:start + 10_000], texts[start:start + 10_000])
+            build_s = time.perf_counter() - started
+            memory = store.memory_usage()
+
+            print(f"Measuring {name}...")
+            for row in measure(store, corpus, query_vectors, truth, k, repeats):
+                row.update({
+                    "configuration": name,
+                    "dimensions": dimensions or vectors.shape[1],
+                    "quantization": quantization,
+                    "rescore_factor": rescore_factor,
+                    "corpus_size": len(vectors),
+                    "k": k,
+                    "build_s": build_s,
+                    "scan_mb": memory["scan_bytes"] / 1e6,
+                    "side_store_mb": memory["full_precision_bytes"] / 1e6 if quantization != "none" else 0.0,
+                })
+                rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def summarize(results_df: pd.DataFrame) -> pd.DataFrame:
+    """Summarize recall, latency and memory per configuration."""
+    grouped = results_df.groupby("configuration", sort=False)
+    summary = grouped.agg(
+        recall_vs_exact=("recall_vs_exact", "mean"),
+        recall_at_k=("recall_at_k", "mean"),
+        scan_mb=("scan_mb", "first"),
+        side_store_mb=("side_store_mb", "first"),
+    )
+    latency = grouped["latency_s"].quantile([0.5, 0.95]).unstack()
+    latency.columns = [f"latency_p{round(q * 100)}_ms" for q in latency.columns]
+    return summary.join(latency * 1000)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare reduced-dimension and quantized embedding search.")
+    parser.add_argument("--size", type=int, default=20000, help="Number of distractor chunks")
+    parser.add_argument("-k", type=int, default=5, help="Number of results to retrieve")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repetitions per query")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="Embedding cache (.npz)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    set_default_priority(EVAL)
+
+    started_at = datetime.now(timezone.utc)
+    results_df = run_benchmark(size=args.size, k=args.k, repeats=args.repeats, cache=args.cache, seed=args.seed)
+    print(summarize(results_df).to_string())
+
+    run_id = ResultsHistory().append("quantization", results_df, started_at=started_at)
+    print(f"Results recorded as run {run_id}")
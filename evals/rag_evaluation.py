@@ -5,8 +5,9 @@ import json
 import uuid
 import pandas as pd
 from typing import Dict, List, Any
-from langchain_openai import ChatOpenAI
+from utils.llm import chat_model
 from evals.rag_evaluation.test_cases import RAG_TEST_CASES
+from evals.results_history import ResultsHistory
 
 # RAG relevance evaluation prompt template
 RAG_RELEVANCY_PROMPT_TEMPLATE = """
@@ -33,7 +34,7 @@ class RAGEvaluator:
     
     def __init__(self, model="gpt-4"):
         """Initialize with evaluation model."""
-        self.evaluator = ChatOpenAI(model=model, temperature=0)
+        self.evaluator = chat_model(model=model, temperature=0)
         
     def evaluate_document_relevance(self, query: str, document_text: str) -> str:
         """
@@ -112,9 +113,8 @@ class RAGEvaluator:
         print("Detailed results:")
         print(results_df[["query", "document_position", "evaluation", "expected_relevance"]].to_string())
         
-        # Save results to CSV
-        output_path = "evals/rag_eval_results.csv"
-        results_df.to_csv(output_path, index=False)
-        print(f"Results saved to {output_path}")
+        # Append results to the run history
+        run_id = ResultsHistory().append("rag", results_df)
+        print(f"Results recorded as run {run_id}")
         
         return results_df 
\ No newline at end of file
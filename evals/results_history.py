@@ -0,0 +1,386 @@
+"""
+Append-only columnar history of eval results.
+
+Every eval run is written as its own Parquet file under
+evals/results/<kind>/<run_id>.parquet, tagged with the run ID, git SHA and
+timestamps, so runs can be compared instead of overwritten.
+
+Each kind is registered in EVAL_KINDS with the columns its metrics are
+computed from. Benchmarks that compare several configurations in one run
+report their metrics per configuration, e.g. "recall_at_k[int8]".
+
+Usage:
+    python -m evals.results_history runs rag
+    python -m evals.results_history metrics rag
+    python -m evals.results_history diff rag <base_run_id> <head_run_id>
+    python -m evals.results_history metrics quantization
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+RESULTS_DIR = "evals/results"
+
+
+
+class EvalKind(NamedTuple):
+    """The columns an eval kind records and how its metrics are computed from them."""
+    quality_columns: Tuple[str, ...] = ()  # Averaged per run; higher is better
+    latency_columns: Tuple[str, ...] = ()  # Percentiles per run; lower is better
+    cost_columns: Tuple[str, ...] = ()  # Averaged per run; lower is better
+    group_by: Optional[str] = None  # Report metrics per value of this column
+    ranking: bool = False  # Judged document relevance (precision@k, MRR, nDCG@k)
+
+
+EVAL_KINDS = {
+    "rag": EvalKind(quality_columns=("is_correct",), latency_columns=("latency_s",), ranking=True),
+    "tool_calling": EvalKind(
+        quality_columns=("is_correct",), latency_columns=("routing_latency_s", "total_latency_s")
+    ),
+    "retrieval": EvalKind(
+        quality_columns=("recall_at_k",), latency_columns=("latency_s",), cost_columns=("ingest_s",),
+        group_by="corpus_size"
+    ),
+    "quantization": EvalKind(
+        quality_columns=("recall_vs_exact", "recall_at_k"), latency_columns=("latency_s",),
+        cost_columns=("build_s", "scan_mb"), group_by="configuration"
+    ),
+    "splitter": EvalKind(
+        quality_columns=("mb_per_s", "clean_end_rate"), latency_columns=("split_s",),
+        cost_columns=("tokens_cv", "mid_word_start_rate", "duplication_ratio"), group_by="splitter"
+    ),
+}
+
+
+def current_git_sha() -> Optional[str]:
+    """Return the SHA of the checked-out commit, or None outside a git checkout."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def new_run_id() -> str:
+    """Create a sortable, unique run ID."""
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{uuid.uuid4().hex[:6]}"
+
+
+class ResultsHistory:
+    """Append-only Parquet store of eval results."""
+
+    def __init__(self, root: str = RESULTS_DIR):
+        """
+        Initialize the results history.
+
+        Args:
+            root: Directory that holds one sub-directory per eval kind
+        """
+        self.root = root
+
+    def append(self, kind: str, results_df: pd.DataFrame, run_id: Optional[str] = None,
+               started_at: Optional[datetime] = None) -> str:
+        """
+        Append the results of one run.
+
+        Args:
+            kind: The eval kind (see EVAL_KINDS)
+            results_df: Per-case results of the run
+            run_id: Optional run ID (generated if omitted)
+            started_at: Optional start time of the run
+
+        Returns:
+            The run ID the results were stored under
+        """
+        run_id = run_id or new_run_id()
+        recorded_at = datetime.now(timezone.utc)
+
+        df = results_df.copy()
+        if "span_id" in df.columns:
+            # OpenTelemetry span IDs overflow int64
+            df["span_id"] = df["span_id"].astype(str)
+        df.insert(0, "run_id", run_id)
+        df.insert(1, "git_sha", current_git_sha())
+        df.insert(2, "started_at", pd.Timestamp(started_at or recorded_at))
+        df.insert(3, "recorded_at", pd.Timestamp(recorded_at))
+
+        directory = os.path.join(self.root, kind)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{run_id}.parquet")
+        if os.path.exists(path):
+            raise FileExistsError(f"Run {run_id} already recorded for {kind}")
+        df.to_parquet(path, index=False)
+        return run_id
+
+    def load(self, kind: str, run_ids: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Load recorded results.
+
+        Args:
+            kind: The eval kind
+            run_ids: Optional run IDs to restrict to
+
+        Returns:
+            DataFrame with the results of all selected runs
+        """
+        paths = sorted(glob.glob(os.path.join(self.root, kind, "*.parquet")))
+        if run_ids is not None:
+            wanted = set(run_ids)
+            paths = [p for p in paths if os.path.splitext(os.path.basename(p))[0] in wanted]
+        if not paths:
+            return pd.DataFrame()
+        return pd.concat([pd.read_parquet(p) for p in paths], ignore_index=True)
+
+    def runs(self, kind: str) -> pd.DataFrame:
+        """
+        Summarize recorded runs.
+
+        Args:
+            kind: The eval kind
+
+        Returns:
+            One row per run with its git SHA, start time and case count
+        """
+        df = self.load(kind)
+        if df.empty:
+            return df
+        return (
+            df.groupby("run_id")
+            .agg(git_sha=("git_sha", "first"), started_at=("started_at", "first"), cases=("run_id", "size"))
+            .sort_values("started_at")
+        )
+
+
+def means_by_run(df: pd.DataFrame, columns) -> pd.DataFrame:
+    """
+    Average columns per run.
+
+    Args:
+        df: Results of one or more runs
+        columns: Columns to average (missing ones are skipped)
+
+    Returns:
+        DataFrame indexed by run_id with one column per averaged column
+    """
+    present = [column for column in columns if column in df.columns]
+    if not present:
+        return pd.DataFrame()
+    means = df.groupby("run_id")[present].mean()
+    return means.rename(columns={"is_correct": "accuracy"})
+
+
+def latency_percentiles(df: pd.DataFrame, column: str, percentiles=(0.5, 0.95, 0.99)) -> pd.DataFrame:
+    """
+    Compute latency percentiles per run.
+
+    Cached verdicts did no work in their run, so they are excluded.
+
+    Args:
+        df: Results of one or more runs
+        column: Latency column to summarize
+        percentiles: Quantiles to compute
+
+    Returns:
+        DataFrame indexed by run_id with one column per percentile
+    """
+    if column not in df.columns:
+        return pd.DataFrame()
+    measured = df
+    if "cached" in df.columns:
+        measured = df[~df["cached"].fillna(False).astype(bool)]
+    quantiles = measured.groupby("run_id")[column].quantile(list(percentiles)).unstack()
+    quantiles.columns = [f"{column}_p{round(q * 100)}" for q in quantiles.columns]
+    return quantiles
+
+
+def ranking_metrics(df: pd.DataFrame, k: int = 3) -> pd.DataFrame:
+    """
+    Compute precision@k, MRR and nDCG@k per run from judged document relevance.
+
+    Documents are ranked by document_position and a document counts as
+    relevant when the judge labelled it "relevant".
+
+    Args:
+        df: RAG results of one or more runs
+        k: Rank cutoff
+
+    Returns:
+        DataFrame indexed by run_id with precision_at_k, mrr and ndcg_at_k
+    """
+    position = df["document_position"].to_numpy()
+    relevant = (df["evaluation"] == "relevant").to_numpy(dtype=float)
+    in_top_k = position < k
+
+    frame = pd.DataFrame({
+        "run_id": df["run_id"].to_numpy(),
+        "query": df["query"].to_numpy(),
+        "hit_at_k": relevant * in_top_k,
+        "gain_at_k": relevant * in_top_k / np.log2(position + 2),
+        "reciprocal_rank": np.where(relevant > 0, 1.0 / (position + 1), 0.0),
+        "relevant": relevant,
+    })
+    per_query = frame.groupby(["run_id", "query"]).agg(
+        hits=("hit_at_k", "sum"),
+        dcg=("gain_at_k", "sum"),
+        reciprocal_rank=("reciprocal_rank", "max"),
+        relevant=("relevant", "sum"),
+    )
+
+    # Ideal DCG places every relevant document at the top
+    discounts = np.concatenate([[0.0], np.cumsum(1.0 / np.log2(np.arange(k) + 2))])
+    ideal_dcg = discounts[np.minimum(per_query["relevant"].to_numpy(dtype=int), k)]
+    per_query["precision_at_k"] = per_query["hits"] / k
+    per_query["ndcg_at_k"] = np.divide(
+        per_query["dcg"].to_numpy(), ideal_dcg, out=np.zeros(len(per_query)), where=ideal_dcg > 0
+    )
+
+    metrics = per_query.groupby("run_id")[["precision_at_k", "reciprocal_rank", "ndcg_at_k"]].mean()
+    return metrics.rename(columns={
+        "precision_at_k": f"precision_at_{k}",
+        "reciprocal_rank": "mrr",
+        "ndcg_at_k": f"ndcg_at_{k}",
+    })
+
+
+def run_metrics(kind: str, df: pd.DataFrame, k: int = 3) -> pd.DataFrame:
+    """
+    Compute all metrics for the runs in a results DataFrame.
+
+    Args:
+        kind: The eval kind
+        df: Results of one or more runs
+        k: Rank cutoff for ranking metrics
+
+    Returns:
+        DataFrame indexed by run_id with one column per metric (per group
+        for kinds with a group_by column)
+    """
+    spec = EVAL_KINDS.get(kind, EvalKind())
+    if spec.group_by and spec.group_by in df.columns:
+        frames = []
+        for group, group_df in df.groupby(spec.group_by, sort=False):
+            metrics = _metrics(spec, group_df, k)
+            frames.append(metrics.add_suffix(f"[{group}]"))
+        return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+    return _metrics(spec, df, k)
+
+
+def _metrics(spec: EvalKind, df: pd.DataFrame, k: int) -> pd.DataFrame:
+    frames = [means_by_run(df, spec.quality_columns)]
+    if spec.ranking:
+        frames.append(ranking_metrics(df, k=k))
+    for column in spec.latency_columns:
+        frames.append(latency_percentiles(df, column))
+    frames.append(means_by_run(df, spec.cost_columns))
+    frames = [f for f in frames if not f.empty]
+    return pd.concat(frames, axis=1) if frames else pd.DataFrame(index=df["run_id"].unique())
+
+
+def lower_is_better(kind: str, metric: str) -> bool:
+    """Return whether a metric of run_metrics() improves as it decreases."""
+    spec = EVAL_KINDS.get(kind, EvalKind())
+    name = metric.split("[", 1)[0]
+    if name in spec.cost_columns:
+        return True
+    return any(name.startswith(f"{column}_p") for column in spec.latency_columns) or "latency" in name
+
+
+def diff_runs(kind: str, base: str, head: str, history: Optional[ResultsHistory] = None,
+              accuracy_tolerance: float = 0.0, latency_tolerance: float = 0.10, k: int = 3) -> pd.DataFrame:
+    """
+    Compare two runs and flag regressions.
+
+    Quality metrics regress when they drop by more than accuracy_tolerance
+    (absolute); latency percentiles and costs regress when they grow by more
+    than latency_tolerance (relative).
+
+    Args:
+        kind: The eval kind
+        base: Run ID to compare against
+        head: Run ID being checked
+        history: Results history to read from
+        accuracy_tolerance: Allowed absolute drop in quality metrics
+        latency_tolerance: Allowed relative increase in latency
+        k: Rank cutoff for ranking metrics
+
+    Returns:
+        DataFrame with base, head, delta and regression flag per metric
+    """
+    history = history or ResultsHistory()
+    df = history.load(kind, [base, head])
+    missing = {base, head} - set(df["run_id"].unique() if not df.empty else [])
+    if missing:
+        raise ValueError(f"Unknown {kind} run(s): {', '.join(sorted(missing))}")
+
+    metrics = run_metrics(kind, df, k=k).T
+    diff = pd.DataFrame({"base": metrics[base], "head": metrics[head]})
+    diff["delta"] = diff["head"] - diff["base"]
+
+    is_latency = np.array([lower_is_better(kind, metric) for metric in diff.index], dtype=bool)
+    latency_regressed = diff["head"] > diff["base"] * (1 + latency_tolerance)
+    quality_regressed = diff["delta"] < -accuracy_tolerance
+    diff["regression"] = np.where(is_latency, latency_regressed, quality_regressed)
+    return diff
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Inspect and compare eval runs.")
+    parser.add_argument("--root", default=RESULTS_DIR, help="Results history directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    runs_parser = subparsers.add_parser("runs", help="List recorded runs")
+    runs_parser.add_argument("kind", choices=sorted(EVAL_KINDS))
+
+    metrics_parser = subparsers.add_parser("metrics", help="Show metrics for every run")
+    metrics_parser.add_argument("kind", choices=sorted(EVAL_KINDS))
+    metrics_parser.add_argument("-k", type=int, default=3, help="Rank cutoff")
+
+    diff_parser = subparsers.add_parser("diff", help="Flag regressions between two runs")
+    diff_parser.add_argument("kind", choices=sorted(EVAL_KINDS))
+    diff_parser.add_argument("base")
+    diff_parser.add_argument("head")
+    diff_parser.add_argument("-k", type=int, default=3, help="Rank cutoff")
+    diff_parser.add_argument("--accuracy-tolerance", type=float, default=0.0)
+    diff_parser.add_argument("--latency-tolerance", type=float, default=0.10)
+
+    args = parser.parse_args(argv)
+    history = ResultsHistory(args.root)
+
+    if args.command == "runs":
+        print(history.runs(args.kind).to_string())
+        return 0
+    if args.command == "metrics":
+        df = history.load(args.kind)
+        if df.empty:
+            print(f"No {args.kind} runs recorded")
+            return 0
+        print(run_metrics(args.kind, df, k=args.k).to_string())
+        return 0
+
+    diff = diff_runs(
+        args.kind, args.base, args.head, history,
+        accuracy_tolerance=args.accuracy_tolerance,
+        latency_tolerance=args.latency_tolerance,
+        k=args.k
+    )
+    print(diff.to_string())
+    regressions = diff.index[diff["regression"]].tolist()
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+Retrieval recall/latency benchmark with synthetic corpus scaling.
+
+Ingests the RAG test-case documents plus growing numbers of synthetic
+distractor chunks into the configured vector backend (VECTOR_STORE_BACKEND)
+and measures recall@k of the documents labelled "relevant" and query latency
+at each corpus size.
+
+Usage:
+    python -m evals.retrieval_benchmark --sizes 10000,100000,1000000 -k 5
+
+Distractors are embedded with the production embedding model, so large
+sizes cost real embedding tokens. Pinecone runs are isolated in their own
+namespace, which is deleted afterwards unless --keep is passed.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from evals.rag_evaluation.test_cases import RAG_TEST_CASES
+from evals.results_history import ResultsHistory
+from utils.rate_limiter import EVAL, set_default_priority
+from utils.vector_store import VectorStoreManager
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# Building blocks for distractors that look like the knowledge base
+# (PRDs, interviews, competitor pages) without answering the test queries
+_SUBJECTS = [
+    "The onboarding checklist", "Our billing page", "The mobile app", "The analytics dashboard",
+    "The notification center", "Single sign-on", "The export wizard", "The integrations hub",
+    "The reporting module", "The admin console", "The search bar", "The calendar view",
+]
+_VERBS = [
+    "reduces", "simplifies", "automates", "highlights", "tracks", "streamlines",
+    "surfaces", "consolidates", "improves", "accelerates",
+]
+_OBJECTS = [
+    "time to first value", "invoice reconciliation", "team permissions", "weekly usage reports",
+    "customer health scores", "webhook delivery", "quarterly planning", "data retention settings",
+    "audit logging", "user provisioning", "churn signals", "support ticket routing",
+]
+_CONTEXTS = [
+    "according to interview participants", "for enterprise workspaces", "in the beta cohort",
+    "on the starter plan", "for operations teams", "as noted in the launch review",
+    "compared with the previous release", "for regulated industries",
+]
+
+
+def synthetic_chunks(count: int, seed: int = 0, offset: int = 0) -> List[str]:
+    """
+    Generate deterministic distractor chunks.
+
+    Args:
+        count: Number of chunks to generate
+        seed: Random seed
+        offset: Index of the first chunk, so batches continue a sequence
+
+    Returns:
+        List of chunk texts
+    """
+    chunks = []
+    for i in range(offset, offset + count):
+        rng = random.Random(seed * 1_000_003 + i)
+        sentences = [
+            f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} {rng.choice(_CONTEXTS)}."
+            for _ in range(rng.randint(2, 5))
+        ]
+        chunks.append(f"[Note {i}] " + " ".join(sentences))
+    return chunks
+
+
+def benchmark_corpus() -> Tuple[List[str], List[Dict[str, Any]], Dict[str, set]]:
+    """
+    Build the labelled part of the corpus from the RAG test cases.
+
+    Returns:
+        Texts, their metadata, and the set of relevant document IDs per query
+    """
+    doc_ids: Dict[str, str] = {}
+    relevant: Dict[str, set] = {}
+    for case in RAG_TEST_CASES:
+        relevant.setdefault(case["query"], set())
+        for doc in case["documents"]:
+            doc_id = doc_ids.setdefault(doc["content"], f"doc-{len(doc_ids)}")
+            if doc["expected_relevance"] == "relevant":
+                relevant[case["query"]].add(doc_id)
+    texts = list(doc_ids)
+    metadatas = [{"benchmark_doc_id": doc_ids[text], "synthetic": False} for text in texts]
+    return texts, metadatas, relevant
+
+
+def _index_count(vector_store, namespace: str):
+    """Return the number of vectors in the namespace, if the backend exposes it."""
+    index = getattr(vector_store, "_index", None)
+    if index is None:
+        return None
+    stats = index.describe_index_stats()
+    namespaces = stats.get("namespaces", {}) if isinstance(stats, dict) else stats.namespaces
+    entry = namespaces.get(namespace)
+    if entry is None:
+        return 0
+    return entry.get("vector_count", 0) if isinstance(entry, dict) else entry.vector_count
+
+
+def wait_until_indexed(vector_store, namespace: str, expected: int, timeout: float = 300.0):
+    """Wait until an eventually consistent backend reports all vectors."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        count = _index_count(vector_store, namespace)
+        if count is None or count >= expected:
+            return
+        time.sleep(2)
+    print(f"Warning: index reports fewer than {expected} vectors after {timeout:.0f}s")
+
+
+def ingest(vector_store, texts: List[str], metadatas: List[Dict[str, Any]], batch_size: int) -> float:
+    """
+    Add texts to the vector store in batches.
+
+    Returns:
+        Seconds spent ingesting
+    """
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        vector_store.add_texts(
+            texts=texts[start:start + batch_size],
+            metadatas=metadatas[start:start + batch_size]
+        )
+    return time.perf_counter() - started
+
+
+def measure(vector_store, relevant: Dict[str, set], k: int, repeats: int) -> List[Dict[str, Any]]:
+    """
+    Query every test case and record recall@k and latency.
+
+    Args:
+        vector_store: The vector store to query
+        relevant: Relevant document IDs per query
+        k: Number of results to retrieve
+        repeats: Timed repetitions per query
+
+    Returns:
+        One row per query repetition
+    """
+    rows = []
+    for query, relevant_ids in relevant.items():
+        for repeat in range(repeats):
+            started = time.perf_counter()
+            results = vector_store.similarity_search(query, k=k)
+            latency_s = time.perf_counter() - started
+
+            retrieved = {doc.metadata.get("benchmark_doc_id") for doc in results}
+            hits = len(relevant_ids & retrieved)
+            rows.append({
+                "query": query,
+                "repeat": repeat,
+                "latency_s": latency_s,
+                "recall_at_k": hits / len(relevant_ids) if relevant_ids else np.nan,
+            })
+    return rows
+
+
+def run_benchmark(sizes: List[int], k: int = 5, repeats: int = 5, batch_size: int = 256,
+                  namespace: str = "retrieval-benchmark", keep: bool = False, seed: int = 0) -> pd.DataFrame:
+    """
+    Run the retrieval benchmark at each corpus size.
+
+    Distractors are added cumulatively, so each size builds on the previous one.
+
+    Args:
+        sizes: Number of distractor chunks at each step
+        k: Number of results to retrieve
+        repeats: Timed repetitions per query
+        batch_size: Texts per add_texts call
+        namespace: Namespace to isolate the benchmark corpus in
+        keep: Keep the benchmark namespace after the run
+        seed: Seed for distractor generation
+
+    Returns:
+        DataFrame with one row per query repetition and corpus size
+    """
+    vector_store = VectorStoreManager.initialize(namespace=namespace)
+    texts, metadatas, relevant = benchmark_corpus()
+
+    rows = []
+    ingested = 0
+    try:
+        print(f"Ingesting {len(texts)} labelled documents...")
+        ingest(vector_store, texts, metadatas, batch_size)
+
+        for size in sorted(sizes):
+            to_add = size - ingested
+            print(f"Ingesting {to_add} distractors (corpus size {size + len(texts)})...")
+            ingest_s = 0.0
+            for start in range(0, to_add, 10_000):
+                batch = synthetic_chunks(min(10_000, to_add - start), seed=seed, offset=ingested + start)
+                ingest_s += ingest(vector_store, batch, [{"synthetic": True}] * len(batch), batch_size)
+            ingested = size
+            wait_until_indexed(vector_store, namespace, ingested + len(texts))
+
+            for row in measure(vector_store, relevant, k, repeats):
+                row.update({"distractors": size, "corpus_size": size + len(texts), "k": k, "ingest_s": ingest_s})
+                rows.append(row)
+    finally:
+        if not keep and getattr(vector_store, "_index", None) is not None:
+            vector_store.delete(delete_all=True, namespace=namespace)
+
+    return pd.DataFrame(rows)
+
+
+def summarize(results_df: pd.DataFrame) -> pd.DataFrame:
+    """Summarize recall and latency per corpus size."""
+    grouped = results_df.groupby("corpus_size")
+    summary = grouped.agg(
+        recall_at_k=("recall_at_k", "mean"),
+        ingest_s=("ingest_s", "first"),
+    )
+    latency = grouped["latency_s"].quantile([0.5, 0.95, 0.99]).unstack()
+    latency.columns = [f"latency_p{round(q * 100)}_ms" for q in latency.columns]
+    return summary.join(latency * 1000)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark retrieval recall and latency as the corpus grows.")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated distractor counts")
+    parser.add_argument("-k", type=int, default=5, help="Number of results to retrieve")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repetitions per query")
+    parser.add_argument("--batch-size", type=int, default=256, help="Texts per upsert")
+    parser.add_argument("--namespace", default="retrieval-benchmark")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark namespace")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    set_default_priority(EVAL)
+
+    started_at = datetime.now(timezone.utc)
+    results_df = run_benchmark(
+        sizes=[int(s) for s in args.sizes.split(",") if s],
+        k=args.k,
+        repeats=args.repeats,
+        batch_size=args.batch_size,
+        namespace=args.namespace,
+        keep=args.keep,
+        seed=args.seed
+    )
+    print(summarize(results_df).to_string())
+
+    run_id = ResultsHistory().append("retrieval", results_df, started_at=started_at)
+    print(f"Results recorded as run {run_id}")
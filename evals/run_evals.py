@@ -6,18 +6,26 @@ import sys
 import os
 import pandas as pd
 from typing import List, Dict, Any
+import tempfile
 import uuid
 import time
+from datetime import datetime, timezone
 
 # Add project root to path so we can import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from evals.tool_calling.test_cases import TEST_CASES
 from evals.rag_evaluation.test_cases import RAG_TEST_CASES
+from evals.tool_calling.evaluation import run_agent_trajectories, score_tool_calls
+from evals.eval_cache import EvalCache, fingerprint, tool_definitions_digest
+from evals.results_history import ResultsHistory, run_metrics
 from tools import PositioningTool, ScrapingTool, SlackTool, RAGTool
+from agents import RouterAgent
+from agents.prompts.routing import ROUTING_EXAMPLES
 
 # Phoenix imports
-from langchain_openai import ChatOpenAI
+from utils.llm import chat_model
+from utils.rate_limiter import EVAL, set_default_priority
 import phoenix as px
 from phoenix.trace import SpanEvaluations, DocumentEvaluations
 from utils.tracing import initialize_tracer, create_span
@@ -31,7 +39,7 @@ if not os.environ.get("PHOENIX_API_KEY"):
 
 # Mock classes for dependencies
 class MockVectorStore:
-    def similarity_search(self, query, k=5):
+    def similarity_search(self, query, k=5, filter=None):
         # Return mock documents based on test cases
         for case in RAG_TEST_CASES:
             if case["query"] == query:
@@ -63,155 +71,249 @@ def format_tool_definitions(tools: List) -> str:
         tool_defs.append(tool_def)
     return json.dumps(tool_defs, indent=2)
 
-def simulate_tool_call(case: Dict[str, Any]) -> Dict[str, Any]:
-    """Simulate a tool call based on test case expected values."""
-    return {
-        "name": case["expected_tool"],
-        "parameters": case["expected_params"]
-    }
+class MockSlackClient:
+    def chat_postMessage(self, *args, **kwargs):
+        return {"ok": True}
 
-def run_tool_calling_evals(log_to_phoenix=True):
-    """Run tool calling evaluations and log to Phoenix."""
-    print("Running tool calling evaluations...")
-    
-    # Initialize Phoenix tracer
-    if log_to_phoenix:
-        tracer_provider = initialize_tracer()
-    
-    # Initialize tools with mock dependencies
+# Custom tool calling prompt template
+TOOL_CALLING_PROMPT_TEMPLATE = """
+You are an evaluation assistant evaluating questions and tool calls to
+determine whether the tool called would answer the question. The tool
+calls have been generated by a separate agent, and chosen from the list of
+tools provided below. It is your job to decide whether that agent chose
+the right tool to call.
+
+    [BEGIN DATA]
+    ************
+    [Question]: {question}
+    ************
+    [Tool Called]: {tool_call}
+    [END DATA]
+
+Your response must be single word, either "correct" or "incorrect",
+and should not contain any text or characters aside from that word.
+"incorrect" means that the chosen tool would not answer the question,
+the tool includes information that is not presented in the question,
+or that the tool signature includes parameter values that don't match
+the formats specified in the tool signatures below.
+
+"correct" means the correct tool call was chosen, the correct parameters
+were extracted from the question, the tool call generated is runnable and correct,
+and that no outside information not present in the question was used
+in the generated question.
+
+    [Tool Definitions]: {tool_definitions}
+"""
+
+def build_eval_tools() -> List:
+    """Build the agent's tools on top of mock dependencies."""
     mock_vector_store = MockVectorStore()
     mock_scraping_service = MockScrapingService()
     mock_document_service = MockDocumentService()
     
-    tools = [
+    # Never post to a real workspace from an eval run, nor leave
+    # eval messages in the app's outbox
+    slack_tool = SlackTool(
+        client=MockSlackClient(),
+        outbox_path=os.path.join(tempfile.mkdtemp(prefix="fpc-evals-"), "slack_outbox.db")
+    )
+    
+    return [
         PositioningTool(vector_store=mock_vector_store),
         ScrapingTool(scraping_service=mock_scraping_service, document_service=mock_document_service),
-        SlackTool(),
+        slack_tool,
         RAGTool(vector_store=mock_vector_store)
     ]
+
+def judge_tool_call(evaluator, question: str, tool_call: str, json_tools: str) -> str:
+    """Ask the LLM judge whether a tool call answers the question."""
+    prompt = TOOL_CALLING_PROMPT_TEMPLATE.format(
+        question=question,
+        tool_call=tool_call,
+        tool_definitions=json_tools
+    )
     
-    # Format tool definitions
-    json_tools = format_tool_definitions(tools)
+    response = evaluator.invoke(prompt)
+    result = response.content.strip().lower()
     
-    # Custom tool calling prompt template
-    TOOL_CALLING_PROMPT_TEMPLATE = """
-    You are an evaluation assistant evaluating questions and tool calls to
-    determine whether the tool called would answer the question. The tool
-    calls have been generated by a separate agent, and chosen from the list of
-    tools provided below. It is your job to decide whether that agent chose
-    the right tool to call.
-
-        [BEGIN DATA]
-        ************
-        [Question]: {question}
-        ************
-        [Tool Called]: {tool_call}
-        [END DATA]
-
-    Your response must be single word, either "correct" or "incorrect",
-    and should not contain any text or characters aside from that word.
-    "incorrect" means that the chosen tool would not answer the question,
-    the tool includes information that is not presented in the question,
-    or that the tool signature includes parameter values that don't match
-    the formats specified in the tool signatures below.
+    # Validate response
+    if result not in ["correct", "incorrect"]:
+        print(f"Warning: Invalid evaluation result: {result}, defaulting to 'incorrect'")
+        result = "incorrect"
+    return result
 
-    "correct" means the correct tool call was chosen, the correct parameters
-    were extracted from the question, the tool call generated is runnable and correct,
-    and that no outside information not present in the question was used
-    in the generated question.
+def evaluate_trajectory(case: Dict[str, Any], trajectory: Dict[str, Any], evaluator, json_tools: str) -> Dict[str, Any]:
+    """Score a trajectory deterministically and, optionally, with the LLM judge."""
+    score = score_tool_calls(case, trajectory["tool_calls"])
+    first_call = trajectory["tool_calls"][0] if trajectory["tool_calls"] else None
+    tool_call = json.dumps(first_call, indent=2)
+    
+    judge_result = None
+    if evaluator is not None and first_call is not None:
+        judge_result = judge_tool_call(evaluator, case["question"], tool_call, json_tools)
+    
+    return {
+        "called_tool": first_call["name"] if first_call else None,
+        "tool_call": tool_call,
+        "tool_calls": trajectory["tool_calls"],
+        "steps": trajectory["steps"],
+        "route": trajectory["route"],
+        "judge_evaluation": judge_result,
+        "routing_latency_s": trajectory["routing_latency_s"],
+        "total_latency_s": trajectory["total_latency_s"],
+        **score
+    }
 
-        [Tool Definitions]: {tool_definitions}
-    """
+def run_tool_calling_evals(log_to_phoenix=True, use_llm_judge=True, max_workers=8,
+                           incremental=True, judge_model="gpt-4", agent_model="gpt-4"):
+    """Run the router agent on every test case, score its tool calls and log to Phoenix."""
+    print("Running tool calling evaluations...")
+    started_at = datetime.now(timezone.utc)
     
-    # Initialize evaluator
-    evaluator = ChatOpenAI(model="gpt-4", temperature=0)
+    # Initialize Phoenix tracer
+    if log_to_phoenix:
+        tracer_provider = initialize_tracer()
     
-    # Create dataframe from test cases
-    eval_data = []
-    span_ids = []
+    tools = build_eval_tools()
+    agent = RouterAgent(tools=tools, model=agent_model)
     
-    for case in TEST_CASES:
-        tool_call = simulate_tool_call(case)
-        eval_data.append({
-            "question": case["question"],
-            "tool_call": json.dumps(tool_call, indent=2),
-        })
+    # Format tool definitions
+    json_tools = format_tool_definitions(tools)
+    routing_config_digest = fingerprint(agent.routing_config())
+    
+    cache = EvalCache() if incremental else None
+    
+    def case_key(case):
+        return "tool_calling:" + fingerprint(case["question"])
+    
+    def case_fingerprint(case, tool_names):
+        # Only the tools involved in this case affect its verdict
+        return fingerprint(
+            case["question"],
+            case["expected_tool"],
+            case["expected_params"],
+            TOOL_CALLING_PROMPT_TEMPLATE,
+            judge_model if use_llm_judge else None,
+            agent_model,
+            ROUTING_EXAMPLES,
+            routing_config_digest,
+            tool_definitions_digest(tools, tool_names)
+        )
     
-    df = pd.DataFrame(eval_data)
+    # Reuse verdicts whose inputs are unchanged
+    verdicts = {}
+    if cache is not None:
+        for idx, case in enumerate(TEST_CASES):
+            record = cache.record(case_key(case))
+            if record is None:
+                continue
+            tool_names = [case["expected_tool"], *record.get("called_tools", [])]
+            cached = cache.get(case_key(case), case_fingerprint(case, tool_names))
+            if cached is not None:
+                verdicts[idx] = cached
+    pending = [idx for idx in range(len(TEST_CASES)) if idx not in verdicts]
+    print(f"Reusing {len(verdicts)} cached verdicts, evaluating {len(pending)} cases")
+    
+    # Drive the real agent for every changed case concurrently
+    trajectories = dict(zip(
+        pending,
+        run_agent_trajectories(agent, [TEST_CASES[idx] for idx in pending], max_workers=max_workers)
+    ))
+    
+    # Initialize evaluator
+    evaluator = chat_model(model=judge_model, temperature=0) if use_llm_judge else None
     
-    # Run evaluations
     results = []
     
-    for idx, row in df.iterrows():
-        print(f"Evaluating test case {idx+1}/{len(df)}...")
+    for idx, case in enumerate(TEST_CASES):
+        print(f"Scoring test case {idx+1}/{len(TEST_CASES)}...")
+        cached = idx in verdicts
         
         # Create a span for this evaluation
         if log_to_phoenix:
             with create_span("tool_call_evaluation", {
-                "question": row["question"],
-                "tool_call": row["tool_call"]
+                "question": case["question"],
+                "expected_tool": case["expected_tool"],
+                "cached": cached
             }) as span:
                 # Store the span ID for Phoenix logging
                 span_id = span.get_span_context().span_id
-                span_ids.append(span_id)
-                
-                prompt = TOOL_CALLING_PROMPT_TEMPLATE.format(
-                    question=row["question"],
-                    tool_call=row["tool_call"],
-                    tool_definitions=json_tools
-                )
                 
-                response = evaluator.invoke(prompt)
-                result = response.content.strip().lower()
+                if not cached:
+                    verdicts[idx] = evaluate_trajectory(case, trajectories[idx], evaluator, json_tools)
+                verdict = verdicts[idx]
                 
-                # Validate response
-                if result not in ["correct", "incorrect"]:
-                    print(f"Warning: Invalid evaluation result: {result}, defaulting to 'incorrect'")
-                    result = "incorrect"
-                    
                 # Set span attributes
-                span.set_attribute("evaluation_result", result)
-                span.set_attribute("is_correct", result == "correct")
+                span.set_attribute("tool_call", verdict["tool_call"])
+                span.set_attribute("routing_latency_s", verdict["routing_latency_s"] or 0.0)
+                span.set_attribute("total_latency_s", verdict["total_latency_s"] or 0.0)
+                if verdict["judge_evaluation"] is not None:
+                    span.set_attribute("judge_result", verdict["judge_evaluation"])
+                span.set_attribute("tool_match", verdict["tool_match"])
+                span.set_attribute("params_match", verdict["params_match"])
+                span.set_attribute("is_correct", verdict["is_correct"])
         else:
             # Generate a random span ID if not using Phoenix
             span_id = format(uuid.uuid4().int & 0xFFFFFFFFFFFFFFFF, 'x')
-            span_ids.append(span_id)
-            
-            prompt = TOOL_CALLING_PROMPT_TEMPLATE.format(
-                question=row["question"],
-                tool_call=row["tool_call"],
-                tool_definitions=json_tools
-            )
             
-            response = evaluator.invoke(prompt)
-            result = response.content.strip().lower()
-            
-            # Validate response
-            if result not in ["correct", "incorrect"]:
-                print(f"Warning: Invalid evaluation result: {result}, defaulting to 'incorrect'")
-                result = "incorrect"
+            if not cached:
+                verdicts[idx] = evaluate_trajectory(case, trajectories[idx], evaluator, json_tools)
+            verdict = verdicts[idx]
+        
+        if not cached and cache is not None:
+            called_tools = sorted({call["name"] for call in verdict["tool_calls"]})
+            tool_names = [case["expected_tool"], *called_tools]
+            cache.put(case_key(case), case_fingerprint(case, tool_names), verdict, called_tools=called_tools)
         
         results.append({
-            "question": row["question"],
-            "tool_call": row["tool_call"],
-            "evaluation": result,
-            "is_correct": result == "correct",
+            "question": case["question"],
+            "expected_tool": case["expected_tool"],
+            "called_tool": verdict["called_tool"],
+            "tool_call": verdict["tool_call"],
+            "tool_calls": json.dumps(verdict["tool_calls"]),
+            "steps": json.dumps(verdict["steps"]),
+            "route": verdict.get("route"),
+            "tool_match": verdict["tool_match"],
+            "params_match": verdict["params_match"],
+            "is_correct": verdict["is_correct"],
+            "evaluation": "correct" if verdict["is_correct"] else "incorrect",
+            "judge_evaluation": verdict["judge_evaluation"],
+            "routing_latency_s": verdict["routing_latency_s"],
+            "total_latency_s": verdict["total_latency_s"],
+            "cached": cached,
             "span_id": span_id
         })
     
+    if cache is not None:
+        cache.save()
+    
     results_df = pd.DataFrame(results)
     
     # Calculate and print results
     correct_count = results_df["is_correct"].sum()
     total = len(results_df)
     accuracy = correct_count / total if total > 0 else 0
+    routing_latency = results_df["routing_latency_s"].dropna()
+    total_latency = results_df["total_latency_s"].dropna()
     
     print(f"Tool calling accuracy: {accuracy:.2%} ({correct_count}/{total})")
+    print(f"Fast-path routed: {(results_df['route'] == 'fast_path').sum()}/{total}")
+    if use_llm_judge:
+        judged = results_df["judge_evaluation"].dropna()
+        judge_accuracy = (judged == "correct").mean() if len(judged) > 0 else 0
+        print(f"LLM judge agreement: {judge_accuracy:.2%} ({(judged == 'correct').sum()}/{len(judged)})")
+    if len(routing_latency) > 0:
+        print(f"Routing latency: p50={routing_latency.quantile(0.5):.2f}s "
+              f"p95={routing_latency.quantile(0.95):.2f}s max={routing_latency.max():.2f}s")
+        print(f"Total latency: p50={total_latency.quantile(0.5):.2f}s "
+              f"p95={total_latency.quantile(0.95):.2f}s max={total_latency.max():.2f}s")
     print("Detailed results:")
-    print(results_df[["question", "evaluation"]].to_string())
+    print(results_df[["question", "expected_tool", "called_tool", "evaluation", "routing_latency_s"]].to_string())
     
-    # Save results to CSV
-    results_df.to_csv("evals/tool_calling_eval_results.csv", index=False)
+    # Append results to the run history
+    run_id = ResultsHistory().append("tool_calling", results_df, started_at=started_at)
+    print(f"Results recorded as run {run_id}")
+    print(run_metrics("tool_calling", results_df.assign(run_id=run_id)).to_string())
     
     # Log to Phoenix if enabled
     if log_to_phoenix:
@@ -246,16 +348,18 @@ def run_tool_calling_evals(log_to_phoenix=True):
     
     return results_df
 
-def run_rag_evals(log_to_phoenix=True):
+def run_rag_evals(log_to_phoenix=True, incremental=True, judge_model="gpt-4"):
     """Run RAG relevance evaluations and log to Phoenix."""
     print("Running RAG relevance evaluations...")
+    started_at = datetime.now(timezone.utc)
     
     # Initialize Phoenix tracer
     if log_to_phoenix:
         tracer_provider = initialize_tracer()
     
     # Initialize RAG evaluator
-    evaluator = ChatOpenAI(model="gpt-4", temperature=0)
+    evaluator = chat_model(model=judge_model, temperature=0)
+    cache = EvalCache() if incremental else None
     
     # RAG relevance evaluation prompt template
     RAG_RELEVANCY_PROMPT_TEMPLATE = """
@@ -277,6 +381,35 @@ def run_rag_evals(log_to_phoenix=True):
     "relevant" means the reference text contains an answer to the Question.
     """
     
+    def judge_document(query, document_text):
+        """Judge a document, reusing the cached verdict if its inputs are unchanged."""
+        case_key = "rag:" + fingerprint(query, document_text)
+        case_fingerprint = fingerprint(query, document_text, RAG_RELEVANCY_PROMPT_TEMPLATE, judge_model)
+        if cache is not None:
+            cached = cache.get(case_key, case_fingerprint)
+            if cached is not None:
+                return cached["evaluation"], True, cached.get("latency_s")
+        
+        # Evaluate relevance
+        prompt = RAG_RELEVANCY_PROMPT_TEMPLATE.format(
+            query=query,
+            reference=document_text
+        )
+        
+        started = time.perf_counter()
+        response = evaluator.invoke(prompt)
+        latency_s = time.perf_counter() - started
+        result = response.content.strip().lower()
+        
+        # Validate response
+        if result not in ["relevant", "unrelated"]:
+            print(f"Warning: Invalid evaluation result: {result}, defaulting to 'unrelated'")
+            result = "unrelated"
+        
+        if cache is not None:
+            cache.put(case_key, case_fingerprint, {"evaluation": result, "latency_s": latency_s})
+        return result, False, latency_s
+    
     results = []
     
     for test_idx, test_case in enumerate(RAG_TEST_CASES):
@@ -302,20 +435,10 @@ def run_rag_evals(log_to_phoenix=True):
                         doc_span_id = doc_span.get_span_context().span_id
                         
                         # Evaluate relevance
-                        prompt = RAG_RELEVANCY_PROMPT_TEMPLATE.format(
-                            query=query,
-                            reference=document_text
-                        )
-                        
-                        response = evaluator.invoke(prompt)
-                        result = response.content.strip().lower()
-                        
-                        # Validate response
-                        if result not in ["relevant", "unrelated"]:
-                            print(f"Warning: Invalid evaluation result: {result}, defaulting to 'unrelated'")
-                            result = "unrelated"
+                        result, cached, latency_s = judge_document(query, document_text)
                         
                         # Set span attributes
+                        doc_span.set_attribute("cached", cached)
                         doc_span.set_attribute("evaluation_result", result)
                         doc_span.set_attribute("is_relevant", result == "relevant")
                         doc_span.set_attribute("expected_relevance", doc["expected_relevance"])
@@ -327,6 +450,8 @@ def run_rag_evals(log_to_phoenix=True):
                             "evaluation": result,
                             "expected_relevance": doc["expected_relevance"],
                             "is_correct": result == doc["expected_relevance"],
+                            "cached": cached,
+                            "latency_s": latency_s,
                             "span_id": query_span_id,
                             "document_position": doc_idx
                         })
@@ -339,18 +464,7 @@ def run_rag_evals(log_to_phoenix=True):
                 document_text = doc["content"]
                 
                 # Evaluate relevance
-                prompt = RAG_RELEVANCY_PROMPT_TEMPLATE.format(
-                    query=query,
-                    reference=document_text
-                )
-                
-                response = evaluator.invoke(prompt)
-                result = response.content.strip().lower()
-                
-                # Validate response
-                if result not in ["relevant", "unrelated"]:
-                    print(f"Warning: Invalid evaluation result: {result}, defaulting to 'unrelated'")
-                    result = "unrelated"
+                result, cached, latency_s = judge_document(query, document_text)
                 
                 # Record result
                 results.append({
@@ -359,10 +473,15 @@ def run_rag_evals(log_to_phoenix=True):
                     "evaluation": result,
                     "expected_relevance": doc["expected_relevance"],
                     "is_correct": result == doc["expected_relevance"],
+                    "cached": cached,
+                    "latency_s": latency_s,
                     "span_id": query_span_id,
                     "document_position": doc_idx
                 })
     
+    if cache is not None:
+        cache.save()
+    
     results_df = pd.DataFrame(results)
     
     # Calculate and print results
@@ -370,12 +489,15 @@ def run_rag_evals(log_to_phoenix=True):
     total = len(results_df)
     accuracy = correct_count / total if total > 0 else 0
     
+    print(f"Reused {int(results_df['cached'].sum())}/{total} cached verdicts")
     print(f"RAG relevance accuracy: {accuracy:.2%} ({correct_count}/{total})")
     print("Detailed results:")
     print(results_df[["query", "document_position", "evaluation", "expected_relevance"]].to_string())
     
-    # Save results to CSV
-    results_df.to_csv("evals/rag_eval_results.csv", index=False)
+    # Append results to the run history
+    run_id = ResultsHistory().append("rag", results_df, started_at=started_at)
+    print(f"Results recorded as run {run_id}")
+    print(run_metrics("rag", results_df.assign(run_id=run_id)).to_string())
     
     # Log to Phoenix if enabled
     if log_to_phoenix:
@@ -412,6 +534,9 @@ def run_rag_evals(log_to_phoenix=True):
     return results_df
 
 if __name__ == "__main__":
+    # Eval traffic yields to interactive chat on the shared OpenAI limits
+    set_default_priority(EVAL)
+    
     # Run tool calling evaluations
     run_tool_calling_evals()
     
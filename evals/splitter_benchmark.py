@@ -0,0 +1,190 @@
+"""
+Text splitter speed and chunk-quality benchmark.
+
+Splits a corpus of PRDs with the current RecursiveCharacterTextSplitter and
+the token-sized TokenTextSplitter and compares split time, chunk counts,
+chunk sizes in tokens and how often chunks start or end mid-sentence or
+mid-word.
+
+Usage:
+    python -m evals.splitter_benchmark --paths docs/prds --repeats 5
+
+Without --paths the benchmark uses the RAG test-case documents, repeated to
+build PRD-sized documents.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from evals.rag_evaluation.test_cases import RAG_TEST_CASES
+from evals.results_history import ResultsHistory
+from services.text_splitter import TokenTextSplitter
+from utils.tokens import count_tokens
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+SENTENCE_ENDINGS = (".", "!", "?", ":", ")", "\"", "'")
+
+
+def load_corpus(paths: List[str]) -> List[Tuple[str, str]]:
+    """
+    Load the documents to split.
+
+    Args:
+        paths: Files or directories of .pdf, .txt and .md files
+
+    Returns:
+        (name, text) pairs
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for extension in ("pdf", "txt", "md"):
+                files.extend(glob.glob(os.path.join(path, "**", f"*.{extension}"), recursive=True))
+        else:
+            files.append(path)
+
+    corpus = []
+    for file in sorted(files):
+        if file.lower().endswith(".pdf"):
+            text = "\n\n".join(page.page_content for page in PyPDFLoader(file).load())
+        else:
+            with open(file, encoding="utf-8", errors="replace") as f:
+                text = f.read()
+        corpus.append((os.path.basename(file), text))
+    return corpus
+
+
+def synthetic_corpus(copies: int = 20) -> List[Tuple[str, str]]:
+    """
+    Build PRD-sized documents from the RAG test-case documents.
+
+    Args:
+        copies: Times each test case's paragraphs are repeated
+
+    Returns:
+        (name, text) pairs
+    """
+    corpus = []
+    for index, case in enumerate(RAG_TEST_CASES):
+        paragraphs = [f"## {case['query']}"] + [doc["content"] for doc in case["documents"]]
+        corpus.append((f"test-case-{index}", "\n\n".join(paragraphs * copies)))
+    return corpus
+
+
+def chunk_quality(text: str, chunks: List[str]) -> Dict[str, float]:
+    """
+    Measure the sizes and boundaries of the chunks of a text.
+
+    Args:
+        text: The source text
+        chunks: Its chunks
+
+    Returns:
+        Chunk statistics
+    """
+    token_counts = np.array([count_tokens(chunk, EMBEDDING_MODEL) for chunk in chunks])
+    clean_ends = sum(1 for chunk in chunks if chunk.rstrip().endswith(SENTENCE_ENDINGS))
+
+    # A chunk starts mid-word if the character before it in the source is part of the same word
+    mid_word_starts = 0
+    position = 0
+    for chunk in chunks:
+        offset = text.find(chunk, max(position - len(chunk), 0))
+        if offset > 0 and text[offset - 1].isalnum() and chunk[:1].isalnum():
+            mid_word_starts += 1
+        if offset >= 0:
+            position = offset + len(chunk)
+
+    return {
+        "chunk_count": len(chunks),
+        "tokens_mean": float(token_counts.mean()) if len(chunks) else 0.0,
+        "tokens_p95": float(np.percentile(token_counts, 95)) if len(chunks) else 0.0,
+        "tokens_max": int(token_counts.max()) if len(chunks) else 0,
+        "tokens_cv": float(token_counts.std() / token_counts.mean()) if len(chunks) else 0.0,
+        "clean_end_rate": clean_ends / len(chunks) if chunks else 0.0,
+        "mid_word_start_rate": mid_word_starts / len(chunks) if chunks else 0.0,
+        "duplication_ratio": sum(len(chunk) for chunk in chunks) / max(len(text), 1),
+    }
+
+
+def run_benchmark(corpus: List[Tuple[str, str]], repeats: int = 5) -> pd.DataFrame:
+    """
+    Split every document with each splitter.
+
+    Args:
+        corpus: (name, text) pairs
+        repeats: Timed repetitions per document and splitter
+
+    Returns:
+        DataFrame with one row per document and splitter
+    """
+    splitters = {
+        "recursive_1000_chars": RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200),
+        "token_250_tokens": TokenTextSplitter(chunk_size=250, chunk_overlap=50),
+    }
+
+    rows = []
+    for name, text in corpus:
+        for splitter_name, splitter in splitters.items():
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                chunks = splitter.split_text(text)
+                timings.append(time.perf_counter() - started)
+            split_s = float(np.median(timings))
+            rows.append({
+                "document": name,
+                "splitter": splitter_name,
+                "chars": len(text),
+                "split_s": split_s,
+                "mb_per_s": len(text) / 1e6 / split_s if split_s else np.nan,
+                **chunk_quality(text, chunks),
+            })
+    return pd.DataFrame(rows)
+
+
+def summarize(results_df: pd.DataFrame) -> pd.DataFrame:
+    """Summarize speed and chunk quality per splitter."""
+    return results_df.groupby("splitter").agg(
+        documents=("document", "count"),
+        split_s=("split_s", "sum"),
+        mb_per_s=("mb_per_s", "median"),
+        chunk_count=("chunk_count", "sum"),
+        tokens_mean=("tokens_mean", "mean"),
+        tokens_p95=("tokens_p95", "mean"),
+        tokens_max=("tokens_max", "max"),
+        tokens_cv=("tokens_cv", "mean"),
+        clean_end_rate=("clean_end_rate", "mean"),
+        mid_word_start_rate=("mid_word_start_rate", "mean"),
+        duplication_ratio=("duplication_ratio", "mean"),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare text splitters on speed and chunk quality.")
+    parser.add_argument("--paths", nargs="*", default=[], help="PRD files or directories (.pdf, .txt, .md)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repetitions per document")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.paths) if args.paths else synthetic_corpus()
+    print(f"Splitting {len(corpus)} documents ({sum(len(text) for _, text in corpus) / 1e6:.1f} MB)...")
+
+    started_at = datetime.now(timezone.utc)
+    results_df = run_benchmark(corpus, repeats=args.repeats)
+    print(summarize(results_df).to_string())
+
+    run_id = ResultsHistory().append("splitter", results_df, started_at=started_at)
+    print(f"Results recorded as run {run_id}")
@@ -0,0 +1,323 @@
+"""
+Main-content extraction for scraped product pages.
+
+Fetched HTML is reduced to the text an extraction prompt needs:
+
+1. Boilerplate elements are dropped while parsing: scripts and styles,
+   navigation, footers, forms, and elements whose class, id or role marks
+   them as cookie banners, menus, modals, share bars and the like.
+2. The remaining text is split into blocks at block-level elements. Blocks
+   that are mostly link text (menus, link farms) and repeated calls to
+   action are dropped, as in text-density boilerplate removal.
+3. Blocks are grouped into sections at headings, and each section is
+   classified by keywords as overview, pricing, features, audience or
+   other. Only the first section and the relevant ones are kept.
+
+If too little text survives (e.g. a page rendered by JavaScript), the
+boilerplate-free text is used instead, and failing that the full text.
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, NamedTuple, Optional
+
+# Elements whose content is never part of the main content
+BOILERPLATE_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "object",
+    "nav", "footer", "aside", "form", "button", "select", "dialog",
+}
+
+# Elements that start a new block of text
+BLOCK_TAGS = {
+    "address", "article", "blockquote", "body", "dd", "details", "div", "dl", "dt", "figcaption",
+    "figure", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "ol", "p", "pre",
+    "section", "summary", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+}
+
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source",
+    "track", "wbr",
+}
+
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+# Landmark roles of page chrome
+BOILERPLATE_ROLES = {"navigation", "contentinfo", "dialog", "alertdialog", "search", "complementary", "menu", "menubar"}
+
+# Class or id words of page chrome, matched as whole words (e.g. not "subscription")
+_BOILERPLATE_HINT = re.compile(
+    r"(?<![a-z])(?:cookie\w*|consent|gdpr|nav|navbar|navigation|menu|megamenu|footer|breadcrumbs?|"
+    r"social|share|sharing|newsletter|modal|popup|overlay|sidebar|skip|announcement|"
+    r"lang(?:uage)?[-_]?(?:switcher|selector|picker))(?![a-z])",
+    re.IGNORECASE
+)
+
+# Short calls to action repeated across product pages
+_CALL_TO_ACTION = re.compile(
+    r"^(?:learn more|read more|see more|get started|start (?:for )?free|start (?:your )?free trial|"
+    r"try (?:it )?(?:for )?free|sign up|sign in|log ?in|contact (?:us|sales)|book a demo|request a demo|"
+    r"watch (?:the )?(?:video|demo)|talk to sales|see (?:all )?(?:features|plans|pricing))[.!→>\s]*$",
+    re.IGNORECASE
+)
+
+_PRICE = re.compile(r"[$€£¥]\s?\d|\d\s?(?:usd|eur|gbp)\b|/\s?(?:mo|month|yr|year|user|seat)\b", re.IGNORECASE)
+
+# Section labels and the words that suggest them
+SECTION_KEYWORDS = {
+    "overview": (
+        r"\b(?:overview|about|why|how it works|problem|challenge|struggl\w*|pain|tired of|"
+        r"frustrat\w*|instead of|introducing|meet)\b"
+    ),
+    "pricing": (
+        r"\b(?:pric\w*|plans?|per (?:user|seat|month|year)|monthly|annual\w*|billed|free trial|"
+        r"tiers?|starter|pro|business|enterprise|quote|discount|cost)\b"
+    ),
+    "features": (
+        r"\b(?:features?|capabilit\w*|integrat\w*|platform|automat\w*|workflows?|dashboards?|"
+        r"analytics|reports?|api|security|compliance|benefits?|tools?|collaborat\w*|templates?)\b"
+    ),
+    "audience": (
+        r"\b(?:for (?:teams|startups|enterprises?|developers|marketers|agencies|businesses)|"
+        r"use cases?|solutions?|industr\w*|customers?|who (?:it'?s|is) for|built for|designed for|"
+        r"trusted by|small business\w*|teams?|companies)\b"
+    ),
+    "other": (
+        r"\b(?:privacy|terms|cookies?|copyright|all rights reserved|careers|jobs|press|blog|news|"
+        r"legal|sitemap|follow us|newsletter|events|webinars?|investors?|status)\b"
+    ),
+}
+
+# Sections kept for extraction
+RELEVANT_SECTIONS = ("overview", "pricing", "features", "audience")
+
+# Minimum characters of classified content before falling back to all main content
+MIN_CONTENT_CHARS = 300
+
+_SECTION_PATTERNS = {label: re.compile(pattern, re.IGNORECASE) for label, pattern in SECTION_KEYWORDS.items()}
+
+
+class Block(NamedTuple):
+    """A run of text between block-level elements."""
+    text: str
+    link_chars: int
+    heading: int  # Heading level, or 0 for body text
+
+
+class Section(NamedTuple):
+    """A heading and the blocks under it."""
+    heading: str
+    blocks: List[str]
+    label: str
+
+
+class ExtractedPage(NamedTuple):
+    """The result of extract_main_content."""
+    title: str
+    description: str
+    text: str  # Text to extract product data from
+    full_text: str  # All visible text, as loaded before extraction
+    sections: List[Section]
+
+
+class _PageParser(HTMLParser):
+    """Collects the blocks of visible, non-boilerplate text of a page."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[Block] = []
+        self.full_text: List[str] = []
+        self.title = ""
+        self.description = ""
+        self._stack: List[tuple] = []  # (tag, skipped) of open elements
+        self._skip_depth = 0
+        self._link_depth = 0
+        self._heading = 0
+        self._in_title = False
+        self._in_head = False
+        self._text: List[str] = []
+        self._link_chars = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "meta":
+            name = (attrs.get("name") or attrs.get("property") or "").lower()
+            if name in ("description", "og:description") and not self.description:
+                self.description = (attrs.get("content") or "").strip()
+            return
+        if tag == "head":
+            self._in_head = True
+        if tag == "title":
+            self._in_title = True
+        if tag in VOID_TAGS:
+            if tag in ("br", "hr"):
+                self._add_text(" ")
+            return
+
+        skipped = self._is_boilerplate(tag, attrs)
+        if tag in BLOCK_TAGS:
+            self._flush()
+        self._stack.append((tag, skipped))
+        if skipped:
+            self._skip_depth += 1
+        if tag == "a":
+            self._link_depth += 1
+        if tag in HEADING_TAGS:
+            self._heading = int(tag[1])
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self._in_head = False
+        if tag == "title":
+            self._in_title = False
+        if not any(open_tag == tag for open_tag, _ in self._stack):
+            return
+        # Close elements left open inside this one, as browsers do
+        while self._stack:
+            open_tag, skipped = self._stack.pop()
+            if open_tag in BLOCK_TAGS:
+                self._flush()
+            if skipped:
+                self._skip_depth -= 1
+            if open_tag == "a":
+                self._link_depth -= 1
+            if open_tag in HEADING_TAGS:
+                self._heading = 0
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+        if self._in_head or self._stack and self._stack[-1][0] in ("script", "style", "noscript", "template"):
+            return
+        self.full_text.append(data)
+        if self._skip_depth:
+            return
+        self._add_text(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def _add_text(self, data: str):
+        self._text.append(data)
+        if self._link_depth:
+            self._link_chars += len(data.strip())
+
+    def _flush(self):
+        text = " ".join("".join(self._text).split())
+        if text:
+            self.blocks.append(Block(text, min(self._link_chars, len(text)), self._heading))
+        self._text = []
+        self._link_chars = 0
+
+    @staticmethod
+    def _is_boilerplate(tag: str, attrs: Dict[str, Optional[str]]) -> bool:
+        if tag in BOILERPLATE_TAGS:
+            return True
+        if (attrs.get("role") or "").lower() in BOILERPLATE_ROLES:
+            return True
+        if attrs.get("aria-hidden") == "true" or "hidden" in attrs:
+            return True
+        hints = " ".join(filter(None, (attrs.get("class"), attrs.get("id"))))
+        return bool(hints) and _BOILERPLATE_HINT.search(hints) is not None
+
+
+def classify_section(heading: str, text: str) -> str:
+    """
+    Label a section of a product page by keywords.
+
+    Heading matches count three times as much as body matches.
+
+    Args:
+        heading: The section heading (may be empty)
+        text: The section's body text
+
+    Returns:
+        One of 'overview', 'pricing', 'features', 'audience' or 'other'
+    """
+    scores = {}
+    for label, pattern in _SECTION_PATTERNS.items():
+        scores[label] = 3 * len(pattern.findall(heading)) + min(len(pattern.findall(text)), 10)
+    scores["pricing"] += 2 * min(len(_PRICE.findall(text)), 5)
+    label = max(scores, key=scores.get)
+    return label if scores[label] else "other"
+
+
+def _is_content_block(block: Block) -> bool:
+    """Return whether a block is content rather than a menu or call to action."""
+    if block.heading:
+        return True
+    if _CALL_TO_ACTION.match(block.text):
+        return False
+    # Mostly links: a menu or a list of related pages
+    return block.link_chars <= 0.5 * len(block.text)
+
+
+def _sections(blocks: List[Block]) -> List[Section]:
+    """Group blocks into sections at headings and label them."""
+    sections = []
+    heading, body = "", []
+    seen = set()
+
+    def close():
+        if heading or body:
+            sections.append(Section(heading, body, classify_section(heading, " ".join(body))))
+
+    for block in blocks:
+        if block.heading:
+            close()
+            heading, body = block.text, []
+        elif block.text not in seen:
+            body.append(block.text)
+        seen.add(block.text)
+    close()
+    return sections
+
+
+def extract_main_content(html: str) -> ExtractedPage:
+    """
+    Extract the main, extraction-relevant content of a product page.
+
+    Args:
+        html: The page's HTML
+
+    Returns:
+        An ExtractedPage whose text holds the title, meta description and
+        the overview, pricing, features and audience sections as markdown
+    """
+    parser = _PageParser()
+    parser.feed(html)
+    parser.close()
+
+    title = " ".join(parser.title.split())
+    description = " ".join(parser.description.split())
+    full_text = "\n".join(line for line in (" ".join(part.split()) for part in parser.full_text) if line)
+    sections = _sections([block for block in parser.blocks if _is_content_block(block)])
+
+    header = []
+    if title:
+        header.append(f"Title: {title}")
+    if description:
+        header.append(f"Description: {description}")
+
+    def render(kept: List[Section]) -> str:
+        parts = list(header)
+        for section in kept:
+            if section.heading:
+                parts.append(f"## {section.heading}")
+            parts.extend(section.blocks)
+        return "\n".join(parts)
+
+    # The first section introduces the product whatever its keywords
+    relevant = [
+        section for index, section in enumerate(sections)
+        if index == 0 or section.label in RELEVANT_SECTIONS
+    ]
+    text = render(relevant)
+    if len(text) < MIN_CONTENT_CHARS:
+        text = render(sections)
+    if len(text) < MIN_CONTENT_CHARS:
+        text = full_text
+    return ExtractedPage(title, description, text, full_text, sections)
@@ -0,0 +1,461 @@
+"""
+Near-duplicate chunk detection at ingest with MinHash and LSH.
+
+Each chunk is reduced to a MinHash signature of its word shingles, whose
+agreement with another chunk's signature estimates the Jaccard similarity
+of the two. Signatures are banded into an LSH index, so candidates are
+found by a few bucket lookups rather than by comparing every stored chunk.
+Chunks whose estimated similarity to a stored chunk of the same doc_type
+reaches the threshold are skipped before embedding, and recorded with the
+chunk they duplicate so the avoided embeddings and index entries can be
+reported.
+
+The index lives in SQLite next to the other local state, scoped to the
+vector store (index and namespace) it describes.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from utils.metrics import metrics
+from utils.tokens import count_tokens
+
+DEFAULT_DEDUP_PATH = ".fpc/dedup.db"
+
+# Default Jaccard similarity at which a chunk counts as a near-duplicate
+DEFAULT_THRESHOLD = 0.9
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD = re.compile(r"\w+")
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS dedup_chunks (
+        chunk_id TEXT PRIMARY KEY,
+        scope TEXT NOT NULL,
+        doc_type TEXT NOT NULL,
+        source TEXT,
+        signature BLOB NOT NULL,
+        created_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dedup_buckets (
+        scope TEXT NOT NULL,
+        doc_type TEXT NOT NULL,
+        band INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        chunk_id TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS dedup_buckets_lookup ON dedup_buckets (scope, doc_type, band, bucket)",
+    "CREATE INDEX IF NOT EXISTS dedup_buckets_chunk ON dedup_buckets (chunk_id)",
+    """
+    CREATE TABLE IF NOT EXISTS dedup_skipped (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        scope TEXT NOT NULL,
+        duplicate_of TEXT NOT NULL,
+        source TEXT,
+        similarity REAL NOT NULL,
+        tokens INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        text TEXT,
+        metadata TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS dedup_skipped_scope ON dedup_skipped (scope)",
+    "CREATE INDEX IF NOT EXISTS dedup_skipped_duplicate_of ON dedup_skipped (duplicate_of)",
+]
+
+# Columns added to dedup_skipped after it was first created
+_SKIPPED_COLUMNS = {"text": "TEXT", "metadata": "TEXT"}
+
+
+def shingles(text: str, size: int = 5) -> List[int]:
+    """
+    Hash the word shingles of a text.
+
+    Args:
+        text: The text
+        size: Words per shingle
+
+    Returns:
+        32-bit hashes of the distinct shingles (one shingle of all words for
+        texts shorter than size)
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return []
+    if len(words) <= size:
+        return [zlib.crc32(" ".join(words).encode("utf-8"))]
+    return list({
+        zlib.crc32(" ".join(words[index:index + size]).encode("utf-8"))
+        for index in range(len(words) - size + 1)
+    })
+
+
+def optimal_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Choose the LSH bands and rows per band for a similarity threshold.
+
+    Minimizes the probability of missing pairs above the threshold plus that
+    of comparing pairs below it.
+
+    Args:
+        num_perm: Signature length
+        threshold: Jaccard similarity to detect
+
+    Returns:
+        (bands, rows per band)
+    """
+    def collision(similarity, bands, rows):
+        return 1 - (1 - similarity ** rows) ** bands
+
+    best, best_error = (1, num_perm), float("inf")
+    below = np.linspace(0, threshold, 50)
+    above = np.linspace(threshold, 1, 50)
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        false_positives = collision(below, bands, rows).mean() * threshold
+        false_negatives = (1 - collision(above, bands, rows)).mean() * (1 - threshold)
+        if false_positives + false_negatives < best_error:
+            best, best_error = (bands, rows), false_positives + false_negatives
+    return best
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures with random universal hash permutations.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        """
+        Initialize the hasher.
+
+        Args:
+            num_perm: Signature length
+            shingle_size: Words per shingle
+            seed: Seed of the permutations; signatures only compare under the same seed
+        """
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = generator.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Compute the signature of a text.
+
+        Args:
+            text: The text
+
+        Returns:
+            num_perm uint32 minimum hashes
+        """
+        hashes = np.array(shingles(text, self.shingle_size), dtype=np.uint64)
+        if not len(hashes):
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+class Deduplicator:
+    """
+    LSH index of stored chunks that filters near-duplicates out of new ones.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_DEDUP_PATH, scope: str = "default",
+                 threshold: float = DEFAULT_THRESHOLD, num_perm: int = 128, shingle_size: int = 5,
+                 model: str = "text-embedding-3-large"):
+        """
+        Initialize the deduplicator.
+
+        Args:
+            path: Location of the SQLite index, or None to keep it in memory
+                (for vector stores that do not outlive the process)
+            scope: The vector store (index and namespace) the index describes
+            threshold: Estimated Jaccard similarity at which a chunk is skipped
+            num_perm: MinHash signature length
+            shingle_size: Words per shingle
+            model: Embedding model, used to estimate the tokens not embedded
+        """
+        self.path = path
+        self.scope = scope
+        self.threshold = threshold
+        self.model = model
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+        self.bands, self.rows = optimal_bands(num_perm, threshold)
+        self._lock = threading.Lock()
+
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # One connection guarded by the lock, so an in-memory index is shared by all threads
+        self._connection = sqlite3.connect(path or ":memory:", timeout=30, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock, self._connection:
+            if path:
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            columns = {row["name"] for row in self._connection.execute("PRAGMA table_info(dedup_skipped)")}
+            for column, column_type in _SKIPPED_COLUMNS.items():
+                if columns and column not in columns:
+                    self._connection.execute(f"ALTER TABLE dedup_skipped ADD COLUMN {column} {column_type}")
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+
+    def _buckets(self, signature: np.ndarray) -> List[int]:
+        """Hash each band of a signature to a bucket key."""
+        return [
+            int.from_bytes(
+                hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).digest(),
+                "big", signed=True
+            )
+            for band in range(self.bands)
+        ]
+
+    def _find_duplicate(self, doc_type: str, signature: np.ndarray, buckets: List[int],
+                        ignore_ids: Set[str]) -> Tuple[Optional[str], float]:
+        """Return the most similar stored chunk at or above the threshold, and its similarity."""
+        candidates = set()
+        for band, bucket in enumerate(buckets):
+            rows = self._connection.execute(
+                "SELECT chunk_id FROM dedup_buckets WHERE scope = ? AND doc_type = ? AND band = ? AND bucket = ?",
+                (self.scope, doc_type, band, bucket)
+            ).fetchall()
+            candidates.update(row["chunk_id"] for row in rows)
+        candidates -= ignore_ids
+
+        best, best_similarity = None, 0.0
+        for chunk_id in candidates:
+            row = self._connection.execute(
+                "SELECT signature FROM dedup_chunks WHERE chunk_id = ?", (chunk_id,)
+            ).fetchone()
+            if row is None:
+                continue
+            similarity = float(np.mean(np.frombuffer(row["signature"], dtype=np.uint32) == signature))
+            if similarity >= self.threshold and similarity > best_similarity:
+                best, best_similarity = chunk_id, similarity
+        return best, best_similarity
+
+    def filter(self, documents: Sequence[Document], ids: Sequence[str],
+               ignore_ids: Optional[Set[str]] = None) -> Tuple[List[int], List[int]]:
+        """
+        Split chunks into new ones and near-duplicates of stored chunks.
+
+        New chunks are added to the index right away, so duplicates within
+        the same batch, and in batches filtered concurrently, are caught too.
+        Call remove() with their IDs if storing them fails.
+
+        Args:
+            documents: The chunks about to be stored
+            ids: The IDs they will be stored under
+            ignore_ids: Stored chunks not to compare against, e.g. those of
+                the version of a source being replaced
+
+        Returns:
+            (indices of chunks to store, indices of near-duplicates skipped)
+        """
+        signatures = [self.hasher.signature(doc.page_content) for doc in documents]
+        kept, skipped = [], []
+        now = time.time()
+        with self._lock, self._connection:
+            for index, (doc, chunk_id, signature) in enumerate(zip(documents, ids, signatures)):
+                doc_type = str(doc.metadata.get("doc_type", ""))
+                source = doc.metadata.get("source_id") or doc.metadata.get("filename") or doc.metadata.get("source")
+                buckets = self._buckets(signature)
+                duplicate_of, similarity = self._find_duplicate(doc_type, signature, buckets, ignore_ids or set())
+                if duplicate_of is not None:
+                    # The copy is kept so it can be stored if the chunk it duplicates is deleted
+                    self._connection.execute(
+                        "INSERT INTO dedup_skipped (scope, duplicate_of, source, similarity, tokens, created_at, "
+                        "text, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (self.scope, duplicate_of, source, similarity,
+                         count_tokens(doc.page_content, self.model), now,
+                         doc.page_content, json.dumps(doc.metadata, default=str))
+                    )
+                    skipped.append(index)
+                    continue
+                self._index(chunk_id, doc_type, source, signature, buckets, now)
+                kept.append(index)
+
+        if skipped:
+            doc_type = documents[skipped[0]].metadata.get("doc_type", "")
+            metrics.increment("dedup.skipped", len(skipped), doc_type=doc_type)
+        return kept, skipped
+
+    def _index(self, chunk_id: str, doc_type: str, source: Optional[str], signature: np.ndarray,
+               buckets: List[int], now: float):
+        """Add a stored chunk to the index (call with the lock held, in a transaction)."""
+        self._connection.execute(
+            "INSERT OR REPLACE INTO dedup_chunks (chunk_id, scope, doc_type, source, signature, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (chunk_id, self.scope, doc_type, source, signature.tobytes(), now)
+        )
+        self._connection.executemany(
+            "INSERT INTO dedup_buckets (scope, doc_type, band, bucket, chunk_id) VALUES (?, ?, ?, ?, ?)",
+            [(self.scope, doc_type, band, bucket, chunk_id) for band, bucket in enumerate(buckets)]
+        )
+
+    def skipped_copies(self, ids: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        List the skipped copies of stored chunks, e.g. before deleting them.
+
+        Args:
+            ids: IDs of the stored chunks
+
+        Returns:
+            Dictionaries with the skipped copy's 'id', the 'duplicate_of'
+            chunk ID, its 'source', and the 'document' to store in its place,
+            most similar first. Copies skipped before their text was kept
+            are not listed.
+        """
+        ids = list(ids)
+        copies = []
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT id, duplicate_of, source, text, metadata FROM dedup_skipped "
+                    f"WHERE scope = ? AND duplicate_of IN ({placeholders}) AND text IS NOT NULL "
+                    f"ORDER BY similarity DESC, id",
+                    (self.scope, *batch)
+                ).fetchall()
+                copies.extend({
+                    "id": row["id"],
+                    "duplicate_of": row["duplicate_of"],
+                    "source": row["source"],
+                    "document": Document(page_content=row["text"], metadata=json.loads(row["metadata"] or "{}")),
+                } for row in rows)
+        return copies
+
+    def promote(self, skipped_id: int, chunk_id: str):
+        """
+        Index a skipped copy that was stored in place of the chunk it duplicated.
+
+        The other copies skipped as duplicates of that chunk now count as
+        duplicates of the promoted one.
+
+        Args:
+            skipped_id: The copy's 'id' from skipped_copies()
+            chunk_id: The ID the copy was stored under
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT duplicate_of, source, text, metadata FROM dedup_skipped WHERE id = ?", (skipped_id,)
+            ).fetchone()
+            if row is None:
+                return
+            signature = self.hasher.signature(row["text"])
+            doc_type = str(json.loads(row["metadata"] or "{}").get("doc_type", ""))
+            self._index(chunk_id, doc_type, row["source"], signature, self._buckets(signature), time.time())
+            self._connection.execute("DELETE FROM dedup_skipped WHERE id = ?", (skipped_id,))
+            self._connection.execute(
+                "UPDATE dedup_skipped SET duplicate_of = ? WHERE scope = ? AND duplicate_of = ?",
+                (chunk_id, self.scope, row["duplicate_of"])
+            )
+
+    def remove(self, ids: Sequence[str]) -> List[str]:
+        """
+        Remove chunks from the index, e.g. when storing them failed or they
+        were deleted.
+
+        Args:
+            ids: IDs of the chunks
+
+        Returns:
+            Other sources that had chunks skipped as duplicates of the removed
+            ones, and so no longer have that content stored (promote() a
+            skipped copy first to keep it)
+        """
+        ids = list(ids)
+        orphaned = set()
+        with self._lock, self._connection:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT DISTINCT s.source FROM dedup_skipped s JOIN dedup_chunks c ON c.chunk_id = s.duplicate_of "
+                    f"WHERE s.duplicate_of IN ({placeholders}) AND s.source IS NOT NULL "
+                    f"AND (c.source IS NULL OR s.source != c.source)", batch
+                ).fetchall()
+                orphaned.update(row["source"] for row in rows)
+                self._connection.execute(f"DELETE FROM dedup_buckets WHERE chunk_id IN ({placeholders})", batch)
+                self._connection.execute(f"DELETE FROM dedup_chunks WHERE chunk_id IN ({placeholders})", batch)
+                self._connection.execute(
+                    f"DELETE FROM dedup_skipped WHERE duplicate_of IN ({placeholders})", batch
+                )
+        return sorted(orphaned)
+
+    def duplicate_sources(self, chunk_id: str) -> List[str]:
+        """
+        List the sources whose chunks were skipped as duplicates of a stored chunk.
+
+        Args:
+            chunk_id: ID of the stored chunk
+
+        Returns:
+            Source names (filenames or URLs), without repeats
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT DISTINCT source FROM dedup_skipped WHERE scope = ? AND duplicate_of = ? AND source IS NOT NULL",
+                (self.scope, chunk_id)
+            ).fetchall()
+        return [row["source"] for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report what deduplication has saved in this scope.
+
+        Returns:
+            Dictionary with the chunks indexed, the duplicates skipped (each
+            one an embedding call and an index entry avoided) and the
+            estimated embedding tokens avoided
+        """
+        with self._lock:
+            indexed = self._connection.execute(
+                "SELECT COUNT(*) FROM dedup_chunks WHERE scope = ?", (self.scope,)
+            ).fetchone()[0]
+            skipped, tokens = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM dedup_skipped WHERE scope = ?", (self.scope,)
+            ).fetchone()
+        return {
+            "indexed": indexed,
+            "duplicates_skipped": skipped,
+            "embeddings_avoided": skipped,
+            "index_entries_avoided": skipped,
+            "tokens_avoided": tokens,
+        }
+
+
+def create_deduplicator(vector_store, threshold: Optional[float] = None) -> Optional[Deduplicator]:
+    """
+    Create the deduplicator for a vector store.
+
+    Args:
+        vector_store: The vector store chunks are stored in
+        threshold: Jaccard similarity at which chunks are skipped; defaults
+            to the DEDUP_THRESHOLD environment variable, else
+            DEFAULT_THRESHOLD (0 turns deduplication off)
+
+    Returns:
+        A Deduplicator, or None if deduplication is off
+    """
+    if threshold is None:
+        threshold = float(os.environ.get("DEDUP_THRESHOLD", DEFAULT_THRESHOLD))
+    if threshold <= 0:
+        return None
+    # The index must not outlive the vectors it describes
+    path = DEFAULT_DEDUP_PATH if getattr(vector_store, "persistent", False) else None
+    return Deduplicator(path=path, scope=getattr(vector_store, "scope", "default"), threshold=threshold)
@@ -5,116 +5,641 @@ in the vector database.
 
 from langchain_community.document_loaders import (
     PyPDFLoader,
-    TextLoader,
-    CSVLoader
+    TextLoader
 )
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import contextvars
+import io
+import multiprocessing
 import tempfile
+import threading
 import os
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from langchain.schema import Document
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Set, Tuple
+from services.dedup import create_deduplicator
+from services.source_registry import create_source_registry
+from services.table_loader import TableChunker, is_table, iter_rows
+from services.text_splitter import create_text_splitter
+from utils.metrics import metrics
+from utils.single_flight import bump_knowledge_base_generation, normalize_url
 from utils.tracing import create_span
 
+# Chunks embedded and upserted per vector store call when processing many files
+EMBED_BATCH_SIZE = 500
+
+# Table chunks per upsert, and upserts running while the next batch is read
+TABLE_BATCH_SIZE = 200
+MAX_UPSERTS_IN_FLIGHT = 2
+
+_upsert_pool = ThreadPoolExecutor(max_workers=MAX_UPSERTS_IN_FLIGHT, thread_name_prefix="table-upsert")
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+def _get_parse_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Get the process pool files are parsed in, creating it on first use."""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # Spawned rather than forked: forking a process that runs
+            # Streamlit's and the job queue's threads can deadlock the child
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _parse_pool
+
+def _reset_parse_pool():
+    """Drop a broken process pool so the next call starts a new one."""
+    global _parse_pool
+    with _parse_pool_lock:
+        _parse_pool = None
+
+def _get_extension(name: str) -> str:
+    """
+    Get the extension a file is loaded as.
+    
+    Args:
+        name: The file name
+        
+    Returns:
+        The file extension as a string
+    """
+    name = name.lower()
+    if name.endswith('.pdf'):
+        return '.pdf'
+    elif name.endswith('.txt'):
+        return '.txt'
+    return '.txt'
+
+def _get_loader(file_path: str):
+    """
+    Get the appropriate document loader for a file path.
+    
+    Args:
+        file_path: The path to the file
+        
+    Returns:
+        A document loader instance
+    """
+    if file_path.endswith('.pdf'):
+        return PyPDFLoader(file_path)
+    return TextLoader(file_path)
+
+def load_and_split(name: str, data: bytes, doc_type: str, text_splitter) -> List[Document]:
+    """
+    Parse a file and split it into chunks.
+    
+    A module-level function so that it can run in a worker process.
+    
+    Args:
+        name: The file name
+        data: The file contents
+        doc_type: The type of document
+        text_splitter: The splitter to chunk the document with
+        
+    Returns:
+        The chunks
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix=_get_extension(name)) as tmp_file:
+        tmp_file.write(data)
+        tmp_file_path = tmp_file.name
+    try:
+        documents = _get_loader(tmp_file_path).load()
+    finally:
+        os.unlink(tmp_file_path)
+    
+    for doc in documents:
+        doc.metadata['doc_type'] = doc_type
+        doc.metadata['filename'] = name
+    return text_splitter.split_documents(documents)
+
+class UploadedDocument:
+    """
+    File with the interface process_file expects (the same as Streamlit's
+    UploadedFile), held in memory or read from disk on demand.
+    """
+    
+    def __init__(self, name: str, data: Optional[bytes] = None, path: Optional[str] = None):
+        """
+        Initialize the document.
+        
+        Args:
+            name: The file name
+            data: The file contents
+            path: Path to read the contents from instead
+        """
+        self.name = name
+        self._data = data
+        self.path = path
+    
+    def getvalue(self) -> bytes:
+        if self._data is None:
+            with open(self.path, "rb") as f:
+                return f.read()
+        return self._data
+    
+    def open(self):
+        """Open the contents for streaming reads."""
+        if self._data is None:
+            return open(self.path, "rb")
+        return io.BytesIO(self._data)
+
+def _open_upload(uploaded_file):
+    """Open an upload for streaming reads without loading it again."""
+    if hasattr(uploaded_file, "open"):
+        return uploaded_file.open()
+    return io.BytesIO(uploaded_file.getvalue())
+
 class DocumentService:
     """
     Service responsible for processing various document types and storing them
     in the vector database.
+    
+    Every chunk is tracked by its source (file name or competitor URL) and
+    version. Processing a source again replaces its previous version: the
+    new chunks are stored first and the old ones deleted once the new
+    version is complete, so a failed upload leaves the previous version in
+    place.
     """
     
-    def __init__(self, vector_store):
+    def __init__(self, vector_store, parse_workers: Optional[int] = None, text_splitter=None,
+                 deduplicator=None, sources=None):
         """
         Initialize the document service.
         
         Args:
             vector_store: The vector store to use for document storage
+            parse_workers: Processes used to parse files in process_files
+                (defaults to the number of CPUs, at most 8)
+            text_splitter: Splitter to chunk documents with (defaults to
+                create_text_splitter(), configured by TEXT_SPLITTER)
+            deduplicator: Index that filters near-duplicate chunks out before
+                embedding (defaults to create_deduplicator(), configured by
+                DEDUP_THRESHOLD)
+            sources: Registry of chunks by source and version (defaults to
+                create_source_registry())
         """
         self.vector_store = vector_store
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
+        self.parse_workers = parse_workers or min(os.cpu_count() or 1, 8)
+        self.text_splitter = text_splitter or create_text_splitter()
+        self.deduplicator = deduplicator if deduplicator is not None else create_deduplicator(vector_store)
+        self.sources = sources if sources is not None else create_source_registry(vector_store)
+    
+    def _begin_version(self, source: str, doc_type: str, documents: List[Document]) -> int:
+        """Start a new version of a source and tag its chunks with it."""
+        version = self.sources.begin_version(source, doc_type)
+        for doc in documents:
+            doc.metadata["source_id"] = source
+            doc.metadata["source_version"] = version
+        return version
+    
+    def _store(self, documents: List[Document]) -> List[bool]:
+        """
+        Embed and store chunks, skipping near-duplicates of chunks already stored.
+        
+        Chunks must be tagged with their source version (see
+        _begin_version); they are registered as pending before the upsert.
+        
+        Args:
+            documents: The chunks to store
+            
+        Returns:
+            Whether each chunk was stored (False for skipped duplicates)
+        """
+        ids = [uuid.uuid4().hex for _ in documents]
+        versions: Dict[Tuple[str, int, str], List[int]] = {}
+        for index, doc in enumerate(documents):
+            key = (doc.metadata["source_id"], doc.metadata["source_version"], doc.metadata.get("doc_type", ""))
+            versions.setdefault(key, []).append(index)
+        
+        if self.deduplicator is None:
+            kept = list(range(len(documents)))
+        else:
+            # The version being replaced must not make its successor look like a duplicate
+            replaced = {
+                chunk_id for source, _, _ in versions for chunk_id in self.sources.live_chunk_ids(source)
+            }
+            kept, _ = self.deduplicator.filter(documents, ids, ignore_ids=replaced)
+        if kept:
+            kept_set = set(kept)
+            for (source, version, doc_type), indices in versions.items():
+                self.sources.add_chunks(source, version, doc_type, [ids[i] for i in indices if i in kept_set])
+            try:
+                self.vector_store.add_documents(
+                    documents=[documents[index] for index in kept], ids=[ids[index] for index in kept]
+                )
+            except Exception:
+                if self.deduplicator is not None:
+                    self.deduplicator.remove([ids[index] for index in kept])
+                raise
+        stored = [False] * len(documents)
+        for index in kept:
+            stored[index] = True
+        return stored
+    
+    def _commit_version(self, source: str, version: int) -> Tuple[int, List[str]]:
+        """
+        Make a source version live and delete the chunks it replaces.
+        
+        Returns:
+            (chunks deleted, other sources whose content could not be kept;
+            see _delete_chunks)
+        """
+        return self._delete_chunks(self.sources.commit_version(source, version))
+    
+    def _abort_version(self, source: str, version: int):
+        """Delete whatever was stored of a failed source version, leaving the previous one live."""
+        self._delete_chunks(self.sources.abort_version(source, version))
+    
+    def _promote_duplicates(self, chunk_ids: List[str]) -> Set[str]:
+        """
+        Store, in place of chunks about to be deleted, one copy of each that
+        a live source had skipped as a duplicate, so that source keeps its
+        content.
+        
+        Args:
+            chunk_ids: IDs of the chunks about to be deleted
+            
+        Returns:
+            IDs of the chunks whose copy could not be stored, which must not
+            be deleted yet
+        """
+        if self.deduplicator is None or not chunk_ids:
+            return set()
+        promoted = {}
+        for copy in self.deduplicator.skipped_copies(chunk_ids):
+            if copy["duplicate_of"] in promoted:
+                continue
+            metadata = copy["document"].metadata
+            chunk_id = uuid.uuid4().hex
+            # Only copies belonging to a live version are worth keeping
+            if "source_id" in metadata and self.sources.adopt_chunks(
+                metadata["source_id"], metadata["source_version"], metadata.get("doc_type", ""), [chunk_id]
+            ):
+                promoted[copy["duplicate_of"]] = (copy, chunk_id)
+        if not promoted:
+            return set()
+        
+        copies = list(promoted.values())
+        try:
+            self.vector_store.add_documents(
+                documents=[copy["document"] for copy, _ in copies], ids=[chunk_id for _, chunk_id in copies]
+            )
+        except Exception as e:
+            print(f"Error storing duplicates of deleted chunks: {str(e)}")
+            self.sources.forget([chunk_id for _, chunk_id in copies])
+            return set(promoted)
+        for copy, chunk_id in copies:
+            self.deduplicator.promote(copy["id"], chunk_id)
+        metrics.increment("dedup.promoted", len(copies))
+        return set()
+    
+    def _delete_chunks(self, chunk_ids: List[str]) -> Tuple[int, List[str]]:
+        """
+        Delete stale chunks from the vector store.
+        
+        A chunk that live sources had skipped duplicates of is first
+        replaced by one of those copies. Chunks that cannot be deleted, or
+        whose copy cannot be stored, stay stale in the registry for
+        compact() to reclaim.
+        
+        Args:
+            chunk_ids: IDs of the chunks
+            
+        Returns:
+            (chunks deleted, other sources that lost content they had
+            skipped as duplicates and should be processed again; only
+            duplicates skipped before copies were kept)
+        """
+        kept = self._promote_duplicates(chunk_ids)
+        chunk_ids = [chunk_id for chunk_id in chunk_ids if chunk_id not in kept]
+        deleted = 0
+        orphaned = set()
+        for start in range(0, len(chunk_ids), 1000):
+            batch = chunk_ids[start:start + 1000]
+            try:
+                self.vector_store.delete(ids=batch)
+            except Exception as e:
+                print(f"Error deleting chunks: {str(e)}")
+                continue
+            self.sources.forget(batch)
+            if self.deduplicator is not None:
+                orphaned.update(self.deduplicator.remove(batch))
+            deleted += len(batch)
+        return deleted, sorted(orphaned)
     
-    def process_file(self, uploaded_file, doc_type: str) -> bool:
+    def process_file(self, uploaded_file, doc_type: str, progress: Optional[Callable[[str], None]] = None,
+                     group_by: Optional[str] = None, report: Optional[Dict[str, Any]] = None) -> bool:
         """
-        Process a document file and store it in the vector database.
+        Process a document file and store it in the vector database,
+        replacing any earlier version of a file with the same name.
         
         Args:
             uploaded_file: The file to process
             doc_type: The type of document ('requirements', 'interviews', 'strategy')
+            progress: Optional callback called with the name of each stage
+                ('load', 'embed') as it starts
+            group_by: Column to group the rows of CSV, TSV and Excel files by
+            report: Optional dictionary to fill with the chunk_count,
+                duplicates_skipped and reingest_sources (other sources that
+                lost content and should be processed again)
             
         Returns:
             True if processing was successful, False otherwise
         """
+        report = report if report is not None else {}
+        if is_table(uploaded_file.name):
+            result = self.process_table(uploaded_file, doc_type, group_by=group_by, progress=progress)
+            report.update(
+                chunk_count=result["chunk_count"], duplicates_skipped=result["duplicates_skipped"],
+                reingest_sources=result["reingest_sources"]
+            )
+            return result["success"]
         with create_span("process_file", {
             "doc_type": doc_type,
             "filename": uploaded_file.name
         }) as span:
+            progress = progress or (lambda stage: None)
+            version = None
             try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=self._get_extension(uploaded_file)) as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_file_path = tmp_file.name
-
-                loader = self._get_loader(tmp_file_path)
-                documents = loader.load()
-                
-                # Add metadata about document type
-                for doc in documents:
-                    doc.metadata['doc_type'] = doc_type
-                
-                # Split and store in vector database
-                split_docs = self.text_splitter.split_documents(documents)
-                self.vector_store.add_documents(documents=split_docs)
+                progress("load")
+                split_docs = load_and_split(uploaded_file.name, uploaded_file.getvalue(), doc_type, self.text_splitter)
+                version = self._begin_version(uploaded_file.name, doc_type, split_docs)
+                progress("embed")
+                stored = sum(self._store(split_docs))
+                replaced, orphaned = self._commit_version(uploaded_file.name, version)
+                bump_knowledge_base_generation()
+                report.update(
+                    chunk_count=stored, duplicates_skipped=len(split_docs) - stored, reingest_sources=orphaned
+                )
                 
                 span.set_attribute("success", True)
-                span.set_attribute("document_count", len(documents))
-                span.set_attribute("chunk_count", len(split_docs))
+                span.set_attribute("chunk_count", stored)
+                span.set_attribute("duplicates_skipped", len(split_docs) - stored)
+                span.set_attribute("chunks_replaced", replaced)
                 
                 return True
             except Exception as e:
+                if version is not None:
+                    self._abort_version(uploaded_file.name, version)
                 span.set_attribute("success", False)
                 span.set_attribute("error", str(e))
                 print(f"Error processing file: {str(e)}")
                 return False
-            finally:
+    
+    def process_files(self, uploaded_files: List, doc_type: str,
+                      progress: Optional[Callable[[str], None]] = None,
+                      group_by: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Process several document files and store them in the vector database.
+        
+        Files are parsed and split in parallel worker processes, then the
+        chunks of all files are embedded and stored in batches. CSV, TSV and
+        Excel files are streamed with process_table instead. A file that
+        fails does not stop the others, and is rolled back; each file that
+        succeeds replaces any earlier version of the same name.
+        
+        Args:
+            uploaded_files: The files to process
+            doc_type: The type of document ('requirements', 'interviews', 'strategy')
+            progress: Optional callback called with the name of each stage
+                ('parse', 'embed') as it starts
+            group_by: Column to group the rows of CSV, TSV and Excel files by
+            
+        Returns:
+            Dictionary with a 'files' list of per-file results (name, success,
+            chunk_count, duplicates_skipped, reingest_sources, error), the
+            totals 'chunk_count' stored and 'duplicates_skipped', and the
+            'reingest_sources' of all files
+        """
+        with create_span("process_files", {
+            "doc_type": doc_type,
+            "file_count": len(uploaded_files)
+        }) as span:
+            progress = progress or (lambda stage: None)
+            results = [
+                {
+                    "name": file.name, "success": False, "chunk_count": 0, "duplicates_skipped": 0,
+                    "reingest_sources": [], "error": None
+                }
+                for file in uploaded_files
+            ]
+            tables = [index for index, file in enumerate(uploaded_files) if is_table(file.name)]
+            documents = [index for index, file in enumerate(uploaded_files) if not is_table(file.name)]
+            
+            progress("parse")
+            chunks_by_file = {}
+            if documents:
+                parsed = self._parse_files(
+                    [uploaded_files[index] for index in documents], doc_type,
+                    [results[index] for index in documents]
+                )
+                chunks_by_file = {documents[position]: chunks for position, chunks in parsed.items()}
+            versions = {
+                index: self._begin_version(uploaded_files[index].name, doc_type, chunks)
+                for index, chunks in chunks_by_file.items()
+            }
+            
+            progress("embed")
+            # Batches span files, so many small files share embedding calls
+            pending = [(index, chunk) for index, chunks in chunks_by_file.items() for chunk in chunks]
+            failed = set()
+            counts = {index: [0, 0] for index in chunks_by_file}
+            for start in range(0, len(pending), EMBED_BATCH_SIZE):
+                batch = pending[start:start + EMBED_BATCH_SIZE]
                 try:
-                    os.unlink(tmp_file_path)
-                except:
-                    pass
+                    flags = self._store([chunk for _, chunk in batch])
+                except Exception as e:
+                    print(f"Error storing chunks: {str(e)}")
+                    for index, _ in batch:
+                        failed.add(index)
+                        results[index]["error"] = f"Error storing chunks: {str(e)}"
+                    continue
+                for (index, _), was_stored in zip(batch, flags):
+                    counts[index][0 if was_stored else 1] += 1
+            
+            stored = 0
+            for index, (chunk_count, duplicates) in counts.items():
+                if index in failed:
+                    self._abort_version(uploaded_files[index].name, versions[index])
+                    continue
+                _, orphaned = self._commit_version(uploaded_files[index].name, versions[index])
+                results[index].update(
+                    success=True, chunk_count=chunk_count, duplicates_skipped=duplicates, reingest_sources=orphaned
+                )
+                stored += chunk_count
+            if stored:
+                bump_knowledge_base_generation()
+            
+            # Tables stream their own embedding pipeline, one file at a time
+            for index in tables:
+                results[index] = self.process_table(uploaded_files[index], doc_type, group_by=group_by)
+                stored += results[index]["chunk_count"]
             
-    def _get_extension(self, file) -> str:
+            succeeded = sum(1 for result in results if result["success"])
+            skipped = sum(result.get("duplicates_skipped", 0) for result in results)
+            span.set_attribute("success", succeeded == len(results))
+            span.set_attribute("succeeded_count", succeeded)
+            span.set_attribute("chunk_count", stored)
+            span.set_attribute("duplicates_skipped", skipped)
+            orphaned = sorted({source for result in results for source in result.get("reingest_sources", [])})
+            return {
+                "files": results, "chunk_count": stored, "duplicates_skipped": skipped, "reingest_sources": orphaned
+            }
+    
+    def _parse_files(self, uploaded_files: List, doc_type: str,
+                     results: List[Dict[str, Any]]) -> Dict[int, List[Document]]:
         """
-        Get the file extension from a file object.
+        Parse and split files in the process pool, recording failures in results.
         
         Args:
-            file: The file object
+            uploaded_files: The files to parse
+            doc_type: The type of document
+            results: Per-file results, updated with errors
             
         Returns:
-            The file extension as a string
+            Chunks per file index for the files that parsed
         """
-        name = file.name.lower()
-        if name.endswith('.pdf'):
-            return '.pdf'
-        elif name.endswith('.txt'):
-            return '.txt'
-        return '.txt'
+        chunks_by_file = {}
+        # A single file is not worth the round trip to a worker process
+        if len(uploaded_files) == 1:
+            file = uploaded_files[0]
+            try:
+                chunks_by_file[0] = load_and_split(file.name, file.getvalue(), doc_type, self.text_splitter)
+            except Exception as e:
+                print(f"Error parsing {file.name}: {str(e)}")
+                results[0]["error"] = f"Error parsing file: {str(e)}"
+            return chunks_by_file
         
-    def _get_loader(self, file_path: str):
+        pool = _get_parse_pool(self.parse_workers)
+        futures = {
+            pool.submit(load_and_split, file.name, file.getvalue(), doc_type, self.text_splitter): index
+            for index, file in enumerate(uploaded_files)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                chunks_by_file[index] = future.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    _reset_parse_pool()
+                print(f"Error parsing {results[index]['name']}: {str(e)}")
+                results[index]["error"] = f"Error parsing file: {str(e)}"
+        return chunks_by_file
+
+    def process_table(self, uploaded_file, doc_type: str, group_by: Optional[str] = None,
+                      metadata_columns: Optional[List[str]] = None,
+                      progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
-        Get the appropriate document loader for a file path.
+        Stream a CSV, TSV or Excel file into the vector database.
+        
+        Rows are read in batches and grouped into chunks by a key column;
+        each batch is embedded and stored while the next one is read, with
+        at most MAX_UPSERTS_IN_FLIGHT batches pending, so memory stays flat
+        however large the file is. The file replaces any earlier version of
+        the same name once all of it is stored; if it fails, what was stored
+        is rolled back.
         
         Args:
-            file_path: The path to the file
+            uploaded_file: The file to process
+            doc_type: The type of document ('requirements', 'interviews', 'strategy')
+            group_by: Column whose value groups rows into chunks (e.g.
+                respondent_id); detected from common names if omitted
+            metadata_columns: Columns copied into chunk metadata (e.g.
+                respondent, segment); detected from common names if omitted
+            progress: Optional callback called with the name of each stage
+                ('load', 'embed') as it starts
             
         Returns:
-            A document loader instance
+            Dictionary with the file's name, success, rows read, chunk_count
+            stored, duplicates_skipped, reingest_sources and error
         """
-        if file_path.endswith('.pdf'):
-            return PyPDFLoader(file_path)
-        return TextLoader(file_path)
-
+        with create_span("process_table", {
+            "doc_type": doc_type,
+            "filename": uploaded_file.name,
+            "group_by": group_by or ""
+        }) as span:
+            progress = progress or (lambda stage: None)
+            chunker = TableChunker(group_by=group_by, metadata_columns=metadata_columns)
+            result = {
+                "name": uploaded_file.name, "success": False, "rows": 0, "chunk_count": 0,
+                "duplicates_skipped": 0, "reingest_sources": [], "error": None
+            }
+            in_flight = deque()
+            version = self.sources.begin_version(uploaded_file.name, doc_type)
+            
+            def record(flags: List[bool]):
+                result["chunk_count"] += sum(flags)
+                result["duplicates_skipped"] += len(flags) - sum(flags)
+            
+            def wait_oldest():
+                record(in_flight.popleft().result())
+            
+            def submit(batch: List[Document]):
+                if not in_flight:
+                    progress("embed")
+                if len(in_flight) >= MAX_UPSERTS_IN_FLIGHT:
+                    wait_oldest()
+                # Each upsert runs in a copy of this context, keeping the caller's LLM priority
+                context = contextvars.copy_context()
+                in_flight.append(_upsert_pool.submit(context.run, self._store, batch))
+            
+            try:
+                progress("load")
+                with _open_upload(uploaded_file) as file:
+                    rows = iter_rows(file, uploaded_file.name)
+                    try:
+                        batch = []
+                        metadata = {
+                            "doc_type": doc_type, "filename": uploaded_file.name,
+                            "source_id": uploaded_file.name, "source_version": version
+                        }
+                        for chunk in chunker.chunks(rows, metadata):
+                            result["rows"] = chunk.metadata["row_end"]
+                            # A single row with a long free-text answer is split like any document
+                            if len(chunk.page_content) > chunker.chunk_chars * 2:
+                                batch.extend(self.text_splitter.split_documents([chunk]))
+                            else:
+                                batch.append(chunk)
+                            if len(batch) >= TABLE_BATCH_SIZE:
+                                submit(batch)
+                                batch = []
+                        if batch:
+                            submit(batch)
+                    finally:
+                        # Release the reader while the file is still open
+                        rows.close()
+                while in_flight:
+                    wait_oldest()
+                _, result["reingest_sources"] = self._commit_version(uploaded_file.name, version)
+                result["success"] = True
+            except Exception as e:
+                # Let upserts already sent finish before rolling them back
+                for future in in_flight:
+                    future.exception()
+                self._abort_version(uploaded_file.name, version)
+                result["chunk_count"] = 0
+                result["error"] = str(e)
+                print(f"Error processing table: {str(e)}")
+            
+            if result["success"]:
+                bump_knowledge_base_generation()
+            span.set_attribute("success", result["success"])
+            span.set_attribute("row_count", result["rows"])
+            span.set_attribute("chunk_count", result["chunk_count"])
+            span.set_attribute("duplicates_skipped", result["duplicates_skipped"])
+            if result["error"]:
+                span.set_attribute("error", result["error"])
+            return result
+    
     def process_competitor(self, competitor_data: Dict[str, Any]) -> bool:
         """
-        Process and store competitor analysis data.
+        Process and store competitor analysis data, replacing the previous
+        analysis of the same URL.
         
         Args:
             competitor_data: Dictionary containing competitor data
@@ -125,6 +650,8 @@ class DocumentService:
         with create_span("process_competitor", {
             "competitor": competitor_data.get('name', 'unknown')
         }) as span:
+            source = normalize_url(competitor_data["url"]) if competitor_data.get("url") else competitor_data["name"]
+            version = None
             try:
                 # Create a document from competitor data
                 content = f"""
@@ -139,12 +666,14 @@ class DocumentService:
                     page_content=content,
                     metadata={
                         'doc_type': 'competitor',
-                        'source': 'product_page'
+                        'source': 'product_page',
+                        'url': competitor_data.get('url', '')
                     }
                 )
                 
                 # Split and store in vector database
                 split_docs = self.text_splitter.split_documents([doc])
+                version = self._begin_version(source, "competitor", split_docs)
                 
                 # Add separate span for embeddings
                 with create_span("create_embeddings", {
@@ -152,13 +681,100 @@ class DocumentService:
                     "competitor": competitor_data.get('name', 'unknown'),
                     "chunk_count": len(split_docs)
                 }) as embed_span:
-                    self.vector_store.add_documents(documents=split_docs)
+                    stored = sum(self._store(split_docs))
+                    replaced, orphaned = self._commit_version(source, version)
+                    if orphaned:
+                        print(f"Sources to process again after replacing {source}: {', '.join(orphaned)}")
+                    bump_knowledge_base_generation()
                     embed_span.set_attribute("success", True)
+                    embed_span.set_attribute("duplicates_skipped", len(split_docs) - stored)
+                    embed_span.set_attribute("chunks_replaced", replaced)
                 
                 span.set_attribute("success", True)
                 return True
             except Exception as e:
+                if version is not None:
+                    self._abort_version(source, version)
                 span.set_attribute("success", False)
                 span.set_attribute("error", str(e))
                 print(f"Error processing competitor data: {str(e)}")
-                return False 
\ No newline at end of file
+                return False 
+    
+    def list_sources(self, doc_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        List the sources in the knowledge base.
+        
+        Args:
+            doc_type: Only list sources of this type
+            
+        Returns:
+            Dictionaries with the source, doc_type, live version, chunk_count
+            and updated_at (Unix time), most recently updated first
+        """
+        return self.sources.sources(doc_type)
+    
+    def delete_source(self, source: str) -> Dict[str, Any]:
+        """
+        Delete every chunk of a source from the vector database.
+        
+        Args:
+            source: The file name or normalized competitor URL
+            
+        Returns:
+            Dictionary with the source, chunks_deleted and reingest_sources,
+            the sources that should be processed again because chunks of
+            theirs were skipped as duplicates of the deleted ones
+        """
+        with create_span("delete_source", {"source": source}) as span:
+            deleted, orphaned = self._delete_chunks(self.sources.retire(source))
+            if deleted:
+                bump_knowledge_base_generation()
+            span.set_attribute("chunks_deleted", deleted)
+            return {"source": source, "chunks_deleted": deleted, "reingest_sources": orphaned}
+    
+    def expire_sources(self, max_age_days: float, doc_type: Optional[str] = "competitor") -> Dict[str, Any]:
+        """
+        Delete sources that have not been refreshed for a number of days.
+        
+        Args:
+            max_age_days: Maximum age of a source's live version
+            doc_type: Only expire sources of this type (None for all)
+            
+        Returns:
+            Dictionary with the expired sources, chunks_deleted and reingest_sources
+        """
+        with create_span("expire_sources", {"max_age_days": max_age_days, "doc_type": doc_type or ""}) as span:
+            expired = self.sources.expired_sources(max_age_days, doc_type)
+            deleted = 0
+            orphaned = set()
+            for source in expired:
+                result = self.delete_source(source)
+                deleted += result["chunks_deleted"]
+                orphaned.update(result["reingest_sources"])
+            span.set_attribute("source_count", len(expired))
+            span.set_attribute("chunks_deleted", deleted)
+            return {"sources": expired, "chunks_deleted": deleted, "reingest_sources": sorted(orphaned - set(expired))}
+    
+    def compact(self) -> Dict[str, Any]:
+        """
+        Delete chunks left behind by replaced versions whose delete failed
+        and by ingestions that did not finish.
+        
+        Chunks stored before sources were tracked are not known to the
+        registry and are left alone.
+        
+        Returns:
+            Dictionary with chunks_reclaimed, chunks_failed and reingest_sources
+        """
+        with create_span("compact_vector_store") as span:
+            reclaimable = self.sources.reclaimable_chunk_ids()
+            reclaimed, orphaned = self._delete_chunks(reclaimable)
+            if reclaimed:
+                bump_knowledge_base_generation()
+            span.set_attribute("chunks_reclaimed", reclaimed)
+            span.set_attribute("chunks_failed", len(reclaimable) - reclaimed)
+            return {
+                "chunks_reclaimed": reclaimed,
+                "chunks_failed": len(reclaimable) - reclaimed,
+                "reingest_sources": orphaned,
+            }
@@ -0,0 +1,178 @@
+"""
+Background jobs for document ingestion and competitor analysis.
+"""
+
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+from services.document_service import UploadedDocument
+from utils.job_queue import DEFAULT_JOBS_PATH, JobContext, JobError, JobQueue
+from utils.rate_limiter import BATCH, priority_scope
+
+PROCESS_FILE = "process_file"
+PROCESS_FILES = "process_files"
+ANALYZE_COMPETITOR = "analyze_competitor"
+
+
+class IngestionJobs:
+    """
+    Submits document and competitor processing as background jobs.
+    """
+
+    def __init__(self, document_service, scraping_tool, path: str = DEFAULT_JOBS_PATH, max_workers: int = 2):
+        """
+        Initialize the ingestion jobs and resume any unfinished ones.
+
+        Args:
+            document_service: Service for processing and storing documents
+            scraping_tool: Tool for analyzing competitor websites
+            path: Location of the SQLite job table
+            max_workers: Number of jobs that run at once
+        """
+        self.document_service = document_service
+        self.scraping_tool = scraping_tool
+        # Uploads are kept next to the job table until their job finishes
+        self.upload_dir = os.path.join(os.path.dirname(path) or ".", "uploads")
+        os.makedirs(self.upload_dir, exist_ok=True)
+
+        self.queue = JobQueue(path=path, max_workers=max_workers)
+        self.queue.register(PROCESS_FILE, self._batch(self._process_file), stages=["load", "embed"])
+        self.queue.register(PROCESS_FILES, self._batch(self._process_files), stages=["parse", "embed"])
+        self.queue.register(ANALYZE_COMPETITOR, self._batch(self._analyze_competitor), stages=["scrape", "store"])
+        self.queue.start()
+
+    def submit_file(self, uploaded_file, doc_type: str, group_by: Optional[str] = None) -> str:
+        """
+        Submit a document for processing.
+
+        Args:
+            uploaded_file: The file to process
+            doc_type: The type of document ('requirements', 'interviews', 'strategy')
+            group_by: Column to group the rows of CSV, TSV and Excel files by
+
+        Returns:
+            The job ID
+        """
+        path = self._save_upload(uploaded_file)
+        return self.queue.submit(PROCESS_FILE, {
+            "path": path, "name": uploaded_file.name, "doc_type": doc_type, "group_by": group_by
+        })
+
+    def submit_files(self, uploaded_files: List, doc_type: str, group_by: Optional[str] = None) -> str:
+        """
+        Submit several documents for processing as one job.
+
+        The files are parsed in parallel and embedded together; the job
+        result reports the outcome of each file.
+
+        Args:
+            uploaded_files: The files to process
+            doc_type: The type of document ('requirements', 'interviews', 'strategy')
+            group_by: Column to group the rows of CSV, TSV and Excel files by
+
+        Returns:
+            The job ID
+        """
+        if len(uploaded_files) == 1:
+            return self.submit_file(uploaded_files[0], doc_type, group_by=group_by)
+        files = [{"path": self._save_upload(file), "name": file.name} for file in uploaded_files]
+        return self.queue.submit(PROCESS_FILES, {
+            "files": files,
+            "name": f"{len(files)} {doc_type} files",
+            "doc_type": doc_type,
+            "group_by": group_by
+        })
+
+    def submit_competitor(self, url: str, crawl: bool = False) -> str:
+        """
+        Submit a competitor website for analysis.
+
+        Args:
+            url: URL of the website to analyze
+            crawl: Whether to crawl the site's product, pricing and feature
+                pages rather than analyze only this page
+
+        Returns:
+            The job ID
+        """
+        return self.queue.submit(ANALYZE_COMPETITOR, {"url": url, "crawl": crawl})
+
+    def _save_upload(self, uploaded_file) -> str:
+        """Save an upload until its job finishes, returning its path."""
+        path = os.path.join(self.upload_dir, f"{uuid.uuid4().hex}_{os.path.basename(uploaded_file.name)}")
+        with open(path, "wb") as f:
+            f.write(uploaded_file.getvalue())
+        return path
+
+    @staticmethod
+    def _batch(handler):
+        """Run a handler's LLM and embedding calls at batch priority, behind interactive chat."""
+        def run(payload: Dict[str, Any], job: JobContext):
+            with priority_scope(BATCH):
+                return handler(payload, job)
+        return run
+    
+    def _process_file(self, payload: Dict[str, Any], job: JobContext) -> Dict[str, Any]:
+        """Process an uploaded document."""
+        path = payload["path"]
+        if not os.path.exists(path):
+            raise JobError(f"Upload for {payload['name']} is no longer available")
+        try:
+            # Read from disk on demand, so tables stream rather than load whole
+            document = UploadedDocument(payload["name"], path=path)
+            report = {}
+            if not self.document_service.process_file(
+                document, payload["doc_type"], progress=job.advance, group_by=payload.get("group_by"), report=report
+            ):
+                raise JobError(f"Error processing {payload['name']}")
+            return {"name": payload["name"], "doc_type": payload["doc_type"], **report}
+        finally:
+            os.unlink(path)
+
+    def _process_files(self, payload: Dict[str, Any], job: JobContext) -> Dict[str, Any]:
+        """Process several uploaded documents, reporting the outcome of each."""
+        documents = []
+        missing = []
+        try:
+            for file in payload["files"]:
+                if not os.path.exists(file["path"]):
+                    missing.append({
+                        "name": file["name"], "success": False, "chunk_count": 0, "duplicates_skipped": 0,
+                        "error": "Upload is no longer available"
+                    })
+                    continue
+                documents.append(UploadedDocument(file["name"], path=file["path"]))
+
+            report = {"files": [], "chunk_count": 0, "duplicates_skipped": 0}
+            if documents:
+                report = self.document_service.process_files(
+                    documents, payload["doc_type"], progress=job.advance, group_by=payload.get("group_by")
+                )
+            report["files"].extend(missing)
+            if not any(result["success"] for result in report["files"]):
+                raise JobError("; ".join(f"{result['name']}: {result['error']}" for result in report["files"]))
+            return report
+        finally:
+            for file in payload["files"]:
+                if os.path.exists(file["path"]):
+                    os.unlink(file["path"])
+
+    def _analyze_competitor(self, payload: Dict[str, Any], job: JobContext) -> str:
+        """Analyze a competitor website and store the result."""
+        url = payload["url"]
+        if not self.scraping_tool._is_valid_url(url):
+            raise JobError("Please provide a valid URL to analyze.")
+
+        job.advance("scrape")
+        scraping_service = self.scraping_tool.scraping_service
+        if payload.get("crawl"):
+            product_data = scraping_service.analyze_site(url)
+        else:
+            product_data = scraping_service.analyze_website(url)
+        if not product_data:
+            raise JobError(f"Failed to analyze {url}. Please try again with a different URL.")
+
+        job.advance("store")
+        if not self.document_service.process_competitor(product_data):
+            raise JobError(f"Error storing the analysis of {url}")
+        return self.scraping_tool.format_result(url, product_data)
@@ -2,25 +2,90 @@
 Service for scraping web pages and extracting structured data.
 """
 
-from typing import Dict, Optional, Any
-from langchain_community.document_loaders import WebBaseLoader
+import os
+from typing import Dict, List, Optional, Any, Tuple
+import requests
+from requests.adapters import HTTPAdapter
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_openai import ChatOpenAI
+from utils.llm import chat_model
 from agents.prompts.positioning import EXTRACTION_PROMPTS
+from services.content_extractor import extract_main_content
+from services.site_crawler import create_site_crawler
+from utils.deadline import deadline_kwargs, remaining_timeout
+from utils.metrics import metrics
+from utils.single_flight import SingleFlight, normalize_url
+from utils.tokens import CHARS_PER_TOKEN, count_tokens
+from utils.tracing import create_span
+
+# Seconds to wait for a page when no request deadline is set
+DEFAULT_FETCH_TIMEOUT_S = 30
+
+USER_AGENT = "Mozilla/5.0 (compatible; FPCBot/1.0)"
+
+# Keep-alive connections kept per host, shared by page loads and site crawls
+HTTP_POOL_SIZE = 16
+
+# Page content passed to extraction when analyzing a whole site
+MAX_SITE_CONTENT_TOKENS = 5000
+
+_http = requests.Session()
+_http.headers.update({"User-Agent": USER_AGENT})
+_http_adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+_http.mount("http://", _http_adapter)
+_http.mount("https://", _http_adapter)
+
+# Concurrent analyses of the same URL share one fetch and extraction
+_scrape_flight = SingleFlight("scrape")
+
+def combine_pages(pages: List[Tuple[str, str]], max_tokens: int) -> str:
+    """
+    Join the content of several pages into one extraction input.
+    
+    Each page gets an equal share of the token budget; what a short page
+    leaves unused goes to the longer ones.
+    
+    Args:
+        pages: (url, content) of each page, most relevant first
+        max_tokens: Token budget for all pages together
+        
+    Returns:
+        The pages' content under a heading with their URL
+    """
+    tokens = [count_tokens(content) for _, content in pages]
+    budgets = [0] * len(pages)
+    remaining = max_tokens
+    by_length = sorted(range(len(pages)), key=lambda index: tokens[index])
+    for position, index in enumerate(by_length):
+        budgets[index] = min(tokens[index], remaining // (len(pages) - position))
+        remaining -= budgets[index]
+    
+    parts = []
+    for (url, content), budget, size in zip(pages, budgets, tokens):
+        if budget < size:
+            content = content[:budget * CHARS_PER_TOKEN]
+        parts.append(f"# Page: {url}\n{content}")
+    return "\n\n".join(parts)
+
 
 class ScrapingService:
     """
     Service responsible for scraping web pages and extracting structured data.
     """
     
-    def __init__(self, llm=None):
+    def __init__(self, llm=None, main_content: Optional[bool] = None):
         """
         Initialize the scraping service.
         
         Args:
             llm: Language model to use for extraction (optional)
+            main_content: Whether to reduce pages to their main pricing,
+                feature and audience content before extraction (defaults to
+                SCRAPE_MAIN_CONTENT, on unless "0")
         """
-        self.llm = llm or ChatOpenAI(model="gpt-4", temperature=0.2)
+        self.llm = llm or chat_model(model="gpt-4", temperature=0.2)
+        if main_content is None:
+            main_content = os.environ.get("SCRAPE_MAIN_CONTENT", "1") != "0"
+        self.main_content = main_content
         
     def analyze_website(self, url: str) -> Optional[Dict[str, Any]]:
         """
@@ -32,6 +97,45 @@ class ScrapingService:
         Returns:
             Dictionary containing structured product data or None if an error occurred
         """
+        return _scrape_flight.do((id(self), normalize_url(url)), self._analyze_website, url)
+    
+    def analyze_site(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Crawl a competitor's site from a URL and extract structured data
+        from its product, pricing and feature pages together.
+        
+        Args:
+            url: URL of a page of the site, usually the home or product page
+            
+        Returns:
+            Dictionary containing structured product data, with the 'pages'
+            analyzed, or None if an error occurred
+        """
+        return _scrape_flight.do((id(self), "site", normalize_url(url)), self._analyze_site, url)
+    
+    def _analyze_site(self, url: str) -> Optional[Dict[str, Any]]:
+        """Crawl the site and extract structured data from all pages at once (see analyze_site)."""
+        with create_span("analyze_site", {"url": url}) as span:
+            try:
+                pages = create_site_crawler(_http).crawl(url)
+                if not pages:
+                    raise ValueError("no pages could be fetched")
+                contents = [(page.url, self._page_content(page.url, page.html)) for page in pages]
+                content = combine_pages(contents, MAX_SITE_CONTENT_TOKENS)
+                span.set_attribute("page_count", len(pages))
+                span.set_attribute("content_tokens", count_tokens(content))
+                
+                # One extraction over all pages rather than one per page
+                data = self._extract_product_data(content, url)
+                data['pages'] = [page.url for page in pages]
+                return data
+            except Exception as e:
+                span.set_attribute("error", str(e))
+                print(f"Error analyzing site {url}: {str(e)}")
+                return None
+    
+    def _analyze_website(self, url: str) -> Optional[Dict[str, Any]]:
+        """Fetch the page and extract structured data (see analyze_website)."""
         try:
             page_content = self._load_page(url)
             data = self._extract_product_data(page_content, url)
@@ -44,20 +148,52 @@ class ScrapingService:
         """
         Load a web page and extract its content.
         
+        HTML pages are reduced to their main content (see
+        services.content_extractor) unless main_content is off.
+        
         Args:
             url: URL of the page to load
             
         Returns:
             The page content as a string
         """
-        try:
-            loader = WebBaseLoader(url)
-            loader.requests_kwargs = {'verify': False}  # Skip SSL verification if needed
-            docs = loader.load()
-            content = docs[0].page_content
-            return content
-        except Exception as e:
-            raise
+        response = _http.get(
+            url,
+            verify=False,  # Skip SSL verification if needed
+            timeout=remaining_timeout(default=DEFAULT_FETCH_TIMEOUT_S, cap=DEFAULT_FETCH_TIMEOUT_S, operation="http_fetch")
+        )
+        response.raise_for_status()
+        if "html" not in response.headers.get("Content-Type", "html"):
+            return response.text
+        if "charset" not in response.headers.get("Content-Type", ""):
+            response.encoding = response.apparent_encoding
+        return self._page_content(url, response.text)
+    
+    def _page_content(self, url: str, html: str) -> str:
+        """
+        Reduce a page's HTML to the text passed to extraction.
+        
+        Args:
+            url: URL of the page
+            html: The page's HTML
+            
+        Returns:
+            The page's main content, or all its text if main_content is off
+        """
+        with create_span("page_content", {"url": url}) as span:
+            page = extract_main_content(html)
+            if not self.main_content:
+                return page.full_text
+            
+            # Every extraction prompt carries the page, so this is the saving per prompt
+            tokens_before, tokens_after = count_tokens(page.full_text), count_tokens(page.text)
+            print(f"Main content of {url}: {tokens_before} -> {tokens_after} prompt tokens per field")
+            metrics.observe("scrape.page_tokens", tokens_before, stage="full")
+            metrics.observe("scrape.page_tokens", tokens_after, stage="main_content")
+            span.set_attribute("tokens_before", tokens_before)
+            span.set_attribute("tokens_after", tokens_after)
+            span.set_attribute("sections", ",".join(section.label for section in page.sections))
+            return page.text
             
     def _extract_product_data(self, content: str, url: str) -> Dict[str, Any]:
         """
@@ -104,7 +240,7 @@ class ScrapingService:
                 HumanMessage(content=prompt.format(text=content))
             ]
             
-            result = self.llm.invoke(messages).content.strip()
+            result = self.llm.invoke(messages, **deadline_kwargs()).content.strip()
             return result
         except Exception as e:
             raise 
\ No newline at end of file
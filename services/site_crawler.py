@@ -0,0 +1,470 @@
+"""
+Discovery crawler for competitor websites.
+
+Starting from one URL, the crawler finds the pages of the same site most
+likely to describe the product (pricing, features, solutions, use cases)
+and fetches them:
+
+- robots.txt is read first; disallowed pages are skipped and a longer
+  Crawl-delay replaces the politeness delay.
+- Candidate URLs come from the sitemaps robots.txt lists (or
+  /sitemap.xml) and from links on fetched pages, and are ranked by URL
+  heuristics. Blog posts, legal pages, docs, logins and other locales are
+  never fetched.
+- Pages are fetched by a small pool of threads over one shared requests
+  session, with requests to the same host spaced by the politeness delay,
+  up to a depth and page limit.
+- Redirects are followed one hop at a time, and only to URLs of the same
+  site that robots.txt allows. Sitemaps are streamed and parsed as they
+  arrive, up to a byte limit.
+"""
+
+import contextvars
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from html.parser import HTMLParser
+from typing import Callable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+from xml.etree import ElementTree
+
+from utils.deadline import DeadlineExceeded, remaining_timeout
+from utils.metrics import metrics
+
+# Product token matched against robots.txt User-agent lines
+ROBOTS_USER_AGENT = "FPCBot"
+
+DEFAULT_MAX_PAGES = 8
+DEFAULT_MAX_DEPTH = 2
+DEFAULT_POLITENESS_DELAY_S = 1.0
+DEFAULT_MAX_WORKERS = 4
+
+# Seconds to wait for robots.txt, sitemaps and pages
+FETCH_TIMEOUT_S = 15
+
+# Sitemaps are read up to this many files, URLs and bytes
+MAX_SITEMAPS = 5
+MAX_SITEMAP_URLS = 5000
+MAX_SITEMAP_BYTES = 10_000_000
+
+# Redirects followed per fetch
+MAX_REDIRECTS = 5
+
+# Path words of product pages and their weights
+PAGE_KEYWORDS = {
+    "pricing": 10, "prices": 10, "plans": 9, "plan": 6,
+    "features": 8, "feature": 7, "product": 6, "products": 6, "platform": 6,
+    "solutions": 5, "solution": 5, "use-cases": 5, "usecases": 5, "use-case": 5,
+    "integrations": 4, "why": 4, "compare": 3, "enterprise": 4, "teams": 3, "tour": 3,
+    "how-it-works": 4, "overview": 4, "customers": 2, "industries": 3, "for": 2,
+}
+
+# Path words of pages that never describe the product
+EXCLUDED_KEYWORDS = {
+    "blog", "news", "press", "careers", "jobs", "legal", "privacy", "terms", "cookies", "cookie-policy",
+    "security-policy", "login", "log-in", "signin", "sign-in", "signup", "sign-up", "register", "logout",
+    "docs", "documentation", "help", "support", "kb", "status", "events", "webinars", "webinar",
+    "podcast", "changelog", "release-notes", "author", "authors", "tag", "tags", "category", "search",
+    "cart", "checkout", "account", "investors", "community", "forum", "academy", "partners",
+}
+
+_EXCLUDED_EXTENSIONS = re.compile(
+    r"\.(?:pdf|zip|gz|png|jpe?g|gif|svg|webp|ico|mp4|mov|mp3|css|js|json|xml|txt|rss|atom|docx?|xlsx?|pptx?)$",
+    re.IGNORECASE
+)
+
+# Locale prefixes such as /de/ or /fr-fr/; only English ones are kept
+_LOCALE = re.compile(r"^[a-z]{2}(?:[-_][a-z]{2})?$", re.IGNORECASE)
+
+
+class CrawledPage(NamedTuple):
+    """A fetched page."""
+    url: str
+    html: str
+    depth: int
+    score: int
+
+
+def canonical_url(url: str) -> str:
+    """Return a URL without fragment, query or trailing slash, for deduplication."""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/") or "/", "", ""))
+
+
+def same_site(url: str, start_url: str) -> bool:
+    """Return whether two URLs are on the same host, ignoring a leading www."""
+    def host(value):
+        netloc = urlsplit(value).netloc.lower()
+        return netloc[4:] if netloc.startswith("www.") else netloc
+    return host(url) == host(start_url)
+
+
+def score_url(url: str) -> int:
+    """
+    Rank a URL by how likely it is to describe the product.
+
+    Args:
+        url: The URL
+
+    Returns:
+        A positive score for product pages (higher is better), 0 for pages
+        with no signal and -1 for pages that should never be fetched
+    """
+    path = urlsplit(url).path.lower()
+    if _EXCLUDED_EXTENSIONS.search(path):
+        return -1
+    segments = [segment for segment in path.split("/") if segment]
+    if segments and _LOCALE.match(segments[0]) and not segments[0].startswith("en"):
+        return -1
+    words = set(segments) | {word for segment in segments for word in re.split(r"[-_.]", segment)}
+    if words & EXCLUDED_KEYWORDS:
+        return -1
+    score = sum(weight for keyword, weight in PAGE_KEYWORDS.items() if keyword in words)
+    # Deep pages are usually one product among many, or an article
+    return max(score - max(len(segments) - 2, 0) * 2, 0) if score else 0
+
+
+class _LinkParser(HTMLParser):
+    """Collects the followable links of a page."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links: List[str] = []
+        self.nofollow = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "meta" and (attrs.get("name") or "").lower() == "robots":
+            self.nofollow = "nofollow" in (attrs.get("content") or "").lower()
+        elif tag == "a" and attrs.get("href") and "nofollow" not in (attrs.get("rel") or "").lower():
+            self.links.append(attrs["href"])
+
+
+def extract_links(html: str, base_url: str) -> List[str]:
+    """
+    Return the canonical URLs of a page's followable links.
+
+    Args:
+        html: The page's HTML
+        base_url: URL of the page
+
+    Returns:
+        Links in page order, without duplicates
+    """
+    parser = _LinkParser()
+    parser.feed(html)
+    parser.close()
+    if parser.nofollow:
+        return []
+    links = []
+    for href in parser.links:
+        url = urljoin(base_url, href)
+        if urlsplit(url).scheme in ("http", "https"):
+            links.append(canonical_url(url))
+    return list(dict.fromkeys(links))
+
+
+class _HostThrottle:
+    """Spaces requests to the same host by a delay."""
+
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+        self._next_request = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request.get(host, now))
+            self._next_request[host] = slot + self.delay_s
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SiteCrawler:
+    """
+    Finds and fetches the product pages of a website.
+    """
+
+    def __init__(self, session, max_pages: int = DEFAULT_MAX_PAGES, max_depth: int = DEFAULT_MAX_DEPTH,
+                 politeness_delay_s: float = DEFAULT_POLITENESS_DELAY_S, max_workers: int = DEFAULT_MAX_WORKERS,
+                 user_agent: str = ROBOTS_USER_AGENT):
+        """
+        Initialize the crawler.
+
+        Args:
+            session: requests session whose connection pool all fetches share
+            max_pages: Maximum number of pages to fetch, including the start page
+            max_depth: Maximum number of links followed from the start page
+                (sitemap pages count as one)
+            politeness_delay_s: Minimum seconds between requests to a host
+            max_workers: Number of pages fetched at once
+            user_agent: Product token matched against robots.txt
+        """
+        self.session = session
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.politeness_delay_s = politeness_delay_s
+        self.max_workers = max_workers
+        self.user_agent = user_agent
+
+    def crawl(self, start_url: str) -> List[CrawledPage]:
+        """
+        Fetch the start page and the site's most relevant product pages.
+
+        Args:
+            start_url: The page to start from
+
+        Returns:
+            The fetched HTML pages (under the URLs they were redirected to),
+            start page first, then by relevance
+        """
+        start_url = canonical_url(start_url)
+        throttle = _HostThrottle(self.politeness_delay_s)
+        robots = self._read_robots(start_url, throttle)
+        crawl_delay = robots.crawl_delay(self.user_agent)
+        if crawl_delay:
+            throttle.delay_s = max(self.politeness_delay_s, float(crawl_delay))
+        if not robots.can_fetch(self.user_agent, start_url):
+            print(f"robots.txt disallows crawling {start_url}")
+            return []
+
+        def allowed(url: str) -> bool:
+            return same_site(url, start_url) and robots.can_fetch(self.user_agent, url)
+
+        order = itertools.count()
+        seen = {start_url}
+        fetched = set()
+        # (priority, depth, order, url): start page, then most relevant and shallowest first
+        frontier = [(float("-inf"), 0, next(order), start_url)]
+
+        def enqueue(url: str, depth: int):
+            if url in seen or depth > self.max_depth or not same_site(url, start_url):
+                return
+            seen.add(url)
+            score = score_url(url)
+            if score > 0 and robots.can_fetch(self.user_agent, url):
+                heapq.heappush(frontier, (-score, depth, next(order), url))
+
+        if self.max_depth >= 1:
+            for url in self._sitemap_urls(start_url, robots, throttle, allowed):
+                enqueue(url, 1)
+
+        pages: List[CrawledPage] = []
+        attempts = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crawl") as pool:
+            in_flight = {}
+            while frontier or in_flight:
+                try:
+                    remaining_timeout(operation="crawl")
+                except DeadlineExceeded:
+                    frontier.clear()
+                # Failed fetches do not count as pages, but are bounded too
+                while (frontier and len(in_flight) < self.max_workers
+                       and len(pages) + len(in_flight) < self.max_pages and attempts < self.max_pages * 3):
+                    _, depth, _, url = heapq.heappop(frontier)
+                    attempts += 1
+                    # Each fetch runs in a copy of this context, keeping the caller's deadline
+                    context = contextvars.copy_context()
+                    future = pool.submit(context.run, self._fetch_page, url, throttle, allowed)
+                    in_flight[future] = (url, depth)
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, depth = in_flight.pop(future)
+                    result = future.result()
+                    if result is None:
+                        continue
+                    url, html = result
+                    # Several URLs may redirect to one page
+                    if url in fetched:
+                        continue
+                    fetched.add(url)
+                    seen.add(url)
+                    pages.append(CrawledPage(url, html, depth, max(score_url(url), 0)))
+                    if depth < self.max_depth:
+                        for link in extract_links(html, url):
+                            enqueue(link, depth + 1)
+
+        metrics.increment("crawl.pages", len(pages))
+        pages.sort(key=lambda page: (page.depth != 0, -page.score, page.depth))
+        return pages
+
+    def _get(self, url: str, throttle: _HostThrottle, allowed: Callable[[str], bool], stream: bool = False):
+        """
+        GET a URL through the shared session, after the host's politeness delay.
+
+        Redirects are followed here rather than by requests, so every hop is
+        checked before it is fetched.
+
+        Args:
+            url: The URL to fetch
+            throttle: Per-host politeness delays
+            allowed: Whether a redirect target may be fetched
+            stream: Leave the body to be read with iter_content()
+
+        Returns:
+            The final response
+
+        Raises:
+            ValueError: If a redirect leaves the site, is disallowed by robots.txt or loops
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            throttle.wait(url)
+            timeout = remaining_timeout(default=FETCH_TIMEOUT_S, cap=FETCH_TIMEOUT_S, operation="http_fetch")
+            response = self.session.get(url, timeout=timeout, allow_redirects=False, stream=stream)
+            if not response.is_redirect:
+                return response
+            response.close()
+            location = urljoin(url, response.headers["Location"])
+            if not allowed(location):
+                metrics.increment("crawl.redirects_refused")
+                raise ValueError(f"Refusing redirect from {url} to {location}")
+            url = location
+        raise ValueError(f"Too many redirects fetching {url}")
+
+    def _fetch_page(self, url: str, throttle: _HostThrottle,
+                    allowed: Callable[[str], bool]) -> Optional[Tuple[str, str]]:
+        """Fetch an HTML page, returning its final URL and HTML, or None if it fails or is not HTML."""
+        try:
+            response = self._get(url, throttle, allowed)
+            response.raise_for_status()
+            if "html" not in response.headers.get("Content-Type", "html"):
+                return None
+            if "charset" not in response.headers.get("Content-Type", ""):
+                response.encoding = response.apparent_encoding
+            return canonical_url(response.url), response.text
+        except Exception as e:
+            print(f"Error fetching {url}: {str(e)}")
+            metrics.increment("crawl.errors")
+            return None
+
+    def _read_robots(self, start_url: str, throttle: _HostThrottle) -> RobotFileParser:
+        """Read the site's robots.txt; a missing file allows everything."""
+        parts = urlsplit(start_url)
+        robots = RobotFileParser(urlunsplit((parts.scheme, parts.netloc, "/robots.txt", "", "")))
+        try:
+            response = self._get(robots.url, throttle, lambda url: same_site(url, start_url))
+            if response.status_code in (401, 403):
+                robots.disallow_all = True
+            elif response.status_code >= 400:
+                robots.allow_all = True
+            else:
+                robots.parse(response.text.splitlines())
+        except Exception as e:
+            print(f"Error reading {robots.url}: {str(e)}")
+            robots.allow_all = True
+        return robots
+
+    def _sitemap_urls(self, start_url: str, robots: RobotFileParser, throttle: _HostThrottle,
+                      allowed: Callable[[str], bool]) -> List[str]:
+        """Return the page URLs of the site's sitemaps."""
+        parts = urlsplit(start_url)
+        pending = list(robots.site_maps() or []) or [urlunsplit((parts.scheme, parts.netloc, "/sitemap.xml", "", ""))]
+        urls = []
+        read = 0
+        while pending and read < MAX_SITEMAPS and len(urls) < MAX_SITEMAP_URLS:
+            sitemap_url = pending.pop(0)
+            read += 1
+            try:
+                response = self._get(sitemap_url, throttle, allowed, stream=True)
+                try:
+                    response.raise_for_status()
+                    root_tag, locations = _read_sitemap(response, MAX_SITEMAP_URLS - len(urls))
+                finally:
+                    response.close()
+            except Exception as e:
+                print(f"Error reading sitemap {sitemap_url}: {str(e)}")
+                continue
+
+            if root_tag == "sitemapindex":
+                # Child sitemaps named after blog posts and the like are excluded by score
+                children = [location for location in locations if score_url(location.replace(".xml", "")) >= 0]
+                pending.extend(sorted(children, key=lambda location: -score_url(location.replace(".xml", ""))))
+            else:
+                urls.extend(canonical_url(location) for location in locations[:MAX_SITEMAP_URLS - len(urls)])
+        return urls
+
+
+def _read_sitemap(response, max_urls: int) -> Tuple[Optional[str], List[str]]:
+    """
+    Parse a streamed sitemap (optionally gzipped) as it arrives.
+
+    Reading stops after MAX_SITEMAP_BYTES of XML or max_urls locations,
+    keeping the locations parsed so far.
+
+    Args:
+        response: A streamed requests response
+        max_urls: Maximum number of locations to return
+
+    Returns:
+        The local name of the root element (e.g. 'urlset' or 'sitemapindex')
+        and the <loc> URLs
+
+    Raises:
+        ElementTree.ParseError: If the sitemap is not XML
+    """
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    decompressor = None
+    root_tag = None
+    locations: List[str] = []
+    size = 0
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        if size == 0 and decompressor is None and chunk[:2] == b"\x1f\x8b":
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if decompressor is not None:
+            # Bounded, so a small compressed file cannot expand past the limit
+            chunk = decompressor.decompress(chunk, MAX_SITEMAP_BYTES - size)
+        size += len(chunk)
+        try:
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                tag = element.tag.rsplit("}", 1)[-1]
+                if event == "start":
+                    root_tag = root_tag or tag
+                elif tag == "loc" and element.text:
+                    locations.append(element.text.strip())
+                elif tag in ("url", "sitemap"):
+                    element.clear()
+        except ElementTree.ParseError:
+            if root_tag is None:
+                raise
+            # Malformed after valid entries; keep those
+            break
+        if len(locations) >= max_urls:
+            break
+        if size >= MAX_SITEMAP_BYTES:
+            print(f"Sitemap {response.url} is larger than {MAX_SITEMAP_BYTES} bytes; reading only the start")
+            metrics.increment("crawl.sitemaps_truncated")
+            break
+    return root_tag, locations[:max_urls]
+
+
+def create_site_crawler(session) -> SiteCrawler:
+    """
+    Create a crawler configured from the environment.
+
+    CRAWL_MAX_PAGES, CRAWL_MAX_DEPTH, CRAWL_DELAY_S and CRAWL_MAX_WORKERS
+    override the defaults.
+
+    Args:
+        session: requests session whose connection pool all fetches share
+
+    Returns:
+        A SiteCrawler
+    """
+    return SiteCrawler(
+        session,
+        max_pages=int(os.environ.get("CRAWL_MAX_PAGES", DEFAULT_MAX_PAGES)),
+        max_depth=int(os.environ.get("CRAWL_MAX_DEPTH", DEFAULT_MAX_DEPTH)),
+        politeness_delay_s=float(os.environ.get("CRAWL_DELAY_S", DEFAULT_POLITENESS_DELAY_S)),
+        max_workers=int(os.environ.get("CRAWL_MAX_WORKERS", DEFAULT_MAX_WORKERS)),
+    )
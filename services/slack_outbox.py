@@ -0,0 +1,300 @@
+"""
+Durable outbox for Slack messages with background, rate-limited delivery.
+
+SlackTool enqueues messages here and returns immediately. A sender thread
+delivers them per channel at most once per min_interval_s, batches bursts
+queued for the same channel into one post, and retries failures with
+backoff, honoring Slack's Retry-After on rate limits. Messages are stored
+in SQLite, so undelivered ones are sent after a restart.
+"""
+
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from utils.metrics import metrics
+from utils.sqlite import connect
+
+DEFAULT_OUTBOX_PATH = ".fpc/slack_outbox.db"
+
+# Seconds a sender may hold claimed messages before another sender takes them over
+DEFAULT_LEASE_S = 300.0
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slack_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    content TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    error TEXT,
+    message_ts TEXT,
+    batch_size INTEGER,
+    created_at REAL NOT NULL,
+    claimed_at REAL,
+    sent_at REAL
+)
+"""
+
+# Columns added after the first release, created on older outboxes
+_ADDED_COLUMNS = {"claimed_at": "REAL"}
+
+
+class SlackOutbox:
+    """
+    Stores Slack messages and delivers them from a background thread.
+    """
+
+    def __init__(self, path: str = DEFAULT_OUTBOX_PATH, min_interval_s: float = 1.0,
+                 batch_window_s: float = 1.0, max_batch_size: int = 5, max_attempts: int = 5,
+                 base_retry_delay_s: float = 2.0, lease_s: float = DEFAULT_LEASE_S):
+        """
+        Initialize the outbox.
+
+        Args:
+            path: Location of the SQLite outbox
+            min_interval_s: Minimum seconds between posts to the same channel
+            batch_window_s: Seconds a new message waits for others to batch with
+            max_batch_size: Maximum messages combined into one post
+            max_attempts: Delivery attempts before a message is marked failed
+            base_retry_delay_s: Backoff before the first retry
+            lease_s: Seconds after which messages claimed by a sender that
+                never finished are delivered again
+        """
+        self.path = path
+        self.min_interval_s = min_interval_s
+        self.batch_window_s = batch_window_s
+        self.max_batch_size = max_batch_size
+        self.max_attempts = max_attempts
+        self.base_retry_delay_s = base_retry_delay_s
+        self.lease_s = lease_s
+
+        self.sender: Optional[Callable[[str, List[str]], Dict[str, Any]]] = None
+        self._channel_ready_at: Dict[str, float] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        with connect(path) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(slack_outbox)")}
+            for column, column_type in _ADDED_COLUMNS.items():
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE slack_outbox ADD COLUMN {column} {column_type}")
+
+    def start(self, sender: Callable[[str, List[str]], Dict[str, Any]]):
+        """
+        Set the function that posts messages and start the sender thread.
+
+        Args:
+            sender: Called with (channel, contents) to post a batch; returns
+                the Slack API response and raises on failure
+        """
+        self.sender = sender
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="slack-outbox", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def enqueue(self, content: str, channel: str) -> int:
+        """
+        Queue a message for delivery.
+
+        Args:
+            content: The content to share
+            channel: The channel to post to
+
+        Returns:
+            The message ID
+        """
+        now = time.time()
+        with connect(self.path) as connection:
+            message_id = connection.execute(
+                "INSERT INTO slack_outbox (channel, content, status, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (channel, content, PENDING, now + self.batch_window_s, now)
+            ).lastrowid
+        metrics.increment("slack.enqueued", channel=channel)
+        self._wake.set()
+        return message_id
+
+    def get(self, message_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the delivery state of a message.
+
+        Args:
+            message_id: ID of the message
+
+        Returns:
+            The message as a dictionary, or None if unknown
+        """
+        with connect(self.path) as connection:
+            row = connection.execute("SELECT * FROM slack_outbox WHERE id = ?", (message_id,)).fetchone()
+        return dict(row) if row else None
+
+    def recent(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        List the most recent messages.
+
+        Args:
+            limit: Maximum number of messages to return
+
+        Returns:
+            Messages as dictionaries, newest first
+        """
+        with connect(self.path) as connection:
+            rows = connection.execute("SELECT * FROM slack_outbox ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def _loop(self):
+        """Deliver due messages until the process exits."""
+        while True:
+            try:
+                wait = self._deliver_due()
+            except Exception as e:
+                print(f"Error in Slack outbox: {str(e)}")
+                wait = 5.0
+            self._wake.wait(timeout=wait)
+            self._wake.clear()
+
+    def _deliver_due(self) -> float:
+        """
+        Deliver one batch per channel that is due.
+
+        Returns:
+            Seconds until the next message becomes due
+        """
+        now = time.time()
+        with connect(self.path) as connection:
+            # Messages claimed by a sender that stopped are delivered again once its lease expires;
+            # senders still within their lease (possibly in another process) keep theirs
+            reclaimed = connection.execute(
+                "UPDATE slack_outbox SET status = ? WHERE status = ? AND (claimed_at IS NULL OR claimed_at <= ?)",
+                (PENDING, SENDING, now - self.lease_s)
+            ).rowcount
+            rows = connection.execute(
+                "SELECT channel, MIN(next_attempt_at) AS due FROM slack_outbox WHERE status = ? GROUP BY channel",
+                (PENDING,)
+            ).fetchall()
+        if reclaimed:
+            metrics.increment("slack.reclaimed", reclaimed)
+
+        next_due = 60.0
+        for row in rows:
+            due = max(row["due"], self._channel_ready_at.get(row["channel"], 0.0))
+            if due > now:
+                next_due = min(next_due, due - now)
+                continue
+            self._deliver_batch(row["channel"])
+            next_due = min(next_due, self.min_interval_s)
+        return max(next_due, 0.05)
+
+    def _deliver_batch(self, channel: str):
+        """Claim the due messages of a channel and post them as one batch."""
+        with connect(self.path) as connection:
+            # Messages due within the batch window join this post
+            rows = connection.execute(
+                "SELECT * FROM slack_outbox WHERE channel = ? AND status = ? AND next_attempt_at <= ? "
+                "ORDER BY id LIMIT ?",
+                (channel, PENDING, time.time() + self.batch_window_s, self.max_batch_size)
+            ).fetchall()
+            ids = [row["id"] for row in rows]
+            # Claim atomically so another process sharing the outbox skips these
+            claimed = [
+                message_id for message_id in ids
+                if connection.execute(
+                    "UPDATE slack_outbox SET status = ?, attempts = attempts + 1, claimed_at = ? "
+                    "WHERE id = ? AND status = ?",
+                    (SENDING, time.time(), message_id, PENDING)
+                ).rowcount
+            ]
+        batch = [row for row in rows if row["id"] in claimed]
+        if not batch:
+            return
+
+        self._channel_ready_at[channel] = time.time() + self.min_interval_s
+        started = time.perf_counter()
+        try:
+            if self.sender is None:
+                raise RuntimeError("No Slack sender configured")
+            response = self.sender(channel, [row["content"] for row in batch])
+        except Exception as e:
+            self._handle_failure(channel, batch, e)
+            return
+
+        message_ts = response.get("ts") if hasattr(response, "get") else None
+        self._update(
+            claimed, status=SENT, sent_at=time.time(), message_ts=message_ts, batch_size=len(batch), error=None
+        )
+        metrics.increment("slack.delivered", len(batch), channel=channel)
+        metrics.observe("slack.delivery_s", time.perf_counter() - started, channel=channel)
+        metrics.observe("slack.queue_s", time.time() - min(row["created_at"] for row in batch), channel=channel)
+
+    def _handle_failure(self, channel: str, batch: List, error: Exception):
+        """Schedule a retry for a failed batch, or mark messages that used up their attempts as failed."""
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            # Rate limited: pause the whole channel for as long as Slack asks
+            self._channel_ready_at[channel] = time.time() + retry_after
+            metrics.increment("slack.rate_limited", channel=channel)
+        print(f"Error delivering Slack message to {channel}: {str(error)}")
+
+        for row in batch:
+            attempts = row["attempts"] + 1
+            if attempts >= self.max_attempts:
+                self._update([row["id"]], status=FAILED, error=str(error))
+                metrics.increment("slack.failed", channel=channel)
+                continue
+            backoff = random.uniform(0.5, 1.0) * self.base_retry_delay_s * 2 ** (attempts - 1)
+            delay = max(backoff, retry_after or 0.0)
+            self._update([row["id"]], status=PENDING, error=str(error), next_attempt_at=time.time() + delay)
+            metrics.increment("slack.retries", channel=channel)
+
+    def _update(self, ids: List[int], **fields):
+        """Update columns of messages."""
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with connect(self.path) as connection:
+            connection.executemany(
+                f"UPDATE slack_outbox SET {assignments} WHERE id = ?",
+                [(*fields.values(), message_id) for message_id in ids]
+            )
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Read Retry-After from a rate-limited Slack API error, if it is one."""
+    response = getattr(error, "response", None)
+    if response is None or getattr(response, "status_code", None) != 429:
+        return None
+    headers = getattr(response, "headers", {}) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    try:
+        return float(value) if value is not None else 1.0
+    except ValueError:
+        return 1.0
+
+
+_outboxes: Dict[str, SlackOutbox] = {}
+_outboxes_lock = threading.Lock()
+
+
+def get_outbox(path: str = DEFAULT_OUTBOX_PATH) -> SlackOutbox:
+    """
+    Get the process-wide outbox stored at a path.
+
+    Args:
+        path: Location of the SQLite outbox
+
+    Returns:
+        The shared SlackOutbox
+    """
+    with _outboxes_lock:
+        if path not in _outboxes:
+            _outboxes[path] = SlackOutbox(path)
+        return _outboxes[path]
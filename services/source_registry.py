@@ -0,0 +1,340 @@
+"""
+Registry of the chunks stored for each source (file name or URL) and version.
+
+Each ingestion of a source writes a new version. Its chunks are registered
+as pending before they are upserted and become live together when the
+version is committed, at which point the chunks of earlier versions turn
+stale. Stale chunks are deleted from the vector store right away when
+possible; whatever is left (failed deletes, versions abandoned by a crash)
+is reclaimed by compaction.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+DEFAULT_REGISTRY_PATH = ".fpc/sources.db"
+
+PENDING = "pending"
+LIVE = "live"
+STALE = "stale"
+
+# Pending chunks older than this belong to an ingestion that did not finish
+ABANDONED_AFTER_S = 6 * 60 * 60
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS source_chunks (
+        chunk_id TEXT PRIMARY KEY,
+        scope TEXT NOT NULL,
+        source TEXT NOT NULL,
+        doc_type TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS source_chunks_source ON source_chunks (scope, source, version)",
+    "CREATE INDEX IF NOT EXISTS source_chunks_status ON source_chunks (scope, status)",
+    """
+    CREATE TABLE IF NOT EXISTS source_versions (
+        scope TEXT NOT NULL,
+        source TEXT NOT NULL,
+        doc_type TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (scope, source, version)
+    )
+    """,
+]
+
+
+class SourceRegistry:
+    """
+    Tracks chunk IDs by source and version for one vector store.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_REGISTRY_PATH, scope: str = "default"):
+        """
+        Initialize the registry.
+
+        Args:
+            path: Location of the SQLite registry, or None to keep it in
+                memory (for vector stores that do not outlive the process)
+            scope: The vector store (index and namespace) the registry describes
+        """
+        self.path = path
+        self.scope = scope
+        self._lock = threading.Lock()
+
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # One connection guarded by the lock, so an in-memory registry is shared by all threads
+        self._connection = sqlite3.connect(path or ":memory:", timeout=30, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock, self._connection:
+            if path:
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+
+    def begin_version(self, source: str, doc_type: str) -> int:
+        """
+        Start a new version of a source.
+
+        Args:
+            source: The file name or URL
+            doc_type: The type of document
+
+        Returns:
+            The new version number
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT COALESCE(MAX(version), 0) FROM source_versions WHERE scope = ? AND source = ?",
+                (self.scope, source)
+            ).fetchone()
+            version = row[0] + 1
+            self._connection.execute(
+                "INSERT INTO source_versions (scope, source, doc_type, version, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.scope, source, doc_type, version, PENDING, time.time())
+            )
+        return version
+
+    def add_chunks(self, source: str, version: int, doc_type: str, chunk_ids: Sequence[str]):
+        """
+        Register chunks of a pending version, before they are upserted.
+
+        Args:
+            source: The file name or URL
+            version: The version being written
+            doc_type: The type of document
+            chunk_ids: IDs the chunks will be stored under
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO source_chunks (chunk_id, scope, source, doc_type, version, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(chunk_id, self.scope, source, doc_type, version, PENDING, now) for chunk_id in chunk_ids]
+            )
+
+    def commit_version(self, source: str, version: int) -> List[str]:
+        """
+        Make a version the live one, in one transaction.
+
+        When ingestions of the same source overlap, the newest version wins:
+        a version older than the live one is abandoned instead.
+
+        Args:
+            source: The file name or URL
+            version: The version to make live
+
+        Returns:
+            IDs of the chunks now stale: those of earlier versions, or this
+            version's own if a newer version is already live
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT MAX(version) FROM source_versions WHERE scope = ? AND source = ? AND status = ?",
+                (self.scope, source, LIVE)
+            ).fetchone()
+            if row[0] is not None and row[0] > version:
+                return self._abort(source, version)
+            stale = self._chunk_ids("source = ? AND version != ? AND status = ?", (source, version, LIVE))
+            self._connection.execute(
+                "UPDATE source_chunks SET status = ? WHERE scope = ? AND source = ? AND version != ? AND status = ?",
+                (STALE, self.scope, source, version, LIVE)
+            )
+            self._connection.execute(
+                "UPDATE source_chunks SET status = ? WHERE scope = ? AND source = ? AND version = ?",
+                (LIVE, self.scope, source, version)
+            )
+            self._connection.execute(
+                "UPDATE source_versions SET status = ? WHERE scope = ? AND source = ? AND version != ? AND status = ?",
+                (STALE, self.scope, source, version, LIVE)
+            )
+            self._connection.execute(
+                "UPDATE source_versions SET status = ? WHERE scope = ? AND source = ? AND version = ?",
+                (LIVE, self.scope, source, version)
+            )
+        return stale
+
+    def abort_version(self, source: str, version: int) -> List[str]:
+        """
+        Abandon a version that failed, leaving the live version in place.
+
+        Args:
+            source: The file name or URL
+            version: The version to abandon
+
+        Returns:
+            IDs of the version's chunks, some of which may have been upserted
+        """
+        with self._lock, self._connection:
+            return self._abort(source, version)
+
+    def adopt_chunks(self, source: str, version: int, doc_type: str, chunk_ids: Sequence[str]) -> bool:
+        """
+        Add chunks to a live version, e.g. duplicates stored in place of a
+        deleted chunk of another source.
+
+        Args:
+            source: The file name or URL
+            version: The version the chunks belong to
+            doc_type: The type of document
+            chunk_ids: IDs the chunks will be stored under
+
+        Returns:
+            False (and nothing is added) if the version is no longer live
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT 1 FROM source_versions WHERE scope = ? AND source = ? AND version = ? AND status = ?",
+                (self.scope, source, version, LIVE)
+            ).fetchone()
+            if row is None:
+                return False
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO source_chunks (chunk_id, scope, source, doc_type, version, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(chunk_id, self.scope, source, doc_type, version, LIVE, now) for chunk_id in chunk_ids]
+            )
+        return True
+
+    def retire(self, source: str) -> List[str]:
+        """
+        Mark every chunk of a source stale, e.g. before deleting the source.
+
+        Args:
+            source: The file name or URL
+
+        Returns:
+            IDs of the chunks of the source
+        """
+        with self._lock, self._connection:
+            ids = self._chunk_ids("source = ? AND status != ?", (source, STALE))
+            self._connection.execute(
+                "UPDATE source_chunks SET status = ? WHERE scope = ? AND source = ?", (STALE, self.scope, source)
+            )
+            self._connection.execute(
+                "UPDATE source_versions SET status = ? WHERE scope = ? AND source = ?", (STALE, self.scope, source)
+            )
+        return ids
+
+    def live_chunk_ids(self, source: str) -> List[str]:
+        """Return the IDs of the live chunks of a source."""
+        with self._lock:
+            return self._chunk_ids("source = ? AND status = ?", (source, LIVE))
+
+    def reclaimable_chunk_ids(self) -> List[str]:
+        """Return the IDs of stale chunks and of pending chunks from abandoned ingestions."""
+        with self._lock:
+            return self._chunk_ids(
+                "status = ? OR (status = ? AND created_at < ?)",
+                (STALE, PENDING, time.time() - ABANDONED_AFTER_S)
+            )
+
+    def forget(self, chunk_ids: Sequence[str]):
+        """
+        Remove chunks that were deleted from the vector store.
+
+        Args:
+            chunk_ids: IDs of the deleted chunks
+        """
+        chunk_ids = list(chunk_ids)
+        with self._lock, self._connection:
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                self._connection.execute(f"DELETE FROM source_chunks WHERE chunk_id IN ({placeholders})", batch)
+            # Versions without chunks left are history only once they are stale
+            self._connection.execute(
+                "DELETE FROM source_versions WHERE scope = ? AND status = ? AND NOT EXISTS ("
+                "SELECT 1 FROM source_chunks c WHERE c.scope = source_versions.scope "
+                "AND c.source = source_versions.source AND c.version = source_versions.version)",
+                (self.scope, STALE)
+            )
+
+    def expired_sources(self, max_age_days: float, doc_type: Optional[str] = None) -> List[str]:
+        """
+        Find sources whose live version is older than a number of days.
+
+        Args:
+            max_age_days: Maximum age of the live version
+            doc_type: Only consider sources of this type (e.g. 'competitor')
+
+        Returns:
+            The expired sources
+        """
+        cutoff = time.time() - max_age_days * 86400
+        query = "SELECT source FROM source_versions WHERE scope = ? AND status = ? AND created_at < ?"
+        params: List[Any] = [self.scope, LIVE, cutoff]
+        if doc_type:
+            query += " AND doc_type = ?"
+            params.append(doc_type)
+        with self._lock:
+            return [row["source"] for row in self._connection.execute(query, params).fetchall()]
+
+    def sources(self, doc_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        List the live sources.
+
+        Args:
+            doc_type: Only list sources of this type
+
+        Returns:
+            Dictionaries with the source, doc_type, live version, chunk_count
+            and updated_at, most recently updated first
+        """
+        query = (
+            "SELECT v.source, v.doc_type, v.version, v.created_at AS updated_at, COUNT(c.chunk_id) AS chunk_count "
+            "FROM source_versions v LEFT JOIN source_chunks c ON c.scope = v.scope AND c.source = v.source "
+            "AND c.version = v.version WHERE v.scope = ? AND v.status = ?"
+        )
+        params: List[Any] = [self.scope, LIVE]
+        if doc_type:
+            query += " AND v.doc_type = ?"
+            params.append(doc_type)
+        query += " GROUP BY v.source, v.version ORDER BY v.created_at DESC"
+        with self._lock:
+            return [dict(row) for row in self._connection.execute(query, params).fetchall()]
+
+    def _abort(self, source: str, version: int) -> List[str]:
+        """Mark a version and its chunks stale (call with the lock held, in a transaction)."""
+        ids = self._chunk_ids("source = ? AND version = ?", (source, version))
+        self._connection.execute(
+            "UPDATE source_chunks SET status = ? WHERE scope = ? AND source = ? AND version = ?",
+            (STALE, self.scope, source, version)
+        )
+        self._connection.execute(
+            "UPDATE source_versions SET status = ? WHERE scope = ? AND source = ? AND version = ?",
+            (STALE, self.scope, source, version)
+        )
+        return ids
+
+    def _chunk_ids(self, condition: str, params: Sequence[Any]) -> List[str]:
+        rows = self._connection.execute(
+            f"SELECT chunk_id FROM source_chunks WHERE scope = ? AND ({condition})", (self.scope, *params)
+        ).fetchall()
+        return [row["chunk_id"] for row in rows]
+
+
+def create_source_registry(vector_store) -> SourceRegistry:
+    """
+    Create the source registry for a vector store.
+
+    Args:
+        vector_store: The vector store chunks are stored in
+
+    Returns:
+        A SourceRegistry, kept on disk if the vector store is persistent
+    """
+    # The registry must not outlive the vectors it describes
+    path = DEFAULT_REGISTRY_PATH if getattr(vector_store, "persistent", False) else None
+    return SourceRegistry(path=path, scope=getattr(vector_store, "scope", "default"))
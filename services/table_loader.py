@@ -0,0 +1,203 @@
+"""
+Streaming loader for CSV, TSV and Excel exports such as survey and
+interview results.
+
+Rows are read one at a time and grouped into chunk documents by a key
+column (e.g. one chunk per respondent), so memory use does not grow with
+the size of the file. Rows are grouped while consecutive rows share a key,
+so exports should be sorted by the key column; a key that reappears later
+simply starts another chunk with the same metadata.
+"""
+
+import csv
+import io
+from typing import IO, Dict, Iterator, List, Optional
+from langchain.schema import Document
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - optional dependency
+    openpyxl = None
+
+TABLE_EXTENSIONS = (".csv", ".tsv", ".xlsx")
+
+# Columns copied into chunk metadata when none are configured
+DEFAULT_METADATA_COLUMNS = (
+    "respondent", "respondent_id", "participant", "participant_id", "user_id", "interview_id",
+    "segment", "persona", "role", "company", "company_size", "industry", "plan", "tier", "region",
+    "country", "date",
+)
+
+# Columns used as the grouping key when none is configured, in order of preference
+DEFAULT_GROUP_BY_COLUMNS = (
+    "respondent_id", "respondent", "participant_id", "participant", "interview_id", "user_id",
+)
+
+# Characters of row text per chunk before a group is continued in a new chunk
+DEFAULT_CHUNK_CHARS = 1500
+
+
+def is_table(name: str) -> bool:
+    """Return whether a file name is a CSV, TSV or Excel file."""
+    return name.lower().endswith(TABLE_EXTENSIONS)
+
+
+def iter_rows(file: IO[bytes], name: str) -> Iterator[Dict[str, str]]:
+    """
+    Stream the rows of a table file as dictionaries keyed by header.
+
+    Args:
+        file: The file, opened in binary mode
+        name: The file name, used to pick the format
+
+    Yields:
+        Rows with a string value (empty if blank) for every column
+    """
+    lower = name.lower()
+    if lower.endswith(".xlsx"):
+        yield from _iter_xlsx_rows(file)
+        return
+
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        if lower.endswith(".tsv"):
+            dialect = csv.excel_tab
+        else:
+            sample = text.read(64 * 1024)
+            text.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+            except csv.Error:
+                dialect = csv.excel
+        for row in csv.DictReader(text, dialect=dialect):
+            yield {
+                str(column).strip(): value.strip() if isinstance(value, str) else ""
+                for column, value in row.items()
+                if column is not None
+            }
+    finally:
+        # Leave the caller's file open
+        text.detach()
+
+
+def _iter_xlsx_rows(file: IO[bytes]) -> Iterator[Dict[str, str]]:
+    """Stream the rows of the first worksheet of an Excel file."""
+    if openpyxl is None:
+        raise ValueError("Install openpyxl to ingest .xlsx files")
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, [])]
+        for values in rows:
+            yield {
+                column: str(value).strip() if value is not None else ""
+                for column, value in zip(header, values)
+                if column
+            }
+    finally:
+        workbook.close()
+
+
+class TableChunker:
+    """
+    Groups streamed table rows into chunk documents.
+    """
+
+    def __init__(self, group_by: Optional[str] = None, metadata_columns: Optional[List[str]] = None,
+                 chunk_chars: int = DEFAULT_CHUNK_CHARS):
+        """
+        Initialize the chunker.
+
+        Args:
+            group_by: Column whose value groups rows into chunks (detected
+                from DEFAULT_GROUP_BY_COLUMNS if omitted; without one every
+                chunk_chars of rows form a chunk)
+            metadata_columns: Columns copied into chunk metadata (defaults to
+                the DEFAULT_METADATA_COLUMNS present in the file)
+            chunk_chars: Characters of row text per chunk before a group
+                continues in a new chunk
+        """
+        self.group_by = group_by
+        self.metadata_columns = metadata_columns
+        self.chunk_chars = chunk_chars
+
+    def chunks(self, rows: Iterator[Dict[str, str]], metadata: Dict) -> Iterator[Document]:
+        """
+        Group rows into chunk documents.
+
+        Args:
+            rows: Rows from iter_rows()
+            metadata: Metadata added to every chunk (e.g. doc_type, filename)
+
+        Yields:
+            One document per group of rows, or per chunk_chars of a large group
+        """
+        group_by = None
+        metadata_columns = None
+        key = None
+        lines: List[str] = []
+        group_rows: List[Dict[str, str]] = []
+        first_row = last_row = 0
+        size = 0
+
+        for row_number, row in enumerate(rows, start=1):
+            if metadata_columns is None:
+                # Resolve the columns from the first row; headers match case-insensitively
+                group_by, metadata_columns = self._resolve_columns(list(row))
+            row_key = row.get(group_by) if group_by else None
+            line = "; ".join(
+                f"{column}: {value}" for column, value in row.items() if value and column not in metadata_columns
+            )
+            if not line and not any(row.values()):
+                continue
+
+            if group_rows and (row_key != key or size + len(line) > self.chunk_chars):
+                yield self._document(lines, group_rows, group_by, metadata_columns, metadata, first_row, last_row)
+                lines, group_rows, size = [], [], 0
+            if not group_rows:
+                key = row_key
+                first_row = row_number
+            lines.append(line)
+            group_rows.append(row)
+            last_row = row_number
+            size += len(line) + 1
+
+        if group_rows:
+            yield self._document(lines, group_rows, group_by, metadata_columns, metadata, first_row, last_row)
+
+    def _resolve_columns(self, columns: List[str]):
+        """Map the configured (or default) grouping and metadata columns to the file's headers."""
+        by_name = {column.lower(): column for column in columns}
+        if self.group_by:
+            if self.group_by.lower() not in by_name:
+                raise ValueError(f"Column '{self.group_by}' not found; columns are: {', '.join(columns)}")
+            group_by = by_name[self.group_by.lower()]
+        else:
+            group_by = next((by_name[name] for name in DEFAULT_GROUP_BY_COLUMNS if name in by_name), None)
+
+        wanted = self.metadata_columns if self.metadata_columns is not None else DEFAULT_METADATA_COLUMNS
+        metadata_columns = {by_name[name.lower()] for name in wanted if name.lower() in by_name}
+        if group_by:
+            metadata_columns.add(group_by)
+        return group_by, metadata_columns
+
+    @staticmethod
+    def _document(lines: List[str], rows: List[Dict[str, str]], group_by: Optional[str], metadata_columns,
+                  metadata: Dict, first_row: int, last_row: int) -> Document:
+        """Build a chunk document from a group of rows."""
+        chunk_metadata = dict(metadata)
+        header = []
+        for column in sorted(metadata_columns):
+            values = list(dict.fromkeys(row[column] for row in rows if row.get(column)))
+            if not values:
+                continue
+            # Pinecone metadata takes strings or lists of strings
+            chunk_metadata[column] = values[0] if len(values) == 1 else values[:20]
+            header.append(f"{column}: {', '.join(values[:20])}")
+        if group_by and group_by in chunk_metadata:
+            chunk_metadata["group"] = chunk_metadata[group_by]
+        chunk_metadata["row_start"] = first_row
+        chunk_metadata["row_end"] = last_row
+
+        content = "\n".join(([" | ".join(header)] if header else []) + lines)
+        return Document(page_content=content, metadata=chunk_metadata)
@@ -0,0 +1,280 @@
+"""
+Single-pass, token-sized text splitter.
+
+The text is scanned once for separator offsets (paragraphs, lines,
+sentences) and the segments between them are tokenized in one batch.
+Chunks are then packed greedily up to chunk_size tokens, cut at the
+strongest separator in the second half of the chunk (or between words when
+there is none), and emitted as (offset, length) spans over the source text.
+"""
+
+import os
+import re
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Iterable, List, NamedTuple, Optional
+from langchain.schema import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from utils.tokens import CHARS_PER_TOKEN, get_encoding
+
+# Supported values for the TEXT_SPLITTER environment variable
+TEXT_SPLITTERS = ("recursive", "token")
+
+# Separator levels, strongest first
+PARAGRAPH = 0
+LINE = 1
+SENTENCE = 2
+WORD = 3
+
+# Candidate separators, classified as paragraph, line or sentence breaks after
+# matching; a single-alternative pattern keeps the scan fast. Word breaks
+# are only looked for where a chunk needs one.
+_SEPARATORS = re.compile(r"[.!?\n][\"')\]]*\s*")
+
+
+class TextSpan(NamedTuple):
+    """A chunk as a view over its source text."""
+    offset: int
+    length: int
+    token_count: int
+
+    def text(self, source: str) -> str:
+        """Return the chunk's text from its source."""
+        return source[self.offset:self.offset + self.length]
+
+
+class TokenTextSplitter:
+    """
+    Splits text into chunks of at most chunk_size tokens in a single pass.
+
+    Has the split_text/split_documents/create_documents interface of
+    LangChain's text splitters, so it can replace RecursiveCharacterTextSplitter.
+    """
+
+    def __init__(self, chunk_size: int = 250, chunk_overlap: int = 50, model: str = "text-embedding-3-large",
+                 min_fill: float = 0.5):
+        """
+        Initialize the splitter.
+
+        Args:
+            chunk_size: Maximum tokens per chunk
+            chunk_overlap: Maximum tokens repeated from the end of the previous chunk
+            model: Model whose tokenizer sizes the chunks
+            min_fill: Fraction of chunk_size a chunk must reach before it
+                may be cut at a weaker separator than the strongest one seen
+        """
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.model = model
+        self.min_fill = min_fill
+
+    def _token_starts(self, text: str) -> List[int]:
+        """Return the character offset each token of a text starts at."""
+        encoding = get_encoding(self.model)
+        if encoding is None:
+            return list(range(0, len(text), CHARS_PER_TOKEN))
+        return encoding.decode_with_offsets(encoding.encode_ordinary(text))[1]
+
+    def _cumulative_tokens(self, text: str, breaks: List[int]) -> List[int]:
+        """Return the tokens before each break point, tokenizing the segments between breaks in one batch."""
+        encoding = get_encoding(self.model)
+        segments = [text[begin:end] for begin, end in zip(breaks, breaks[1:])]
+        if encoding is None:
+            counts = [-(-len(segment) // CHARS_PER_TOKEN) for segment in segments]
+        else:
+            counts = [len(tokens) for tokens in encoding.encode_ordinary_batch(segments)]
+        return [0] + list(accumulate(counts))
+
+    def split_spans(self, text: str) -> List[TextSpan]:
+        """
+        Split text into chunk spans.
+
+        Args:
+            text: The text to split
+
+        Returns:
+            Spans of at most chunk_size tokens, in order
+        """
+        if not text.strip():
+            return []
+
+        # Break points are the ends of separators, so separators stay with the text before them
+        breaks = [0]
+        levels = [PARAGRAPH]
+        for match in _SEPARATORS.finditer(text):
+            separator = match.group()
+            newlines = separator.count("\n")
+            if newlines:
+                levels.append(PARAGRAPH if newlines > 1 else LINE)
+            elif separator[-1].isspace():
+                levels.append(SENTENCE)
+            else:
+                # Punctuation inside a token, e.g. "3.5" or "e.g."
+                continue
+            breaks.append(match.end())
+        if breaks[-1] != len(text):
+            breaks.append(len(text))
+            levels.append(PARAGRAPH)
+        break_tokens = self._cumulative_tokens(text, breaks)
+
+        spans = []
+        start = 0
+        while start < len(breaks) - 1:
+            start_tokens = break_tokens[start]
+            limit = start_tokens + self.chunk_size
+            last = bisect_right(break_tokens, limit, lo=start + 1) - 1
+
+            if last == len(breaks) - 1:
+                end = last
+            else:
+                end = self._best_break(levels, break_tokens, start + 1, last, start_tokens) if last > start else None
+                if end is None or break_tokens[end] - start_tokens < self.chunk_size * self.min_fill:
+                    # Separators would leave the chunk too small: cut between words instead
+                    end = self._insert_word_break(text, breaks, levels, break_tokens, start, last)
+
+            spans.append(self._span(text, breaks[start], breaks[end], start_tokens, break_tokens[end]))
+            if end == len(breaks) - 1:
+                break
+            start = self._overlap_start(levels, break_tokens, start, end)
+        return [span for span in spans if span.length > 0]
+
+    def _best_break(self, levels: List[int], break_tokens: List[int], first: int, last: int,
+                    start_tokens: int) -> int:
+        """Pick the break in [first, last] to end a chunk at: the strongest separator past min_fill, else the last."""
+        min_tokens = start_tokens + self.chunk_size * self.min_fill
+        best = last
+        for index in range(last, first - 1, -1):
+            if break_tokens[index] < min_tokens:
+                break
+            if levels[index] < levels[best]:
+                best = index
+                if levels[best] == PARAGRAPH:
+                    break
+        return best
+
+    def _insert_word_break(self, text: str, breaks: List[int], levels: List[int], break_tokens: List[int],
+                           start: int, last: int) -> int:
+        """
+        Add a break at the last word boundary within chunk_size tokens of a
+        start break, or at the token limit if there is none past min_fill.
+
+        Returns:
+            Index of the new break
+        """
+        begin = breaks[start]
+        # Tokenize only as much of the text as can fall within the budget
+        region_end = min(breaks[last + 1], begin + self.chunk_size * CHARS_PER_TOKEN * 4)
+        region = text[begin:region_end]
+        starts = self._token_starts(region)
+
+        hard_cut = starts[self.chunk_size] if self.chunk_size < len(starts) else len(region)
+        min_chars = starts[int(self.chunk_size * self.min_fill)] if self.chunk_size < len(starts) else 0
+        space = max(region.rfind(" ", 0, hard_cut), region.rfind("\t", 0, hard_cut), region.rfind("\n", 0, hard_cut))
+        cut = space + 1 if space >= min_chars and space > 0 else hard_cut
+        cut_tokens = break_tokens[start] + bisect_left(starts, cut)
+
+        index = bisect_left(breaks, begin + cut, lo=start + 1)
+        if breaks[index] == begin + cut:
+            return index
+        breaks.insert(index, begin + cut)
+        levels.insert(index, WORD)
+        # Keep counts monotonic where per-segment and regional tokenization disagree
+        break_tokens.insert(index, min(max(cut_tokens, break_tokens[index - 1]), break_tokens[index]))
+        return index
+
+    def _overlap_start(self, levels: List[int], break_tokens: List[int], start: int, end: int) -> int:
+        """Pick the break the next chunk starts at: the strongest separator within chunk_overlap tokens of end."""
+        if self.chunk_overlap <= 0:
+            return end
+        first = bisect_left(break_tokens, break_tokens[end] - self.chunk_overlap, lo=start + 1, hi=end)
+        if first == end:
+            return end
+        return min(range(first, end), key=lambda index: levels[index])
+
+    @staticmethod
+    def _span(text: str, begin: int, end: int, begin_tokens: int, end_tokens: int) -> TextSpan:
+        """Build a span, excluding leading and trailing whitespace."""
+        while begin < end and text[begin].isspace():
+            begin += 1
+        while end > begin and text[end - 1].isspace():
+            end -= 1
+        return TextSpan(begin, end - begin, end_tokens - begin_tokens)
+
+    def split_text(self, text: str) -> List[str]:
+        """
+        Split text into chunk strings.
+
+        Args:
+            text: The text to split
+
+        Returns:
+            The chunks
+        """
+        return [span.text(text) for span in self.split_spans(text)]
+
+    def create_documents(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None) -> List[Document]:
+        """
+        Split texts into chunk documents.
+
+        Chunk metadata records the chunk's start_index and length in its
+        source text and its token_count.
+
+        Args:
+            texts: The texts to split
+            metadatas: Optional metadata per text, copied to its chunks
+
+        Returns:
+            The chunk documents
+        """
+        documents = []
+        for index, text in enumerate(texts):
+            metadata = metadatas[index] if metadatas else {}
+            for span in self.split_spans(text):
+                documents.append(Document(
+                    page_content=span.text(text),
+                    metadata={
+                        **metadata,
+                        "start_index": span.offset,
+                        "length": span.length,
+                        "token_count": span.token_count
+                    }
+                ))
+        return documents
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        """
+        Split documents into chunk documents.
+
+        Args:
+            documents: The documents to split
+
+        Returns:
+            The chunk documents
+        """
+        documents = list(documents)
+        return self.create_documents(
+            [doc.page_content for doc in documents],
+            metadatas=[doc.metadata for doc in documents]
+        )
+
+
+def create_text_splitter(kind: Optional[str] = None):
+    """
+    Create the text splitter used for ingestion.
+
+    Args:
+        kind: 'recursive' (RecursiveCharacterTextSplitter, 1000 characters)
+            or 'token' (TokenTextSplitter, 250 tokens); defaults to the
+            TEXT_SPLITTER environment variable, else 'recursive'
+
+    Returns:
+        A text splitter
+    """
+    kind = (kind or os.environ.get("TEXT_SPLITTER", "recursive")).lower()
+    if kind not in TEXT_SPLITTERS:
+        raise ValueError(f"Unknown TEXT_SPLITTER '{kind}', expected one of {TEXT_SPLITTERS}")
+    if kind == "token":
+        return TokenTextSplitter(chunk_size=250, chunk_overlap=50)
+    return RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
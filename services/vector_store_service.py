@@ -2,10 +2,7 @@
 Service for managing the vector database.
 """
 
-from pinecone import Pinecone
-from langchain_pinecone import PineconeVectorStore
-from langchain_openai import OpenAIEmbeddings
-import os
+from utils.vector_store import VectorStoreManager
 
 class VectorStoreService:
     """
@@ -20,14 +17,7 @@ class VectorStoreService:
         Returns:
             An initialized vector store instance
         """
-        pc = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
-        index_name = os.environ.get("PINECONE_INDEX_NAME")
-        index = pc.Index(index_name)
-        embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-large",
-            api_key=os.environ.get("OPENAI_API_KEY")
-        )
-        return PineconeVectorStore(index=index, embedding=embeddings)
+        return VectorStoreManager.initialize()
     
     def __init__(self, vector_store):
         """
@@ -0,0 +1,112 @@
+"""
+Tests for extracting the main content of scraped product pages.
+"""
+
+import pytest
+
+from services.content_extractor import MIN_CONTENT_CHARS, classify_section, extract_main_content
+
+FILLER = "Tired of roadmaps that live in five spreadsheets? Acme keeps every idea, decision and launch in one place. " * 3
+
+PRODUCT_PAGE = f"""
+<html>
+<head>
+  <title>Acme | Roadmaps for product teams</title>
+  <meta name="description" content="Plan and ship faster.">
+  <script>var tracking = "Track everything";</script>
+</head>
+<body>
+  <nav><a href="/">Home</a><a href="/pricing">Pricing</a></nav>
+  <div class="cookie-banner">We use cookies to improve your experience.</div>
+  <div role="dialog">Subscribe to our newsletter!</div>
+  <main>
+    <h1>Acme roadmaps</h1>
+    <p>{FILLER}</p>
+    <p><a href="/signup">Get started</a></p>
+    <h2>Features</h2>
+    <ul><li>Automated status reports and dashboards for every team.</li><li>Integrations with Jira and GitHub.</li></ul>
+    <div class="subscription-note">Every plan includes unlimited viewers.</div>
+    <h2>Pricing</h2>
+    <p>Starter is $10 per user per month, billed annually. Enterprise pricing on quote.</p>
+    <h2>Careers</h2>
+    <p>Join our team. Read the blog and press news about our investors.</p>
+    <p><a href="/a">Related one</a> <a href="/b">Related two</a> and more</p>
+    <span hidden>Hidden upsell</span>
+  </main>
+  <footer>Copyright Acme. All rights reserved.</footer>
+</body>
+</html>
+"""
+
+
+@pytest.mark.parametrize("heading, text, label", [
+    ("Pricing", "", "pricing"),
+    ("", "Starter is $10/mo, Pro is $25/mo, billed annually.", "pricing"),
+    ("Features", "Dashboards and integrations.", "features"),
+    ("Built for startups", "", "audience"),
+    ("Why Acme", "Tired of spreadsheets?", "overview"),
+    ("Careers", "Join us.", "other"),
+    ("", "Lorem ipsum dolor sit amet.", "other"),
+])
+def test_sections_are_labelled_by_keywords(heading, text, label):
+    assert classify_section(heading, text) == label
+
+
+def test_title_and_description_come_first():
+    page = extract_main_content(PRODUCT_PAGE)
+
+    assert page.title == "Acme | Roadmaps for product teams"
+    assert page.description == "Plan and ship faster."
+    assert page.text.splitlines()[:2] == ["Title: Acme | Roadmaps for product teams", "Description: Plan and ship faster."]
+
+
+def test_page_chrome_and_calls_to_action_are_dropped():
+    text = extract_main_content(PRODUCT_PAGE).text
+
+    for boilerplate in ("Home", "cookies", "newsletter", "Get started", "Hidden upsell", "All rights reserved",
+                        "Track everything", "Related one"):
+        assert boilerplate not in text
+
+
+def test_class_words_only_match_whole_words():
+    assert "Every plan includes unlimited viewers." in extract_main_content(PRODUCT_PAGE).text
+
+
+def test_only_the_first_and_relevant_sections_are_kept():
+    page = extract_main_content(PRODUCT_PAGE)
+
+    assert [(section.heading, section.label) for section in page.sections] == [
+        ("Acme roadmaps", "overview"),
+        ("Features", "features"),
+        ("Pricing", "pricing"),
+        ("Careers", "other"),
+    ]
+    assert "## Acme roadmaps" in page.text and "## Pricing" in page.text
+    assert "Join our team" not in page.text
+    assert "$10 per user per month" in page.text
+
+
+def test_full_text_keeps_visible_chrome_but_not_scripts():
+    full_text = extract_main_content(PRODUCT_PAGE).full_text
+
+    assert "Home" in full_text and "All rights reserved" in full_text
+    assert "Track everything" not in full_text
+
+
+def test_little_surviving_content_falls_back_to_the_full_text():
+    html = "<body><nav>Home Pricing Docs</nav><div id='app'>Loading the app…</div></body>"
+
+    page = extract_main_content(html)
+
+    assert len(page.text) < MIN_CONTENT_CHARS
+    assert page.text == page.full_text == "Home Pricing Docs\nLoading the app…"
+
+
+def test_unclosed_elements_are_closed_with_their_parent():
+    html = f"<body><div class='menu'><ul><li>Menu item</div><p>{FILLER}<h2>Pricing</h2><p>$5 per seat</body>"
+
+    page = extract_main_content(html)
+
+    assert [section.heading for section in page.sections] == ["", "Pricing"]
+    assert "Menu item" not in page.text
+    assert "$5 per seat" in page.text
@@ -0,0 +1,100 @@
+"""
+Tests for deduplication combined with replacing and deleting sources.
+"""
+
+import pytest
+
+from services.dedup import Deduplicator
+from services.document_service import DocumentService, UploadedDocument
+from services.source_registry import SourceRegistry
+from services.text_splitter import TokenTextSplitter
+
+SHARED = b"Shared onboarding notes: admins find the setup wizard confusing and slow to finish."
+
+
+class InMemoryStore:
+    """Vector store double that keeps documents by ID."""
+
+    persistent = False
+    scope = "memory:"
+
+    def __init__(self):
+        self.documents = {}
+
+    def add_documents(self, documents, ids=None):
+        self.documents.update(zip(ids, documents))
+        return ids
+
+    def delete(self, ids=None):
+        for chunk_id in ids or []:
+            self.documents.pop(chunk_id, None)
+
+    def texts(self):
+        return sorted(document.page_content for document in self.documents.values())
+
+
+@pytest.fixture
+def store():
+    return InMemoryStore()
+
+
+@pytest.fixture
+def service(store):
+    return DocumentService(
+        store, text_splitter=TokenTextSplitter(), deduplicator=Deduplicator(path=None, threshold=0.8),
+        sources=SourceRegistry(path=None)
+    )
+
+
+def test_duplicate_is_skipped(service, store):
+    service.process_file(UploadedDocument("a.txt", SHARED), "requirements")
+    report = {}
+    assert service.process_file(UploadedDocument("b.txt", SHARED), "requirements", report=report)
+    assert report["duplicates_skipped"] == 1
+    assert len(store.documents) == 1
+
+
+def test_reuploading_the_same_file_keeps_its_content(service, store):
+    service.process_file(UploadedDocument("a.txt", SHARED), "requirements")
+    service.process_file(UploadedDocument("a.txt", SHARED), "requirements")
+    assert store.texts() == [SHARED.decode()]
+
+
+def test_replacing_a_source_keeps_content_deduplicated_against_it(service, store):
+    service.process_file(UploadedDocument("a.txt", SHARED), "requirements")
+    service.process_file(UploadedDocument("b.txt", SHARED), "requirements")
+
+    service.process_file(UploadedDocument("a.txt", b"Completely new notes about pricing tiers."), "requirements")
+
+    assert SHARED.decode() in store.texts()
+    assert {entry["source"]: entry["chunk_count"] for entry in service.list_sources()} == {"a.txt": 1, "b.txt": 1}
+
+
+def test_deleting_a_source_keeps_content_deduplicated_against_it(service, store):
+    service.process_file(UploadedDocument("a.txt", SHARED), "requirements")
+    service.process_file(UploadedDocument("b.txt", SHARED), "requirements")
+    service.process_file(UploadedDocument("c.txt", SHARED), "requirements")
+
+    service.delete_source("a.txt")
+    assert store.texts() == [SHARED.decode()]
+
+    # The promoted copy is handed on again when its new owner goes too
+    service.delete_source("b.txt")
+    assert store.texts() == [SHARED.decode()]
+
+    result = service.delete_source("c.txt")
+    assert result["chunks_deleted"] == 1
+    assert store.texts() == []
+
+
+def test_an_older_version_is_never_committed_over_a_newer_one():
+    registry = SourceRegistry(path=None)
+    older = registry.begin_version("a.txt", "requirements")
+    newer = registry.begin_version("a.txt", "requirements")
+    registry.add_chunks("a.txt", older, "requirements", ["old"])
+    registry.add_chunks("a.txt", newer, "requirements", ["new"])
+
+    registry.commit_version("a.txt", newer)
+    registry.commit_version("a.txt", older)
+
+    assert registry.live_chunk_ids("a.txt") == ["new"]
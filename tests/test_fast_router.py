@@ -0,0 +1,92 @@
+"""
+Tests for the keyword rules of the fast-path router.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from agents.fast_router import FastPathRouter
+
+LAST_ANSWER = "Positioning: the fastest onboarding for small teams."
+
+
+class ScrapingToolDouble:
+    name = "scraping_tool"
+
+    @staticmethod
+    def _is_valid_url(url):
+        return url.startswith(("http://", "https://"))
+
+
+@pytest.fixture
+def router():
+    tools = [ScrapingToolDouble()] + [
+        SimpleNamespace(name=name) for name in ("slack_tool", "rag_tool", "positioning_tool")
+    ]
+    return FastPathRouter(tools)
+
+
+def route(router, text):
+    return router.route(text, last_assistant_message=LAST_ANSWER)
+
+
+@pytest.mark.parametrize("text", [
+    "Share this to Slack",
+    "please post that in slack",
+    "Send the summary to the #marketing Slack channel",
+    "ok, share it with the team on Slack",
+])
+def test_share_commands_go_to_slack(router, text):
+    decision = route(router, text)
+    assert decision["tool"] == "slack_tool"
+    assert decision["tool_input"] == LAST_ANSWER
+    assert decision["reason"] == "rule:slack_share"
+
+
+@pytest.mark.parametrize("text", [
+    "Can you share this to Slack?",
+    "What did we post in Slack last week",
+    "How do I send messages to Slack",
+    "Our customers share feedback in Slack communities",
+    "Is the slack integration shared across workspaces?",
+])
+def test_questions_and_mentions_of_slack_are_left_to_the_agent(router, text):
+    assert route(router, text) is None
+
+
+def test_share_command_without_content_is_left_to_the_agent(router):
+    assert router.route("Share this to Slack") is None
+
+
+@pytest.mark.parametrize("text,reason", [
+    ("Analyze https://competitor.com/pricing", "rule:url"),
+    ("please scrape https://acme.io/features", "rule:url"),
+    ("Check out https://acme.io/pricing!", "rule:url"),
+    ("https://acme.io/product.", "rule:url_only"),
+])
+def test_single_url_goes_to_the_scraper(router, text, reason):
+    decision = route(router, text)
+    assert decision["tool"] == "scraping_tool"
+    assert decision["tool_input"] == text.split()[-1].rstrip(".!")
+    assert decision["reason"] == reason
+
+
+@pytest.mark.parametrize("text", [
+    "Compare https://a.com and https://b.com",
+    "Share https://a.com to Slack",
+    "What is on https://a.com? Post it to slack",
+])
+def test_several_urls_or_slack_with_a_url_are_left_to_the_agent(router, text):
+    assert route(router, text) is None
+
+
+@pytest.mark.parametrize("text", [
+    "Is https://acme.io a competitor of ours?",
+    "What did we conclude about https://acme.io?",
+    "How does https://acme.io/pricing compare to our plans",
+    "Our launch page https://acme.io/launch needs new copy",
+    "Can you analyze the competitor site at https://acme.io?",
+])
+def test_questions_and_remarks_about_a_url_are_left_to_the_agent(router, text):
+    assert route(router, text) is None
@@ -0,0 +1,48 @@
+"""
+Tests for resuming jobs left running by a previous process.
+"""
+
+import sqlite3
+
+from utils.job_queue import FAILED, RUNNING, SUCCEEDED, JobQueue
+
+
+def interrupt(path, attempts):
+    """Leave an echo job 'running' after the given number of attempts, as a crash would."""
+    JobQueue(path=path)
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "INSERT INTO jobs (id, kind, payload, status, attempts, created_at) VALUES (?, ?, ?, ?, ?, 0)",
+            ("job-1", "echo", '{"value": 1}', RUNNING, attempts)
+        )
+
+
+def resume(path):
+    """Start a fresh queue on the same table and wait for resumed jobs to finish."""
+    queue = JobQueue(path=path, max_attempts=3)
+    queue.register("echo", lambda payload, context: payload["value"])
+    queue.start()
+    queue._executor.shutdown(wait=True)
+    return queue
+
+
+def test_an_interrupted_job_is_resumed(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    interrupt(path, attempts=1)
+
+    job = resume(path).get("job-1")
+
+    assert job["status"] == SUCCEEDED
+    assert job["result"] == 1
+    assert job["attempts"] == 2
+
+
+def test_a_job_interrupted_max_attempts_times_is_failed_instead_of_resumed(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    interrupt(path, attempts=3)
+
+    job = resume(path).get("job-1")
+
+    assert job["status"] == FAILED
+    assert job["attempts"] == 3
+    assert "Interrupted 3 times" in job["error"]
@@ -0,0 +1,55 @@
+"""
+Tests for dropping stored messages once their turns are summarized.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from agents.memory import ConversationMemory
+
+LARGE = "Positioning analysis. " * 100
+
+
+class SummarizerDouble:
+    def invoke(self, prompt):
+        return SimpleNamespace(content="Earlier turns.")
+
+
+@pytest.fixture
+def memory():
+    return ConversationMemory(llm=SummarizerDouble(), max_turns=2, reference_threshold=50, preview_chars=40)
+
+
+def test_large_messages_are_stored_by_reference(memory):
+    memory.add_user_message("Analyze acme.io")
+    memory.add_assistant_message(LARGE)
+
+    assert len(memory.artifacts) == 1
+    assert len(memory.turns[-1]["content"]) < len(LARGE)
+    assert memory.last_assistant_message() == LARGE
+
+
+def test_summarized_turns_release_their_stored_messages(memory):
+    for n in range(4):
+        memory.add_user_message(f"{n}: " + LARGE)
+        memory.add_assistant_message(f"answer {n}: " + LARGE)
+
+    refs = {turn["ref"] for turn in memory.turns}
+    assert set(memory.artifacts) == refs
+    assert memory.summary == "Earlier turns."
+    assert memory.last_assistant_message() == "answer 3: " + LARGE
+
+
+def test_the_last_answer_stays_shareable_after_it_is_summarized(memory):
+    memory.add_assistant_message(LARGE)
+    memory.add_user_message("first follow-up")
+    memory.add_user_message("second follow-up")
+
+    assert all(turn["role"] == "user" for turn in memory.turns)
+    assert memory.last_assistant_message() == LARGE
+    assert len(memory.artifacts) == 1
+
+    memory.add_assistant_message("short answer")
+    assert memory.artifacts == {}
+    assert memory.last_assistant_message() == "short answer"
@@ -0,0 +1,74 @@
+"""
+Tests for retries in the rate-limited OpenAI transport.
+"""
+
+import json
+
+import httpx
+import pytest
+
+from utils.deadline import Deadline, deadline_scope
+from utils.rate_limiter import RateLimitedTransport
+from utils.resilience import RetryPolicy
+
+
+class FlakyTransport(httpx.BaseTransport):
+    """Fails the first requests with the given errors or status codes, then succeeds."""
+
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def handle_request(self, request):
+        self.calls += 1
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return httpx.Response(failure, request=request)
+        return httpx.Response(200, json={"ok": True}, request=request)
+
+
+def request():
+    body = json.dumps({"model": "test-model", "messages": [{"role": "user", "content": "hi"}]})
+    return httpx.Request("POST", "https://api.openai.com/v1/chat/completions", content=body)
+
+
+def transport(inner, max_retries=3):
+    return RateLimitedTransport(RetryPolicy(max_retries=max_retries, base_delay_s=0.001, max_delay_s=0.01), inner)
+
+
+@pytest.mark.parametrize("error", [
+    httpx.ConnectError("connection refused"),
+    httpx.ReadTimeout("read timed out"),
+    httpx.RemoteProtocolError("server disconnected"),
+])
+def test_transport_errors_are_retried(error):
+    inner = FlakyTransport(error, error)
+    response = transport(inner).handle_request(request())
+    assert response.status_code == 200
+    assert inner.calls == 3
+
+
+def test_transport_errors_are_raised_once_retries_are_exhausted():
+    inner = FlakyTransport(*[httpx.ConnectError("connection refused")] * 3)
+    with pytest.raises(httpx.ConnectError):
+        transport(inner, max_retries=2).handle_request(request())
+    assert inner.calls == 3
+
+
+def test_transport_errors_are_not_retried_past_the_deadline():
+    class FixedDelay(RetryPolicy):
+        def delay(self, attempt, retry_after=None):
+            return 10.0
+
+    inner = FlakyTransport(httpx.ConnectError("connection refused"))
+    with deadline_scope(Deadline(1.0)), pytest.raises(httpx.ConnectError):
+        RateLimitedTransport(FixedDelay(max_retries=3), inner).handle_request(request())
+    assert inner.calls == 1
+
+
+def test_server_errors_are_retried():
+    inner = FlakyTransport(503, 429)
+    assert transport(inner).handle_request(request()).status_code == 200
+    assert inner.calls == 3
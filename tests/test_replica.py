@@ -0,0 +1,90 @@
+"""
+Tests for reloading the Pinecone read replica after a restart.
+"""
+
+import pytest
+
+from utils.replica import PineconeReplica
+
+
+class IndexDouble:
+    """Pinecone index double with the list/fetch/upsert/delete calls the replica uses."""
+
+    def __init__(self):
+        self.vectors = {}
+
+    def list(self, namespace=None):
+        yield list(self.vectors)
+
+    def fetch(self, ids, namespace=None):
+        return {"vectors": {
+            chunk_id: {"values": self.vectors[chunk_id][0], "metadata": self.vectors[chunk_id][1]}
+            for chunk_id in ids if chunk_id in self.vectors
+        }}
+
+    def upsert(self, chunk_id, values, text):
+        self.vectors[chunk_id] = (values, {"text": text, "doc_type": "requirements"})
+
+    def delete(self, chunk_id):
+        del self.vectors[chunk_id]
+
+
+def write(replica, index, chunk_id, values, text):
+    """Write through to Pinecone and the replica, as ReplicatedVectorStore does."""
+    index.upsert(chunk_id, values, text)
+    replica.upsert([chunk_id], [values], [text], [{"doc_type": "requirements"}])
+
+
+def search(replica, values, k=5):
+    return [document.page_content for document, _ in replica.search(values, k=k)]
+
+
+@pytest.fixture
+def index():
+    index = IndexDouble()
+    index.upsert("a", [1.0, 0.0, 0.0], "exported")
+    return index
+
+
+def test_writes_since_the_export_survive_a_restart(tmp_path, index):
+    replica = PineconeReplica(index, path=str(tmp_path))
+    replica.export()
+    write(replica, index, "b", [0.0, 1.0, 0.0], "added after export")
+    index.delete("a")
+    replica.delete(["a"])
+
+    restarted = PineconeReplica(index, path=str(tmp_path))
+
+    assert restarted.ready
+    assert search(restarted, [0.0, 1.0, 0.0]) == ["added after export"]
+
+
+def test_export_folds_the_write_log_into_the_snapshot(tmp_path, index):
+    replica = PineconeReplica(index, path=str(tmp_path))
+    replica.export()
+    write(replica, index, "b", [0.0, 1.0, 0.0], "added after export")
+
+    replica.export()
+
+    assert not (tmp_path / "writes.jsonl").exists()
+    restarted = PineconeReplica(index, path=str(tmp_path))
+    assert restarted.stats()["delta_rows"] == 0
+    assert sorted(search(restarted, [1.0, 1.0, 0.0])) == ["added after export", "exported"]
+
+
+def test_writes_before_the_first_export_are_not_lost(tmp_path, index):
+    replica = PineconeReplica(index, path=str(tmp_path))
+    assert not replica.ready
+    write(replica, index, "b", [0.0, 1.0, 0.0], "added before export")
+
+    replica.export()
+
+    assert sorted(search(replica, [1.0, 1.0, 0.0])) == ["added before export", "exported"]
+
+
+def test_clear_survives_a_restart(tmp_path, index):
+    replica = PineconeReplica(index, path=str(tmp_path))
+    replica.export()
+    replica.clear()
+
+    assert search(PineconeReplica(index, path=str(tmp_path)), [1.0, 0.0, 0.0]) == []
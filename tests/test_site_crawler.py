@@ -0,0 +1,204 @@
+"""
+Tests for URL ranking, sitemap parsing and redirect checks in the site crawler.
+"""
+
+import gzip
+from xml.etree import ElementTree
+
+import pytest
+
+from services import site_crawler
+from services.site_crawler import SiteCrawler, _HostThrottle, _read_sitemap, score_url
+
+SITEMAP = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+    + "".join(f"<url><loc> https://acme.io/page-{n} </loc></url>" for n in range(20))
+    + "</urlset>"
+).encode()
+
+
+class ResponseDouble:
+    """requests response double with the attributes the crawler reads."""
+
+    def __init__(self, url, status_code=200, body=b"", headers=None, chunk_size=64):
+        self.url = url
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {"Content-Type": "text/html; charset=utf-8"}
+        self.chunk_size = chunk_size
+        self.encoding = "utf-8"
+        self.closed = False
+
+    @property
+    def is_redirect(self):
+        return self.status_code in (301, 302, 303, 307, 308) and "Location" in self.headers
+
+    @property
+    def text(self):
+        return self.body.decode(self.encoding)
+
+    def iter_content(self, chunk_size=None):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def close(self):
+        self.closed = True
+
+
+class SessionDouble:
+    """Serves canned responses by URL and records the requested URLs."""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.requested = []
+
+    def get(self, url, timeout=None, allow_redirects=True, stream=False):
+        assert allow_redirects is False
+        self.requested.append(url)
+        route = self.routes.get(url)
+        if route is None:
+            return ResponseDouble(url, status_code=404)
+        if isinstance(route, str) and route.startswith("redirect:"):
+            return ResponseDouble(url, status_code=301, headers={"Location": route[len("redirect:"):]})
+        return ResponseDouble(url, body=route.encode() if isinstance(route, str) else route)
+
+
+def redirect(location):
+    return f"redirect:{location}"
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://acme.io/pricing", 10),
+    ("https://acme.io/en/features", 8),
+    ("https://acme.io/solutions/for-teams", 10),
+    ("https://acme.io/product/a/b/features", 10),
+    ("https://acme.io/about", 0),
+    ("https://acme.io/blog/pricing-tips", -1),
+    ("https://acme.io/de/pricing", -1),
+    ("https://acme.io/pricing.pdf", -1),
+    ("https://acme.io/sign-up", -1),
+])
+def test_score_url(url, expected):
+    assert score_url(url) == expected
+
+
+def test_deep_pages_score_lower_than_shallow_ones():
+    assert score_url("https://acme.io/pricing") > score_url("https://acme.io/a/b/c/pricing") > 0
+
+
+def test_sitemap_locations_are_read_from_the_stream():
+    root_tag, locations = _read_sitemap(ResponseDouble("https://acme.io/sitemap.xml", body=SITEMAP), 100)
+
+    assert root_tag == "urlset"
+    assert locations[:2] == ["https://acme.io/page-0", "https://acme.io/page-1"]
+    assert len(locations) == 20
+
+
+def test_gzipped_sitemaps_are_decompressed():
+    response = ResponseDouble("https://acme.io/sitemap.xml.gz", body=gzip.compress(SITEMAP))
+
+    assert _read_sitemap(response, 100) == _read_sitemap(ResponseDouble("https://acme.io/sitemap.xml", body=SITEMAP), 100)
+
+
+def test_sitemap_index_root_is_reported():
+    body = (b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            b"<sitemap><loc>https://acme.io/sitemap-pages.xml</loc></sitemap></sitemapindex>")
+
+    assert _read_sitemap(ResponseDouble("https://acme.io/sitemap.xml", body=body), 100) == (
+        "sitemapindex", ["https://acme.io/sitemap-pages.xml"]
+    )
+
+
+def test_sitemap_reading_stops_at_max_urls():
+    _, locations = _read_sitemap(ResponseDouble("https://acme.io/sitemap.xml", body=SITEMAP), 5)
+
+    assert len(locations) == 5
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_sitemap_reading_stops_at_the_byte_limit(monkeypatch, compress):
+    monkeypatch.setattr(site_crawler, "MAX_SITEMAP_BYTES", 500)
+    body = gzip.compress(SITEMAP) if compress else SITEMAP
+
+    root_tag, locations = _read_sitemap(ResponseDouble("https://acme.io/sitemap.xml", body=body), 100)
+
+    assert root_tag == "urlset"
+    assert 0 < len(locations) < 20
+
+
+def test_a_sitemap_that_is_not_xml_raises():
+    with pytest.raises(ElementTree.ParseError):
+        _read_sitemap(ResponseDouble("https://acme.io/sitemap.xml", body=b"Not found"), 100)
+
+
+def test_malformed_xml_after_valid_entries_keeps_them():
+    body = SITEMAP[:SITEMAP.index(b"<url><loc> https://acme.io/page-3")] + b"<url><loc>&broken;</loc></url>"
+
+    _, locations = _read_sitemap(ResponseDouble("https://acme.io/sitemap.xml", body=body), 100)
+
+    assert locations == ["https://acme.io/page-0", "https://acme.io/page-1", "https://acme.io/page-2"]
+
+
+def get(routes, url, allowed=lambda url: url.startswith("https://acme.io/")):
+    session = SessionDouble(routes)
+    response = SiteCrawler(session)._get(url, _HostThrottle(0), allowed)
+    return session, response
+
+
+def test_redirects_within_the_site_are_followed_one_hop_at_a_time():
+    session, response = get({
+        "https://acme.io/features": redirect("/features/"),
+        "https://acme.io/features/": "<html>Features</html>",
+    }, "https://acme.io/features")
+
+    assert response.url == "https://acme.io/features/"
+    assert session.requested == ["https://acme.io/features", "https://acme.io/features/"]
+
+
+def test_redirects_off_the_site_are_refused_before_they_are_fetched():
+    with pytest.raises(ValueError, match="Refusing redirect"):
+        get({"https://acme.io/pricing": redirect("https://evil.example/pricing")}, "https://acme.io/pricing")
+
+
+def test_redirects_to_pages_robots_disallows_are_refused():
+    def allowed(url):
+        return not url.startswith("https://acme.io/private")
+
+    with pytest.raises(ValueError, match="Refusing redirect"):
+        get({"https://acme.io/pricing": redirect("/private/pricing")}, "https://acme.io/pricing", allowed)
+
+
+def test_redirect_loops_stop_after_max_redirects():
+    routes = {"https://acme.io/a": redirect("/b"), "https://acme.io/b": redirect("/a")}
+
+    with pytest.raises(ValueError, match="Too many redirects"):
+        get(routes, "https://acme.io/a")
+
+
+def test_crawl_fetches_the_start_page_then_the_best_product_pages():
+    routes = {
+        "https://acme.io/robots.txt": "User-agent: *\nDisallow: /private\n",
+        "https://acme.io/sitemap.xml": (
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            "<url><loc>https://acme.io/pricing</loc></url>"
+            "<url><loc>https://acme.io/blog/launch</loc></url>"
+            "<url><loc>https://acme.io/private/plans</loc></url>"
+            "</urlset>"
+        ),
+        "https://acme.io/": '<a href="/features">Features</a><a href="/old-pricing">Old</a>',
+        "https://acme.io/pricing": "<p>Pricing</p>",
+        "https://acme.io/features": "<p>Features</p>",
+        "https://acme.io/old-pricing": redirect("/pricing"),
+    }
+    session = SessionDouble(routes)
+
+    pages = SiteCrawler(session, politeness_delay_s=0).crawl("https://acme.io")
+
+    assert [page.url for page in pages] == ["https://acme.io/", "https://acme.io/pricing", "https://acme.io/features"]
+    assert "https://acme.io/blog/launch" not in session.requested
+    assert "https://acme.io/private/plans" not in session.requested
@@ -0,0 +1,90 @@
+"""
+Tests for converting Markdown into Slack mrkdwn and Block Kit messages.
+"""
+
+import pytest
+
+from tools.slack_formatting import (
+    DEFAULT_HEADLINE,
+    FOOTER,
+    MAX_HEADER_CHARS,
+    build_messages,
+    extract_headline,
+    markdown_to_mrkdwn,
+)
+
+
+def headers(messages):
+    return [block for message in messages for block in message["blocks"] if block["type"] == "header"]
+
+
+def test_inline_markdown_becomes_mrkdwn():
+    markdown = "**Bold**, *italic*, ~~gone~~, [docs](https://acme.io) and `a < b`"
+
+    assert markdown_to_mrkdwn(markdown) == "*Bold*, _italic_, ~gone~, <https://acme.io|docs> and `a &lt; b`"
+
+
+def test_headings_bullets_and_code_blocks():
+    markdown = "## Pricing\n- Cheap\n  - Really *cheap*\n```\nx -> y\n```"
+
+    assert markdown_to_mrkdwn(markdown) == "*Pricing*\n• Cheap\n    • Really _cheap_\n```\nx -&gt; y\n```"
+
+
+@pytest.mark.parametrize("markdown, headline", [
+    ("# Acme positioning\nBody", "Acme positioning"),
+    ("**Key takeaways:** we win on onboarding", "Key takeaways"),
+    ("Compared with our product, Rocket, they are slower.", "Analysis for Rocket"),
+    ("Acme is cheaper. It is also slower.", "Acme is cheaper."),
+    ("", DEFAULT_HEADLINE),
+])
+def test_headline_sources(markdown, headline):
+    assert extract_headline(markdown) == headline
+
+
+def test_long_headlines_are_truncated():
+    headline = extract_headline("# " + "word " * 100)
+
+    assert len(headline) == MAX_HEADER_CHARS and headline.endswith("…")
+
+
+@pytest.mark.parametrize("markdown", ["# **", "# **\n\n---", "** **", "#  `` \n\n***"])
+def test_a_heading_without_text_never_becomes_an_empty_header(markdown):
+    for header in headers(build_messages([markdown])):
+        assert header["text"]["text"].strip()
+
+
+def test_an_empty_heading_falls_back_to_the_body():
+    messages = build_messages(["# **\n\nAcme ships weekly. Rocket ships daily."])
+
+    assert headers(messages)[0]["text"]["text"] == "Acme ships weekly."
+
+
+def test_one_message_with_a_header_body_and_footer():
+    messages = build_messages(["# Acme\nAcme is cheap.\n\n## Risks\n- Slow support"])
+
+    assert len(messages) == 1
+    blocks = messages[0]["blocks"]
+    assert messages[0]["text"] == "Acme"
+    assert [block["type"] for block in blocks] == ["header", "section", "section", "context"]
+    assert blocks[2]["text"]["text"] == "*Risks*\n• Slow support"
+    assert blocks[-1]["elements"][0]["text"] == FOOTER
+
+
+def test_long_documents_continue_in_further_messages_within_the_limits():
+    sections = "\n\n".join(f"## Section {n}\n" + "Detail sentence. " * 100 for n in range(12))
+
+    messages = build_messages([sections], max_blocks=5, max_message_chars=4000)
+
+    assert len(messages) > 1
+    for message in messages:
+        assert len(message["blocks"]) <= 5
+        assert sum(len(block["text"]["text"]) for block in message["blocks"] if "text" in block) <= 4000
+    assert messages[1]["text"].startswith("Section")
+    assert len(headers(messages)) == 1
+
+
+def test_documents_shared_together_are_separated_by_dividers():
+    messages = build_messages(["# First\nOne.", "# Second\nTwo."])
+
+    types = [block["type"] for block in messages[0]["blocks"]]
+    assert types.count("divider") == 1 and types.count("header") == 2
@@ -0,0 +1,133 @@
+"""
+Tests for batching, retrying and reclaiming messages in the Slack outbox.
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from services.slack_outbox import FAILED, PENDING, SENDING, SENT, SlackOutbox
+
+
+class RateLimited(Exception):
+    """Slack API error double for a 429 response."""
+
+    def __init__(self, retry_after):
+        super().__init__("ratelimited")
+        self.response = type("Response", (), {"status_code": 429, "headers": {"Retry-After": retry_after}})()
+
+
+class SenderDouble:
+    """Records posted batches and raises the queued errors first."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.posts = []
+
+    def __call__(self, channel, contents):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.posts.append((channel, contents))
+        return {"ts": f"ts-{len(self.posts)}"}
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return SlackOutbox(str(tmp_path / "outbox.db"), min_interval_s=0.0, batch_window_s=0.0,
+                       max_batch_size=3, max_attempts=2, base_retry_delay_s=0.0)
+
+
+def make_due(outbox):
+    """Make every pending message due now."""
+    with sqlite3.connect(outbox.path) as connection:
+        connection.execute("UPDATE slack_outbox SET next_attempt_at = 0")
+    outbox._channel_ready_at.clear()
+
+
+def test_messages_for_one_channel_are_posted_together_up_to_the_batch_size(outbox):
+    outbox.sender = SenderDouble()
+    ids = [outbox.enqueue(f"message {n}", "#general") for n in range(4)]
+    other = outbox.enqueue("elsewhere", "#random")
+
+    outbox._deliver_due()
+
+    assert sorted(outbox.sender.posts) == [
+        ("#general", ["message 0", "message 1", "message 2"]),
+        ("#random", ["elsewhere"]),
+    ]
+    first = outbox.get(ids[0])
+    assert first["status"] == SENT and first["batch_size"] == 3 and first["message_ts"]
+    assert outbox.get(ids[3])["status"] == PENDING
+    assert outbox.get(other)["status"] == SENT
+
+    outbox._deliver_due()
+    assert outbox.sender.posts[-1] == ("#general", ["message 3"])
+
+
+def test_a_failed_post_is_retried_then_marked_failed(outbox):
+    outbox.sender = SenderDouble(RuntimeError("boom"), RuntimeError("boom again"))
+    message_id = outbox.enqueue("hello", "#general")
+
+    outbox._deliver_due()
+    message = outbox.get(message_id)
+    assert message["status"] == PENDING and message["attempts"] == 1 and message["error"] == "boom"
+
+    make_due(outbox)
+    outbox._deliver_due()
+    message = outbox.get(message_id)
+    assert message["status"] == FAILED and message["attempts"] == 2
+    assert outbox.sender.posts == []
+
+
+def test_a_rate_limited_channel_waits_for_retry_after(outbox):
+    outbox.sender = SenderDouble(RateLimited("30"))
+    message_id = outbox.enqueue("hello", "#general")
+
+    outbox._deliver_due()
+
+    assert outbox.get(message_id)["next_attempt_at"] >= time.time() + 29
+    assert outbox._channel_ready_at["#general"] >= time.time() + 29
+
+
+def test_only_messages_whose_lease_expired_are_reclaimed(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    outbox = SlackOutbox(path, batch_window_s=0.0, lease_s=60.0)
+    stale = outbox.enqueue("stale", "#general")
+    live = outbox.enqueue("live", "#general")
+    with sqlite3.connect(path) as connection:
+        connection.execute("UPDATE slack_outbox SET status = ?, claimed_at = ? WHERE id = ?",
+                           (SENDING, time.time() - 120, stale))
+        connection.execute("UPDATE slack_outbox SET status = ?, claimed_at = ? WHERE id = ?",
+                           (SENDING, time.time(), live))
+
+    # Another worker opening the same outbox must not take over the live claim
+    other = SlackOutbox(path, batch_window_s=0.0, lease_s=60.0)
+    other.sender = SenderDouble()
+    other._deliver_due()
+
+    assert other.sender.posts == [("#general", ["stale"])]
+    assert other.get(stale)["status"] == SENT
+    assert other.get(live)["status"] == SENDING
+
+
+def test_an_outbox_from_before_leases_gains_the_claimed_at_column(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE slack_outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+            "content TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt_at REAL NOT NULL, error TEXT, message_ts TEXT, batch_size INTEGER, "
+            "created_at REAL NOT NULL, sent_at REAL)"
+        )
+        connection.execute(
+            "INSERT INTO slack_outbox (channel, content, status, next_attempt_at, created_at) VALUES (?, ?, ?, 0, 0)",
+            ("#general", "left claimed", SENDING)
+        )
+
+    outbox = SlackOutbox(path)
+    outbox.sender = SenderDouble()
+    outbox._deliver_due()
+
+    assert outbox.sender.posts == [("#general", ["left claimed"])]
+    assert outbox.get(1)["claimed_at"] is not None
@@ -0,0 +1,116 @@
+"""
+Tests for streaming table rows and grouping them into chunk documents.
+"""
+
+import io
+
+import pytest
+
+from services.table_loader import TableChunker, is_table, iter_rows
+
+SURVEY = (
+    "Respondent_ID,Segment,Question,Answer\n"
+    "r1,SMB,Biggest pain?,Onboarding takes weeks\n"
+    "r1,SMB,Would you switch?,Yes\n"
+    ",,,\n"
+    "r2,Enterprise,Biggest pain?,SSO is missing\n"
+)
+
+
+def rows(text, name="survey.csv"):
+    return list(iter_rows(io.BytesIO(text.encode("utf-8")), name))
+
+
+def test_table_extensions():
+    assert is_table("Survey.CSV") and is_table("notes.tsv") and is_table("export.xlsx")
+    assert not is_table("notes.txt")
+
+
+def test_csv_rows_are_stripped_dictionaries_with_the_bom_removed():
+    parsed = rows("﻿id, name\n1 , Ada \n")
+
+    assert parsed == [{"id": "1", "name": "Ada"}]
+
+
+def test_the_delimiter_is_sniffed_and_tsv_is_read_by_extension():
+    assert rows("id;name\n1;Ada\n") == [{"id": "1", "name": "Ada"}]
+    assert rows("id\tname\n1\tAda, Lovelace\n", name="people.tsv") == [{"id": "1", "name": "Ada, Lovelace"}]
+
+
+def test_short_rows_get_empty_values():
+    assert rows("id,name,role\n1,Ada\n") == [{"id": "1", "name": "Ada", "role": ""}]
+
+
+def test_the_caller_file_stays_open():
+    file = io.BytesIO(b"id\n1\n")
+    list(iter_rows(file, "ids.csv"))
+
+    assert not file.closed
+
+
+def test_rows_are_grouped_by_the_detected_respondent_column():
+    documents = list(TableChunker().chunks(iter(rows(SURVEY)), {"doc_type": "interviews"}))
+
+    assert [document.metadata["group"] for document in documents] == ["r1", "r2"]
+    first = documents[0]
+    assert first.metadata["doc_type"] == "interviews"
+    assert first.metadata["Segment"] == "SMB"
+    assert (first.metadata["row_start"], first.metadata["row_end"]) == (1, 2)
+    assert first.page_content.splitlines() == [
+        "Respondent_ID: r1 | Segment: SMB",
+        "Question: Biggest pain?; Answer: Onboarding takes weeks",
+        "Question: Would you switch?; Answer: Yes",
+    ]
+    # The blank row is skipped but still counted
+    assert documents[1].metadata["row_start"] == 4
+
+
+def test_group_by_matches_headers_case_insensitively():
+    documents = list(TableChunker(group_by="segment").chunks(iter(rows(SURVEY)), {}))
+
+    assert [document.metadata["group"] for document in documents] == ["SMB", "Enterprise"]
+    assert documents[0].metadata["Respondent_ID"] == "r1"
+
+
+def test_an_unknown_group_by_column_is_reported():
+    with pytest.raises(ValueError, match="Column 'persona' not found"):
+        list(TableChunker(group_by="persona").chunks(iter(rows(SURVEY)), {}))
+
+
+def test_large_groups_continue_in_further_chunks():
+    text = "respondent,answer\n" + "".join(f"r1,{'word ' * 20}{n}\n" for n in range(10))
+
+    documents = list(TableChunker(chunk_chars=300).chunks(iter(rows(text)), {}))
+
+    assert len(documents) > 1
+    assert all(document.metadata["group"] == "r1" for document in documents)
+    assert documents[-1].metadata["row_end"] == 10
+    assert [document.metadata["row_start"] for document in documents[1:]] == [
+        document.metadata["row_end"] + 1 for document in documents[:-1]
+    ]
+
+
+def test_without_a_group_column_rows_are_chunked_by_size_and_metadata_lists_values():
+    text = "segment,answer\n" + "".join(f"{segment},Answer {n}\n" for n, segment in enumerate(["SMB", "Mid", "SMB"]))
+
+    documents = list(TableChunker().chunks(iter(rows(text)), {}))
+
+    assert len(documents) == 1
+    assert "group" not in documents[0].metadata
+    assert documents[0].metadata["segment"] == ["SMB", "Mid"]
+
+
+def test_xlsx_rows_are_read_from_the_first_worksheet():
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["respondent", "score", None])
+    workbook.active.append(["r1", 9, "ignored"])
+    workbook.active.append(["r2", None, None])
+    file = io.BytesIO()
+    workbook.save(file)
+    file.seek(0)
+
+    assert list(iter_rows(file, "scores.xlsx")) == [
+        {"respondent": "r1", "score": "9"},
+        {"respondent": "r2", "score": ""},
+    ]
@@ -0,0 +1,63 @@
+"""
+Tests for the chunk-size and coverage invariants of TokenTextSplitter.
+"""
+
+import random
+
+import pytest
+
+from services.text_splitter import TokenTextSplitter
+from utils.tokens import count_tokens
+
+WORDS = ["admins", "setup", "wizard", "pricing", "teams", "onboarding", "e.g.", "3.5", "(beta)", "workflow"]
+
+
+def prose(seed: int, paragraphs: int = 20) -> str:
+    rng = random.Random(seed)
+    return "\n\n".join(
+        " ".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 30))).capitalize() + rng.choice([".", "!", "?"])
+            for _ in range(rng.randint(1, 8))
+        )
+        for _ in range(paragraphs)
+    )
+
+
+TEXTS = {
+    "prose": prose(1),
+    "short lines": "\n".join(f"- item {i}: {' '.join(WORDS[: i % 7 + 1])}" for i in range(300)),
+    "no separators": " ".join(WORDS[i % len(WORDS)] for i in range(3000)),
+    "one long token": "x" * 5000,
+    "short": "Just one sentence.",
+}
+
+
+@pytest.mark.parametrize("name", TEXTS)
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(50, 10), (250, 50)])
+def test_chunks_fit_and_cover_the_text(name, chunk_size, chunk_overlap):
+    text = TEXTS[name]
+    splitter = TokenTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    spans = splitter.split_spans(text)
+
+    assert spans
+    covered = [False] * len(text)
+    for span in spans:
+        chunk = span.text(text)
+        assert chunk and chunk == chunk.strip()
+        assert span.token_count <= chunk_size
+        assert count_tokens(chunk, splitter.model) <= chunk_size
+        covered[span.offset:span.offset + span.length] = [True] * span.length
+
+    # Every character outside whitespace belongs to a chunk
+    assert all(covered[index] for index, char in enumerate(text) if not char.isspace())
+    offsets = [span.offset for span in spans]
+    assert offsets == sorted(set(offsets))
+
+
+def test_blank_text_has_no_chunks():
+    assert TokenTextSplitter().split_text(" \n\n ") == []
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        TokenTextSplitter(chunk_size=50, chunk_overlap=50)
@@ -4,10 +4,16 @@ Tool for generating product positioning analysis.
 
 from langchain.tools import BaseTool
 from typing import Optional, Dict, Any, List
+import time
 import streamlit as st
-from langchain_openai import ChatOpenAI
+from utils.llm import chat_model
 from typing import Any
 from pydantic import Field
+from utils.deadline import deadline_kwargs, run_with_deadline
+from utils.single_flight import SingleFlight, knowledge_base_generation, normalize_text
+
+# Concurrent identical positioning requests share one analysis
+_positioning_flight = SingleFlight("positioning")
 
 class PositioningTool(BaseTool):
     """
@@ -22,6 +28,8 @@ class PositioningTool(BaseTool):
     """
     vector_store: Any = Field(description="Vector store for retrieving relevant information")
     llm: Any = Field(default=None, description="Language model to use")
+    context_ttl_s: float = Field(default=60.0, description="Seconds a retrieved positioning context stays fresh")
+    context_cache: Dict[str, Any] = Field(default_factory=dict, description="Cached positioning context")
     
     def __init__(self, vector_store, llm=None):
         """
@@ -31,7 +39,7 @@ class PositioningTool(BaseTool):
             vector_store: The vector store to use for retrieving relevant information
             llm: Language model to use (optional)
         """
-        llm = llm or ChatOpenAI(model="gpt-4", temperature=0.7)
+        llm = llm or chat_model(model="gpt-4", temperature=0.7)
         super().__init__(vector_store=vector_store, llm=llm)
         
     def _run(self, query: Optional[str] = None) -> str:
@@ -46,38 +54,48 @@ class PositioningTool(BaseTool):
         """
         try:
             feature_info = self._get_feature_info()
-            
-            # Gather all relevant information from vector store
-            product_info = self._get_product_info()
-            user_insights = self._get_user_insights()
-            competitor_info = self._get_competitor_info()
-            
-            context = {
-                'product_info': self._format_docs(product_info),
-                'user_insights': self._format_docs(user_insights),
-                'competitor_info': self._format_docs(competitor_info)
-            }
-            
-            # Include the query in the prompt if provided
-            additional_context = ""
-            if query:
-                additional_context = f"\nAdditional Request: {query}"
-            
-            from agents.prompts.positioning import POSITIONING_ANALYSIS_PROMPT
-            
-            prompt = self._format_prompt(
-                POSITIONING_ANALYSIS_PROMPT,
-                feature_name=feature_info['name'],
-                release_date=feature_info['release_date'],
-                additional_context=additional_context,
-                **context
+            key = (
+                id(self.vector_store),
+                normalize_text(query),
+                feature_info['name'],
+                feature_info['release_date'],
+                knowledge_base_generation()
             )
-            
-            result = self.llm.invoke(prompt).content
-            return result
+            return _positioning_flight.do(key, self._generate, query, feature_info)
         except Exception as e:
             return f"Error generating positioning analysis: {str(e)}"
     
+    def _generate(self, query: Optional[str], feature_info: Dict[str, Any]) -> str:
+        """
+        Retrieve the positioning context and generate the analysis.
+        
+        Args:
+            query: Optional additional context or specific positioning question
+            feature_info: Name and release date of the feature
+            
+        Returns:
+            The generated positioning analysis as a string
+        """
+        # Gather all relevant information from vector store
+        context = self._get_context()
+        
+        # Include the query in the prompt if provided
+        additional_context = ""
+        if query:
+            additional_context = f"\nAdditional Request: {query}"
+        
+        from agents.prompts.positioning import POSITIONING_ANALYSIS_PROMPT
+        
+        prompt = self._format_prompt(
+            POSITIONING_ANALYSIS_PROMPT,
+            feature_name=feature_info['name'],
+            release_date=feature_info['release_date'],
+            additional_context=additional_context,
+            **context
+        )
+        
+        return self.llm.invoke(prompt, **deadline_kwargs()).content
+    
     def _get_feature_info(self) -> Dict[str, Any]:
         """
         Get feature information from session state.
@@ -90,6 +108,46 @@ class PositioningTool(BaseTool):
             'release_date': 'TBD'
         })
         
+    def context_is_stale(self) -> bool:
+        """
+        Check whether the cached positioning context needs to be refreshed.
+        
+        Returns:
+            True if there is no cached context, it is older than context_ttl_s,
+            or documents were added to the knowledge base since it was fetched
+        """
+        fetched_at = self.context_cache.get('fetched_at')
+        if fetched_at is None or self.context_cache.get('generation') != knowledge_base_generation():
+            return True
+        return time.monotonic() - fetched_at > self.context_ttl_s
+    
+    def warm_context(self) -> Dict[str, str]:
+        """
+        Retrieve the positioning context from the vector store and cache it.
+        
+        Returns:
+            Dictionary of formatted product, user and competitor context
+        """
+        generation = knowledge_base_generation()
+        context = {
+            'product_info': self._format_docs(self._get_product_info()),
+            'user_insights': self._format_docs(self._get_user_insights()),
+            'competitor_info': self._format_docs(self._get_competitor_info())
+        }
+        self.context_cache.update(context=context, fetched_at=time.monotonic(), generation=generation)
+        return context
+    
+    def _get_context(self) -> Dict[str, str]:
+        """
+        Get the positioning context, reusing a fresh cached copy if available.
+        
+        Returns:
+            Dictionary of formatted product, user and competitor context
+        """
+        if not self.context_is_stale():
+            return self.context_cache['context']
+        return self.warm_context()
+        
     def _get_product_info(self):
         """
         Get product information from vector store.
@@ -97,9 +155,11 @@ class PositioningTool(BaseTool):
         Returns:
             List of documents containing product information
         """
-        return self.vector_store.similarity_search(
+        return run_with_deadline(
+            self.vector_store.similarity_search,
             "What are our product's key features and benefits?",
-            filter={"doc_type": "requirements"}
+            filter={"doc_type": "requirements"},
+            operation="vector_search"
         )
         
     def _get_user_insights(self):
@@ -109,9 +169,11 @@ class PositioningTool(BaseTool):
         Returns:
             List of documents containing user insights
         """
-        return self.vector_store.similarity_search(
+        return run_with_deadline(
+            self.vector_store.similarity_search,
             "What are the main user pain points and needs?",
-            filter={"doc_type": "interviews"}
+            filter={"doc_type": "interviews"},
+            operation="vector_search"
         )
         
     def _get_competitor_info(self):
@@ -121,9 +183,11 @@ class PositioningTool(BaseTool):
         Returns:
             List of documents containing competitor information
         """
-        return self.vector_store.similarity_search(
+        return run_with_deadline(
+            self.vector_store.similarity_search,
             "What are competitor strengths and weaknesses?",
-            filter={"type": "product_page"}
+            filter={"type": "product_page"},
+            operation="vector_search"
         )
         
     def _format_docs(self, docs):
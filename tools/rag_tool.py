@@ -4,9 +4,11 @@ Tool for retrieving information from the knowledge base to answer questions.
 
 from langchain.tools import BaseTool
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_openai import ChatOpenAI
+from utils.llm import chat_model
 from typing import Any
 from pydantic import Field
+from agents.speculation import claim_prefetched
+from utils.deadline import deadline_kwargs, run_with_deadline
 
 class RAGTool(BaseTool):
     """
@@ -30,7 +32,7 @@ class RAGTool(BaseTool):
             vector_store: The vector store to use for retrieving relevant information
             llm: Language model to use (optional)
         """
-        llm = llm or ChatOpenAI(model="gpt-4", temperature=0.7)
+        llm = llm or chat_model(model="gpt-4", temperature=0.7)
         super().__init__(vector_store=vector_store, llm=llm)
     
     def _run(self, query: str) -> str:
@@ -44,8 +46,12 @@ class RAGTool(BaseTool):
             The answer from the knowledge base
         """
         try:
-            # Retrieve relevant documents
-            results = self.vector_store.similarity_search(query, k=5)
+            # Retrieve relevant documents, reusing a speculative prefetch if there is one
+            results = claim_prefetched(query, k=5)
+            if results is None:
+                results = run_with_deadline(
+                    self.vector_store.similarity_search, query, k=5, operation="vector_search"
+                )
             context = "\n".join([doc.page_content for doc in results])
             
             # Format prompt with context
@@ -59,7 +65,7 @@ class RAGTool(BaseTool):
             ]
             
             # Generate response
-            response = self.llm.invoke(messages).content
+            response = self.llm.invoke(messages, **deadline_kwargs()).content
             return response
         except Exception as e:
             return f"Error retrieving information: {str(e)}" 
\ No newline at end of file
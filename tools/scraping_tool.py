@@ -54,18 +54,56 @@ class ScrapingTool(BaseTool):
             # Store in vector database
             self.document_service.process_competitor(product_data)
             
-            # Format result
-            response = f"✅ Successfully analyzed {url}. Here's what I found:\n\n"
-            response += f"**Product**: {product_data['name']}\n"
-            response += f"**Description**: {product_data['description']}\n"
-            response += f"**Pain Points**: {', '.join(product_data['pain_points'])}\n"
-            response += f"**Pricing**: {product_data['pricing']}\n"
-            response += f"**Target Audience**: {product_data['target_audience']}\n"
+            return self.format_result(url, product_data)
+        except Exception as e:
+            return f"Error analyzing website: {str(e)}"
+    
+    def analyze_site(self, url: str) -> str:
+        """
+        Crawl a website's product, pricing and feature pages and extract
+        structured data from them together.
+        
+        Args:
+            url: URL of a page of the website to analyze
+            
+        Returns:
+            Formatted analysis result
+        """
+        try:
+            if not self._is_valid_url(url):
+                return "Please provide a valid URL to analyze."
             
-            return response
+            product_data = self.scraping_service.analyze_site(url)
+            if not product_data:
+                return f"Failed to analyze {url}. Please try again with a different URL."
+            
+            self.document_service.process_competitor(product_data)
+            
+            return self.format_result(url, product_data)
         except Exception as e:
             return f"Error analyzing website: {str(e)}"
     
+    def format_result(self, url: str, product_data: Dict[str, Any]) -> str:
+        """
+        Format extracted competitor data for display.
+        
+        Args:
+            url: URL of the analyzed website
+            product_data: Data extracted by the scraping service
+            
+        Returns:
+            Formatted analysis result
+        """
+        response = f"✅ Successfully analyzed {url}. Here's what I found:\n\n"
+        response += f"**Product**: {product_data['name']}\n"
+        response += f"**Description**: {product_data['description']}\n"
+        response += f"**Pain Points**: {', '.join(product_data['pain_points'])}\n"
+        response += f"**Pricing**: {product_data['pricing']}\n"
+        response += f"**Target Audience**: {product_data['target_audience']}\n"
+        if product_data.get('pages'):
+            response += f"**Pages Analyzed**: {', '.join(product_data['pages'])}\n"
+        return response
+    
     def _is_valid_url(self, url: str) -> bool:
         """
         Check if a string is a valid URL.
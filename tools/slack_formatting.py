@@ -0,0 +1,285 @@
+"""
+Local Markdown to Slack mrkdwn conversion and Block Kit message building.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Slack limits: section text, header text and blocks per message
+MAX_SECTION_CHARS = 3000
+MAX_HEADER_CHARS = 150
+MAX_BLOCKS_PER_MESSAGE = 50
+
+FOOTER = "💡 Shared via Feature Positioning Copilot"
+DEFAULT_HEADLINE = "Shared from Feature Positioning Copilot"
+
+HEADING_PATTERN = re.compile(r"^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+BULLET_PATTERN = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+RULE_PATTERN = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+FENCE_PATTERN = re.compile(r"^\s*```")
+
+_BOLD = "\x01"
+
+
+def _escape(text: str) -> str:
+    """Escape the characters Slack treats as control characters."""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _convert_inline(text: str) -> str:
+    """Convert inline Markdown (bold, italics, strikethrough, links, code) to mrkdwn."""
+    # Protect inline code from the other rules
+    code_spans: List[str] = []
+
+    def keep_code(match):
+        code_spans.append(_escape(match.group(0)))
+        return f"\x02{len(code_spans) - 1}\x02"
+
+    text = re.sub(r"`[^`\n]+`", keep_code, text)
+    text = _escape(text)
+    text = re.sub(r"!?\[([^\]]+)\]\((\S+?)(?:\s+\"[^\"]*\")?\)", r"<\2|\1>", text)
+    text = re.sub(r"\*\*(.+?)\*\*|__(.+?)__", lambda m: f"{_BOLD}{m.group(1) or m.group(2)}{_BOLD}", text)
+    text = re.sub(r"(?<![*\w])\*(?![\s*])([^*\n]+?)(?<!\s)\*(?![*\w])", r"_\1_", text)
+    text = re.sub(r"~~(.+?)~~", r"~\1~", text)
+    text = text.replace(_BOLD, "*")
+    return re.sub(r"\x02(\d+)\x02", lambda m: code_spans[int(m.group(1))], text)
+
+
+def markdown_to_mrkdwn(markdown: str) -> str:
+    """
+    Convert Markdown to Slack mrkdwn.
+
+    Args:
+        markdown: Markdown text
+
+    Returns:
+        The text in Slack mrkdwn
+    """
+    lines = []
+    in_code = False
+    for line in markdown.splitlines():
+        if FENCE_PATTERN.match(line):
+            in_code = not in_code
+            lines.append("```")
+            continue
+        if in_code:
+            lines.append(_escape(line))
+            continue
+
+        heading = HEADING_PATTERN.match(line)
+        bullet = BULLET_PATTERN.match(line)
+        if heading:
+            lines.append(f"*{_plain(heading.group(2))}*")
+        elif RULE_PATTERN.match(line):
+            lines.append("")
+        elif bullet:
+            indent = "    " * (len(bullet.group(1).expandtabs(4)) // 2)
+            lines.append(f"{indent}• {_convert_inline(bullet.group(2))}")
+        elif line.lstrip().startswith(">"):
+            lines.append("> " + _convert_inline(line.lstrip()[1:].lstrip()))
+        else:
+            lines.append(_convert_inline(line))
+    return "\n".join(lines).strip()
+
+
+def _plain(text: str) -> str:
+    """Strip inline Markdown, leaving plain text."""
+    text = re.sub(r"!?\[([^\]]+)\]\([^)]*\)", r"\1", text)
+    text = re.sub(r"[*_~`]+", "", text)
+    return " ".join(text.split())
+
+
+def extract_headline(markdown: str) -> str:
+    """
+    Pick a headline for a message.
+
+    Uses the first heading, then a leading bold phrase, then the product
+    name in "our product, X", then the first sentence. Candidates with no
+    text left once Markdown is stripped are skipped, since Slack rejects
+    empty header blocks.
+
+    Args:
+        markdown: Markdown text
+
+    Returns:
+        A plain-text headline of at most MAX_HEADER_CHARS characters
+    """
+    lines = [line for line in markdown.splitlines() if line.strip()]
+    for line in lines:
+        heading = HEADING_PATTERN.match(line)
+        if heading and _plain(heading.group(2)):
+            return _truncate(_plain(heading.group(2)), MAX_HEADER_CHARS)
+
+    leading = "\n".join(lines[:3])
+    for bold in re.finditer(r"\*\*(.+?)\*\*|__(.+?)__", leading):
+        phrase = _plain(bold.group(1) or bold.group(2)).rstrip(":")
+        if phrase:
+            return _truncate(phrase, MAX_HEADER_CHARS)
+
+    product = re.search(r"our product, ([^,\n]+)", markdown)
+    if product:
+        return _truncate(f"Analysis for {product.group(1).strip()}", MAX_HEADER_CHARS)
+
+    for line in lines:
+        if HEADING_PATTERN.match(line) or RULE_PATTERN.match(line):
+            continue
+        first_sentence = re.split(r"(?<=[.!?])\s", _plain(line), maxsplit=1)[0]
+        if first_sentence:
+            return _truncate(first_sentence, MAX_HEADER_CHARS)
+    return DEFAULT_HEADLINE
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def split_sections(markdown: str) -> List[Tuple[Optional[str], str]]:
+    """
+    Split Markdown at its headings.
+
+    Args:
+        markdown: Markdown text
+
+    Returns:
+        (heading or None for the intro, body) pairs in order
+    """
+    sections: List[Tuple[Optional[str], List[str]]] = [(None, [])]
+    in_code = False
+    for line in markdown.splitlines():
+        if FENCE_PATTERN.match(line):
+            in_code = not in_code
+        heading = None if in_code else HEADING_PATTERN.match(line)
+        if heading:
+            sections.append((_plain(heading.group(2)), []))
+        else:
+            sections[-1][1].append(line)
+    return [
+        (title, "\n".join(body).strip())
+        for title, body in sections
+        if title is not None or "\n".join(body).strip()
+    ]
+
+
+def _chunk_text(text: str, limit: int) -> List[str]:
+    """Split text into pieces of at most limit characters at paragraph, then line boundaries."""
+    if len(text) <= limit:
+        return [text]
+    chunks: List[str] = []
+    for separator in ("\n\n", "\n"):
+        parts = text.split(separator)
+        if all(len(part) <= limit for part in parts):
+            current = ""
+            for part in parts:
+                candidate = f"{current}{separator}{part}" if current else part
+                if len(candidate) > limit:
+                    chunks.append(current)
+                    current = part
+                else:
+                    current = candidate
+            chunks.append(current)
+            return [chunk for chunk in chunks if chunk.strip()]
+    # A single line longer than the limit: split it between words
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind(" ", 0, limit)
+        cut = cut if cut > 0 else limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip()
+    return chunks + [text] if text else chunks
+
+
+def _section_block(text: str) -> Dict[str, Any]:
+    return {"type": "section", "text": {"type": "mrkdwn", "text": text}}
+
+
+def build_blocks(markdown: str, headline: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Convert one Markdown document into Block Kit blocks, grouped by heading.
+
+    Args:
+        markdown: Markdown text
+        headline: Optional headline (extracted from the text if omitted)
+
+    Returns:
+        Groups of blocks, one group per heading section; the first group
+        starts with a header block
+    """
+    headline = headline or extract_headline(markdown)
+    groups: List[List[Dict[str, Any]]] = []
+    for index, (title, body) in enumerate(split_sections(markdown)):
+        # The first heading usually is the headline itself
+        if index == 0 and title is not None and title == headline:
+            title = None
+        text = markdown_to_mrkdwn(body)
+        if title:
+            text = f"*{_escape(title)}*\n{text}".strip()
+        if not text:
+            continue
+        groups.append([_section_block(chunk) for chunk in _chunk_text(text, MAX_SECTION_CHARS)])
+
+    header = {"type": "header", "text": {"type": "plain_text", "text": _truncate(headline, MAX_HEADER_CHARS), "emoji": True}}
+    if groups:
+        groups[0].insert(0, header)
+    else:
+        groups.append([header])
+    return groups
+
+
+def build_messages(documents: List[str], max_blocks: int = 20,
+                   max_message_chars: int = 8000) -> List[Dict[str, Any]]:
+    """
+    Build Slack messages for one or more Markdown documents.
+
+    Heading sections are packed into messages without splitting them where
+    possible; content that does not fit in the first message continues in
+    further messages, meant to be posted as thread replies.
+
+    Args:
+        documents: Markdown documents to share together
+        max_blocks: Maximum blocks per message (Slack allows 50)
+        max_message_chars: Maximum characters of block text per message
+
+    Returns:
+        Messages as {"text": fallback text, "blocks": blocks}, in posting order
+    """
+    max_blocks = min(max_blocks, MAX_BLOCKS_PER_MESSAGE)
+    groups: List[List[Dict[str, Any]]] = []
+    for index, document in enumerate(documents):
+        document_groups = build_blocks(document)
+        if index > 0:
+            document_groups[0].insert(0, {"type": "divider"})
+        groups.extend(document_groups)
+    groups[-1].append({"type": "context", "elements": [{"type": "mrkdwn", "text": FOOTER}]})
+
+    messages: List[List[Dict[str, Any]]] = [[]]
+    for group in groups:
+        if messages[-1] and not _fits(messages[-1] + group, max_blocks, max_message_chars):
+            messages.append([])
+        for block in group:
+            # A section too large for one message is split across messages
+            if messages[-1] and not _fits(messages[-1] + [block], max_blocks, max_message_chars):
+                messages.append([])
+            messages[-1].append(block)
+
+    headline = extract_headline(documents[0])
+    return [
+        {"text": headline if index == 0 else _fallback_text(blocks, headline), "blocks": blocks}
+        for index, blocks in enumerate(messages)
+    ]
+
+
+def _block_chars(block: Dict[str, Any]) -> int:
+    text = block.get("text")
+    return len(text["text"]) if isinstance(text, dict) else 0
+
+
+def _fits(blocks: List[Dict[str, Any]], max_blocks: int, max_chars: int) -> bool:
+    return len(blocks) <= max_blocks and sum(_block_chars(block) for block in blocks) <= max_chars
+
+
+def _fallback_text(blocks: List[Dict[str, Any]], headline: str) -> str:
+    """Notification text for a continuation message."""
+    for block in blocks:
+        if block["type"] == "section":
+            return _truncate(_plain(block["text"]["text"].split("\n", 1)[0]), MAX_HEADER_CHARS)
+    return f"{headline} (continued)"
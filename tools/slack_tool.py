@@ -3,12 +3,16 @@ Tool for sharing content to Slack channels.
 """
 
 from langchain.tools import BaseTool
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
-from langchain_openai import ChatOpenAI
+from utils.llm import chat_model
 import os
 from pydantic import Field
+from services.slack_outbox import DEFAULT_OUTBOX_PATH, get_outbox
+from utils.deadline import deadline_kwargs
+from utils.resilience import retry_call
+from tools.slack_formatting import build_messages
 
 class SlackTool(BaseTool):
     """
@@ -21,30 +25,44 @@ class SlackTool(BaseTool):
     Input should be the content to share or can be empty to share the last message.
     """
     
-    llm: Any = Field(default=None, description="Language model to use for content formatting")
+    llm: Any = Field(default=None, description="Language model used to polish content in polish mode")
     client: Any = Field(default=None, description="Slack API client")
     default_channel: str = Field(default="#product-marketing", description="Default Slack channel to post to")
+    outbox: Any = Field(default=None, description="Outbox that delivers messages in the background")
+    polish: bool = Field(default=False, description="Whether to rewrite content with the LLM before formatting")
     
-    def __init__(self, llm=None):
+    def __init__(self, llm=None, client=None, outbox_path: str = DEFAULT_OUTBOX_PATH, polish: bool = False):
         """
         Initialize the Slack tool.
         
         Args:
-            llm: Language model to use for content formatting (optional)
+            llm: Language model used in polish mode (optional)
+            client: Slack API client (optional, defaults to a WebClient using SLACK_BOT_TOKEN)
+            outbox_path: Location of the outbox messages are queued in
+            polish: Rewrite content with the LLM before formatting it; by default
+                content is converted to Slack formatting locally
         """
-        llm = llm or ChatOpenAI(model="gpt-4", temperature=0.5)
-        client = WebClient(token=os.environ.get("SLACK_BOT_TOKEN"))
-        super().__init__(llm=llm, client=client, default_channel="#product-marketing")
+        if polish:
+            llm = llm or chat_model(model="gpt-4", temperature=0.5)
+        client = client or WebClient(token=os.environ.get("SLACK_BOT_TOKEN"))
+        super().__init__(
+            llm=llm,
+            client=client,
+            default_channel="#product-marketing",
+            outbox=get_outbox(outbox_path),
+            polish=polish
+        )
+        self.outbox.start(self._deliver)
     
     def _run(self, content: Optional[str] = None) -> str:
         """
-        Format and share content to Slack.
+        Queue content to be formatted and shared to Slack.
         
         Args:
             content: The content to share (optional)
             
         Returns:
-            Success or error message
+            Confirmation or error message
         """
         try:
             # If no content provided, try to get the last message from session state
@@ -56,90 +74,91 @@ class SlackTool(BaseTool):
                 else:
                     return "No content provided and no previous messages found."
             
-            # Format message
-            formatted_content = self._format_content(content)
-            
-            # Share to Slack
-            self._share_message(
-                formatted_content, 
-                self.default_channel
-            )
-            
-            return "Message shared to Slack successfully!"
+            # Formatting and delivery happen in the background
+            message_id = self.outbox.enqueue(content, self.default_channel)
+            return f"Message queued for {self.default_channel} (delivery #{message_id}); it will be posted shortly."
         except Exception as e:
             return f"Error sharing to Slack: {str(e)}"
     
-    def _format_content(self, content: str) -> str:
+    def _deliver(self, channel: str, contents: List[str]) -> Dict[str, Any]:
         """
-        Format content for Slack sharing with a routing prompt.
+        Format and post a batch of queued messages.
+        
+        Called by the outbox's sender thread. Long content continues in
+        thread replies under the first message.
         
         Args:
-            content: The content to format
+            channel: The channel to post to
+            contents: The queued contents, oldest first
             
         Returns:
-            Formatted content
+            Slack API response for the first message
+        """
+        documents = [self._polish_content(content) if self.polish else content for content in contents]
+        return self._share_message(build_messages(documents), channel)
+    
+    def _polish_content(self, content: str) -> str:
+        """
+        Rewrite content with the LLM before it is formatted for Slack.
+        
+        Args:
+            content: The content to rewrite
+            
+        Returns:
+            Rewritten Markdown, or the original content if the LLM call fails
         """
         try:
-            # Use LLM to format the content appropriately for Slack
-            prompt = f"""You are a professional content formatter for Slack messages.
+            prompt = f"""You are a professional content editor for Slack messages.
 
-Task: Format the following content for sharing on Slack.
+Task: Rewrite the following content for sharing on Slack.
 
-Content to format:
+Content to rewrite:
 {content}
 
 Guidelines:
 1. Extract the key feature or product name
-2. Create a concise, engaging headline
-3. Organize the content with appropriate Slack markdown
+2. Start with a concise, engaging headline as a "# " Markdown heading
+3. Organize the content with Markdown "## " section headings, **bold** text and "- " bullet points
 4. Add relevant emojis to make the message visually appealing
 5. Keep the most important insights
-6. Format for readability with sections and bullet points
-7. Include a brief summary at the top
-8. Maximum length: 2000 characters
+6. Include a brief summary at the top
+7. Maximum length: 2000 characters
 
-Output only the formatted Slack message with no additional explanations.
+Output only the rewritten message in Markdown with no additional explanations.
 """
             
-            formatted_content = self.llm.invoke(prompt).content
-            return formatted_content
+            return self.llm.invoke(prompt, **deadline_kwargs()).content
         except Exception as e:
-            # Fallback to basic formatting
-            feature_name = "Product"
-            if "our product, " in content:
-                feature_name = content.split("our product, ")[1].split(",")[0]
-            
-            return f"""🚀 *Analysis for {feature_name}*
-
-{content[:1500]}... 
-
-💡 *Shared via Feature Positioning Copilot*"""
+            print(f"Error polishing Slack message, sharing it unpolished: {str(e)}")
+            return content
     
-    def _share_message(self, formatted_content: str, channel: str) -> Dict[str, Any]:
+    def _share_message(self, messages: List[Dict[str, Any]], channel: str) -> Dict[str, Any]:
         """
-        Share formatted message to Slack.
+        Post messages to Slack, the first as the parent and the rest in its thread.
         
         Args:
-            formatted_content: The formatted content to share
+            messages: Messages built by build_messages()
             channel: The channel to share to
             
         Returns:
-            Slack API response
+            Slack API response for the first message
         """
-        try:
-            response = self.client.chat_postMessage(
-                channel=channel,
-                text=formatted_content,
-                blocks=[
-                    {
-                        "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": formatted_content
-                        }
-                    }
-                ]
-            )
-            return response
-        except SlackApiError as e:
-            raise e 
\ No newline at end of file
+        first, *replies = messages
+        response = self.client.chat_postMessage(channel=channel, text=first["text"], blocks=first["blocks"])
+        thread_ts = response.get("ts") if hasattr(response, "get") else None
+        
+        for reply in replies:
+            try:
+                # The parent is already posted, so retry replies here rather than
+                # failing the delivery and posting the parent again
+                retry_call(
+                    self.client.chat_postMessage,
+                    channel=channel,
+                    text=reply["text"],
+                    blocks=reply["blocks"],
+                    thread_ts=thread_ts,
+                    operation="slack_thread_reply"
+                )
+            except SlackApiError as e:
+                print(f"Error posting Slack thread reply to {channel}: {str(e)}")
+        return response
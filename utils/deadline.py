@@ -0,0 +1,212 @@
+"""
+Request deadlines that propagate through agents, tools and clients.
+
+A deadline is set once per request with deadline_scope() and is carried in
+a context variable, so every tool, LLM client, vector search and HTTP fetch
+running on behalf of that request (including on worker threads started with
+a copied context) can size its own timeout from the time that is left.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+from utils.metrics import metrics
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # pragma: no cover - optional dependency
+    add_script_run_ctx = get_script_run_ctx = None
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when work does not finish before its deadline."""
+
+
+class Deadline:
+    """
+    Point in time by which a request must finish.
+    """
+
+    def __init__(self, timeout_s: float):
+        """
+        Initialize the deadline.
+
+        Args:
+            timeout_s: Seconds from now until the deadline expires
+        """
+        self.timeout_s = timeout_s
+        self.expires_at = time.monotonic() + timeout_s
+
+    def remaining(self) -> float:
+        """Return the seconds left, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """Return True once the deadline has passed."""
+        return time.monotonic() >= self.expires_at
+
+    def check(self, operation: str = "operation"):
+        """
+        Raise if the deadline has passed.
+
+        Args:
+            operation: Name of the operation about to start
+        """
+        if self.expired():
+            metrics.increment("deadline.timeouts", operation=operation)
+            raise DeadlineExceeded(f"Deadline exceeded before {operation}")
+
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Return the deadline of the current request, if any."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline):
+    """
+    Make a deadline the current one for the enclosed block.
+
+    Args:
+        deadline: The deadline to apply
+
+    Yields:
+        The deadline
+    """
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def remaining_timeout(default: Optional[float] = None, cap: Optional[float] = None,
+                      operation: str = "operation") -> Optional[float]:
+    """
+    Compute the timeout to give a blocking call.
+
+    Args:
+        default: Timeout to use when no deadline is set
+        cap: Optional upper bound for the timeout
+        operation: Name of the operation, for timeout metrics
+
+    Returns:
+        Seconds the call may take, or default when there is no deadline
+
+    Raises:
+        DeadlineExceeded: If the current deadline has already passed
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return default if cap is None or default is None else min(default, cap)
+    deadline.check(operation)
+    remaining = deadline.remaining()
+    return remaining if cap is None else min(remaining, cap)
+
+
+def deadline_kwargs() -> Dict[str, Any]:
+    """
+    Keyword arguments that bound an LLM invoke() call by the current deadline.
+
+    Returns:
+        {"timeout": seconds} when a deadline is set, otherwise an empty dict
+    """
+    timeout = remaining_timeout(operation="llm")
+    return {} if timeout is None else {"timeout": timeout}
+
+
+def bind_script_context(fn: Callable) -> Callable:
+    """
+    Bind fn to the Streamlit script run of the calling thread.
+
+    Worker threads have no script run context of their own, so without it
+    st.session_state is unavailable to tools running on them.
+
+    Args:
+        fn: The function that will run on another thread
+
+    Returns:
+        A function that attaches the caller's script run context to the
+        thread it runs on and then calls fn (fn itself outside Streamlit)
+    """
+    script_context = get_script_run_ctx() if get_script_run_ctx is not None else None
+    if script_context is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        add_script_run_ctx(threading.current_thread(), script_context)
+        return fn(*args, **kwargs)
+
+    return bound
+
+
+def run_with_deadline(fn: Callable, *args, timeout: Optional[float] = None,
+                      operation: str = "operation", on_finish: Optional[Callable[[], None]] = None,
+                      **kwargs):
+    """
+    Run a blocking call, giving up when its timeout or the current deadline expires.
+
+    The call runs on its own daemon thread with a copy of the current context
+    (and the Streamlit script run context, see bind_script_context()). Python
+    threads cannot be killed, so on timeout the call is abandoned; calls that
+    honor remaining_timeout() will then stop on their own shortly after.
+
+    Args:
+        fn: The function to call
+        *args: Positional arguments for fn
+        timeout: Optional per-call timeout in seconds
+        operation: Name of the operation, for timeout metrics
+        on_finish: Optional callback run once fn has actually returned or
+            raised, even if the caller already gave up on it
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        The result of fn
+
+    Raises:
+        DeadlineExceeded: If the call does not finish in time
+    """
+    try:
+        wait = remaining_timeout(default=timeout, cap=timeout, operation=operation)
+    except DeadlineExceeded:
+        if on_finish is not None:
+            on_finish()
+        raise
+    if wait is None:
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if on_finish is not None:
+                on_finish()
+
+    future: Future = Future()
+    context = contextvars.copy_context()
+    call = bind_script_context(fn)
+
+    def target():
+        try:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(context.run(call, *args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+        finally:
+            if on_finish is not None:
+                on_finish()
+
+    threading.Thread(target=target, name=f"deadline-{operation}", daemon=True).start()
+    try:
+        return future.result(timeout=wait)
+    except FutureTimeoutError:
+        if future.done():
+            # fn itself raised a timeout
+            raise
+        future.cancel()
+        metrics.increment("deadline.timeouts", operation=operation)
+        raise DeadlineExceeded(f"{operation} did not finish within {wait:.1f}s")
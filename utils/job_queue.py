@@ -0,0 +1,275 @@
+"""
+Local background job queue backed by a worker pool and a SQLite job table.
+
+Jobs are persisted before they run, so they survive Streamlit reruns and
+browser refreshes, and jobs left unfinished by a process restart are picked
+up again when the queue is next created, unless they have already been
+interrupted max_attempts times.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from utils.metrics import metrics
+from utils.sqlite import connect
+
+DEFAULT_JOBS_PATH = ".fpc/jobs.db"
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    stage_timings TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+)
+"""
+
+
+class JobError(Exception):
+    """Raised by a job handler to fail a job with a readable message."""
+
+
+class JobContext:
+    """
+    Handle passed to a running job for reporting its stage and progress.
+    """
+
+    def __init__(self, queue: "JobQueue", job_id: str, stages: List[str]):
+        """
+        Initialize the job context.
+
+        Args:
+            queue: The queue running the job
+            job_id: ID of the job
+            stages: Expected stages, in order, used to compute progress
+        """
+        self.queue = queue
+        self.job_id = job_id
+        self.stages = stages
+        self.stage: Optional[str] = None
+        self.stage_timings: Dict[str, float] = {}
+        self._stage_started = time.perf_counter()
+
+    def advance(self, stage: str):
+        """
+        Close the current stage and start the next one.
+
+        Args:
+            stage: Name of the stage that is starting
+        """
+        self._close_stage()
+        self.stage = stage
+        done = self.stages.index(stage) if stage in self.stages else len(self.stage_timings)
+        progress = done / len(self.stages) if self.stages else 0.0
+        self.queue._update(self.job_id, stage=stage, progress=progress, stage_timings=json.dumps(self.stage_timings))
+
+    def _close_stage(self):
+        """Record the duration of the current stage."""
+        now = time.perf_counter()
+        if self.stage is not None:
+            self.stage_timings[self.stage] = round(
+                self.stage_timings.get(self.stage, 0.0) + now - self._stage_started, 3
+            )
+            metrics.observe("jobs.stage_duration_s", now - self._stage_started, stage=self.stage)
+        self._stage_started = now
+
+
+class JobQueue:
+    """
+    Runs registered job kinds on a thread pool and records their state in SQLite.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOBS_PATH, max_workers: int = 2, max_attempts: int = 3):
+        """
+        Initialize the job queue.
+
+        Args:
+            path: Location of the SQLite job table
+            max_workers: Number of jobs that run at once
+            max_attempts: Runs a job may start before it is no longer resumed
+                after a restart (a job that crashes the process would otherwise
+                be resumed forever)
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.handlers: Dict[str, Dict[str, Any]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._started = False
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any], JobContext], Any],
+                 stages: List[str] = None):
+        """
+        Register a handler for a job kind.
+
+        Args:
+            kind: Name of the job kind
+            handler: Function called with (payload, context); its return
+                value must be JSON-serializable and becomes the job result
+            stages: Expected stages, in order, used to compute progress
+        """
+        self.handlers[kind] = {"handler": handler, "stages": stages or []}
+
+    def start(self):
+        """
+        Resume jobs left unfinished by a previous process.
+
+        Call once all handlers are registered.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        with self._connect() as connection:
+            # Jobs that were running when the process stopped are run again, up to max_attempts runs
+            abandoned = connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ? AND attempts >= ?",
+                (FAILED, f"Interrupted {self.max_attempts} times; not resumed again", time.time(),
+                 RUNNING, self.max_attempts)
+            ).rowcount
+            connection.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING))
+            job_ids = [row["id"] for row in connection.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+            )]
+        if abandoned:
+            metrics.increment("jobs.abandoned", abandoned)
+        for job_id in job_ids:
+            metrics.increment("jobs.resumed")
+            self._executor.submit(self._run, job_id)
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        """
+        Submit a job.
+
+        Args:
+            kind: A registered job kind
+            payload: JSON-serializable job input
+
+        Returns:
+            The job ID
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job_id = uuid.uuid4().hex
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), QUEUED, time.time())
+            )
+        metrics.increment("jobs.submitted", kind=kind)
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the current state of a job.
+
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            The job as a dictionary, or None if unknown
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        List the most recent jobs.
+
+        Args:
+            limit: Maximum number of jobs to return
+
+        Returns:
+            Jobs as dictionaries, newest first
+        """
+        with self._connect() as connection:
+            rows = connection.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def _run(self, job_id: str):
+        """Run a queued job and record its outcome."""
+        with self._connect() as connection:
+            claimed = connection.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1 WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED)
+            ).rowcount
+        if not claimed:
+            return
+
+        job = self.get(job_id)
+        registration = self.handlers.get(job["kind"])
+        if registration is None:
+            self._update(job_id, status=FAILED, error=f"Unknown job kind: {job['kind']}", finished_at=time.time())
+            return
+
+        context = JobContext(self, job_id, registration["stages"])
+        started = time.perf_counter()
+        try:
+            result = registration["handler"](job["payload"], context)
+            context._close_stage()
+            self._update(
+                job_id, status=SUCCEEDED, progress=1.0, result=json.dumps(result),
+                stage_timings=json.dumps(context.stage_timings), finished_at=time.time()
+            )
+            metrics.increment("jobs.succeeded", kind=job["kind"])
+        except Exception as e:
+            context._close_stage()
+            error = str(e) if isinstance(e, JobError) else f"{type(e).__name__}: {str(e)}"
+            if not isinstance(e, JobError):
+                traceback.print_exc()
+            print(f"Error running job {job_id} ({job['kind']}): {error}")
+            self._update(
+                job_id, status=FAILED, error=error,
+                stage_timings=json.dumps(context.stage_timings), finished_at=time.time()
+            )
+            metrics.increment("jobs.failed", kind=job["kind"])
+        finally:
+            metrics.observe("jobs.duration_s", time.perf_counter() - started, kind=job["kind"])
+
+    def _update(self, job_id: str, **fields):
+        """Update columns of a job."""
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._connect() as connection:
+            connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _connect(self):
+        """Open a connection; each call gets its own so worker threads never share one."""
+        return connect(self.path)
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        """Convert a job row to a dictionary, decoding the JSON columns."""
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["stage_timings"] = json.loads(job["stage_timings"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
@@ -0,0 +1,77 @@
+"""
+Factories for OpenAI chat and embedding clients.
+
+All clients share one pooled HTTP client whose transport applies the
+process-wide rate limiter and retry policy (see utils.rate_limiter), so
+create every ChatOpenAI and OpenAIEmbeddings through these functions.
+"""
+import os
+import threading
+from typing import Optional
+
+import httpx
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from utils.rate_limiter import RateLimitedTransport
+
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+
+
+def openai_http_client() -> httpx.Client:
+    """
+    Get the process-wide HTTP client for OpenAI requests.
+
+    Returns:
+        An httpx.Client using the rate-limited transport
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                transport=RateLimitedTransport(),
+                timeout=httpx.Timeout(600.0, connect=10.0)
+            )
+        return _http_client
+
+
+def chat_model(model: str = "gpt-4", temperature: float = 0.7, **kwargs) -> ChatOpenAI:
+    """
+    Create a rate-limited chat model.
+
+    Args:
+        model: The model to use
+        temperature: Sampling temperature
+        **kwargs: Additional ChatOpenAI arguments
+
+    Returns:
+        A ChatOpenAI instance
+    """
+    # Retries happen in the shared transport, where they are rate limited too
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        http_client=openai_http_client(),
+        max_retries=0,
+        **kwargs
+    )
+
+
+def embedding_model(model: str = "text-embedding-3-large", **kwargs) -> OpenAIEmbeddings:
+    """
+    Create a rate-limited embedding model.
+
+    Args:
+        model: The embedding model to use
+        **kwargs: Additional OpenAIEmbeddings arguments
+
+    Returns:
+        An OpenAIEmbeddings instance
+    """
+    return OpenAIEmbeddings(
+        model=model,
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        http_client=openai_http_client(),
+        max_retries=0,
+        **kwargs
+    )
@@ -0,0 +1,97 @@
+"""
+Process-wide counters and latency observations.
+
+Spans capture individual requests; these metrics aggregate across requests
+so rates (LLM calls saved, timeouts, cache hits) can be read at any time.
+"""
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    """Build a metric key such as 'router.decisions{route=fast_path}'."""
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and bounded latency samples.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        """
+        Initialize the registry.
+
+        Args:
+            max_samples: Number of recent observations kept per metric
+        """
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._observations = defaultdict(lambda: deque(maxlen=max_samples))
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """
+        Increment a counter.
+
+        Args:
+            name: Metric name
+            value: Amount to add
+            **labels: Optional labels distinguishing series of the metric
+        """
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Record an observation such as a latency in seconds.
+
+        Args:
+            name: Metric name
+            value: Observed value
+            **labels: Optional labels distinguishing series of the metric
+        """
+        with self._lock:
+            self._observations[_key(name, labels)].append(value)
+
+    def counter(self, name: str, **labels) -> float:
+        """Return the current value of a counter."""
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return all counters and a summary of each observed metric.
+
+        Returns:
+            Dictionary with 'counters' and 'observations' (count, mean, p50, p95, max)
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            observations = {key: sorted(values) for key, values in self._observations.items()}
+
+        summaries = {}
+        for key, values in observations.items():
+            if not values:
+                continue
+            summaries[key] = {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                "p50": values[int(0.50 * (len(values) - 1))],
+                "p95": values[int(0.95 * (len(values) - 1))],
+                "max": values[-1],
+            }
+        return {"counters": counters, "observations": summaries}
+
+    def reset(self):
+        """Clear all metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+
+
+# Shared registry for the process
+metrics = Metrics()
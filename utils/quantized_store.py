@@ -0,0 +1,496 @@
+"""
+Local vector store with quantized first-stage search and full-precision
+re-ranking.
+
+Each embedding is kept twice: as int8 (4x smaller) or binary (32x smaller)
+codes in memory, which every query scans, and as a normalized float32
+vector in a memory-mapped side file, which is only read for the few
+candidates the scan returns. Re-ranking those candidates with the full
+vectors recovers nearly all of the recall lost to quantization, while the
+scan touches a fraction of the memory of a float32 index.
+
+Texts and metadata are stored in SQLite next to the vectors.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+DEFAULT_STORE_DIR = ".fpc/vectors"
+
+# Supported values for the VECTOR_QUANTIZATION environment variable
+QUANTIZATIONS = ("none", "int8", "binary")
+
+# Candidates re-ranked per result, by quantization
+DEFAULT_RESCORE_FACTORS = {"none": 1, "int8": 4, "binary": 10}
+
+# Rows scanned at a time; blocks small enough to stay in cache keep the
+# int8 scan as fast as a float32 one
+SCAN_BLOCK_ROWS = 4096
+
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint16)
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    """
+    CREATE TABLE IF NOT EXISTS store_rows (
+        row INTEGER PRIMARY KEY,
+        id TEXT NOT NULL,
+        text TEXT NOT NULL,
+        metadata TEXT NOT NULL,
+        deleted INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS store_rows_id ON store_rows (id)",
+]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors to unit length, so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def reduce_dimensions(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """
+    Shorten embeddings the way the text-embedding-3 `dimensions` parameter does.
+
+    Args:
+        vectors: Full-size embeddings
+        dimensions: Dimensions to keep
+
+    Returns:
+        The first `dimensions` components, renormalized
+    """
+    return normalize(np.asarray(vectors, dtype=np.float32)[..., :dimensions])
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize vectors to int8 with one scale per vector.
+
+    Args:
+        vectors: float32 vectors
+
+    Returns:
+        (int8 codes, float32 scales), with vector ≈ codes * scale
+    """
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """
+    Quantize vectors to one sign bit per dimension.
+
+    Args:
+        vectors: float32 vectors
+
+    Returns:
+        uint8 codes with the bits packed, dimensions / 8 bytes per vector
+    """
+    return np.packbits(vectors > 0, axis=1)
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    """Evaluate a Pinecone-style metadata filter ($eq, $ne, $in, $nin, $and, $or)."""
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        values = value if isinstance(value, list) else [value]
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator == "$eq" and operand not in values:
+                return False
+            if operator == "$ne" and operand in values:
+                return False
+            if operator == "$in" and not any(item in operand for item in values):
+                return False
+            if operator == "$nin" and any(item in operand for item in values):
+                return False
+    return True
+
+
+class QuantizedVectorStore:
+    """
+    Vector store that searches quantized codes and re-ranks with full vectors.
+
+    Has the add/search/delete interface of LangChain vector stores used in
+    this app, so it can back VectorStoreManager.
+    """
+
+    def __init__(self, embedding, path: str = DEFAULT_STORE_DIR, quantization: str = "int8",
+                 rescore_factor: Optional[int] = None):
+        """
+        Initialize the store, loading any vectors already saved at path.
+
+        Args:
+            embedding: Embeddings used to embed texts and queries
+            path: Directory holding the vector file and the SQLite index
+            quantization: 'int8', 'binary', or 'none' (scan the full vectors)
+            rescore_factor: Candidates from the first stage re-ranked per
+                result (defaults per quantization)
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATIONS}")
+        self.embedding = embedding
+        self.path = path
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor or DEFAULT_RESCORE_FACTORS[quantization]
+
+        self.dimensions: Optional[int] = None
+        self._count = 0
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[Optional[str]] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._rows_by_id: Dict[str, int] = {}
+        self._mask_cache: Dict[str, np.ndarray] = {}
+        self._lock = threading.RLock()
+
+        os.makedirs(path, exist_ok=True)
+        self._connection = sqlite3.connect(os.path.join(path, "index.db"), timeout=30, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+        self._load()
+
+    @property
+    def _vector_path(self) -> str:
+        return os.path.join(self.path, "vectors.f32")
+
+    def _load(self):
+        """Rebuild the in-memory codes from the vectors saved on disk."""
+        row = self._connection.execute("SELECT value FROM store_meta WHERE key = 'dimensions'").fetchone()
+        if row is None:
+            return
+        self.dimensions = int(row[0])
+        rows = self._connection.execute("SELECT row, id, metadata, deleted FROM store_rows ORDER BY row").fetchall()
+        count = rows[-1][0] + 1 if rows else 0
+        self._grow(count)
+        for row_number, chunk_id, metadata, deleted in rows:
+            self._ids[row_number] = chunk_id
+            self._metadata[row_number] = json.loads(metadata)
+            if not deleted:
+                self._alive[row_number] = True
+                self._rows_by_id[chunk_id] = row_number
+        for start in range(0, count, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, count)
+            self._encode(start, np.asarray(self._vectors[start:end]))
+        self._count = count
+
+    def _grow(self, needed: int):
+        """Make room for at least `needed` rows, doubling the capacity."""
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2, 1024)
+        row_bytes = self.dimensions * 4
+        with open(self._vector_path, "ab") as f:
+            f.truncate(capacity * row_bytes)
+        self._vectors = np.memmap(self._vector_path, dtype=np.float32, mode="r+", shape=(capacity, self.dimensions))
+
+        if self.quantization == "int8":
+            codes = np.zeros((capacity, self.dimensions), dtype=np.int8)
+            scales = np.zeros(capacity, dtype=np.float32)
+            if self._codes is not None:
+                codes[:self._count] = self._codes[:self._count]
+                scales[:self._count] = self._scales[:self._count]
+            self._codes, self._scales = codes, scales
+        elif self.quantization == "binary":
+            codes = np.zeros((capacity, (self.dimensions + 7) // 8), dtype=np.uint8)
+            if self._codes is not None:
+                codes[:self._count] = self._codes[:self._count]
+            self._codes = codes
+
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        self._alive = alive
+        self._ids.extend([None] * (capacity - len(self._ids)))
+        self._metadata.extend([{} for _ in range(capacity - len(self._metadata))])
+        self._capacity = capacity
+
+    def _encode(self, start: int, vectors: np.ndarray):
+        """Store the first-stage codes of rows starting at start."""
+        end = start + len(vectors)
+        if self.quantization == "int8":
+            self._codes[start:end], self._scales[start:end] = quantize_int8(vectors)
+        elif self.quantization == "binary":
+            self._codes[start:end] = quantize_binary(vectors)
+
+    def add_vectors(self, vectors: Sequence[Sequence[float]], texts: Sequence[str],
+                    metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+                    ids: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        Add embedded texts, replacing any stored under the same IDs.
+
+        Args:
+            vectors: The embeddings
+            texts: The texts they embed
+            metadatas: Optional metadata per text
+            ids: Optional IDs (generated if omitted)
+
+        Returns:
+            The IDs of the added texts
+        """
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        if not len(vectors):
+            return ids
+
+        with self._lock:
+            if self.dimensions is None:
+                self.dimensions = vectors.shape[1]
+                with self._connection:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('dimensions', ?)",
+                        (str(self.dimensions),)
+                    )
+            elif vectors.shape[1] != self.dimensions:
+                raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {vectors.shape[1]}")
+
+            start = self._count
+            self._grow(start + len(vectors))
+            self._vectors[start:start + len(vectors)] = vectors
+            self._vectors.flush()
+            self._encode(start, vectors)
+
+            replaced = [self._rows_by_id[chunk_id] for chunk_id in ids if chunk_id in self._rows_by_id]
+            with self._connection:
+                self._connection.executemany(
+                    "UPDATE store_rows SET deleted = 1 WHERE row = ?", [(row,) for row in replaced]
+                )
+                self._connection.executemany(
+                    "INSERT INTO store_rows (row, id, text, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (start + offset, chunk_id, text, json.dumps(metadata))
+                        for offset, (chunk_id, text, metadata) in enumerate(zip(ids, texts, metadatas))
+                    ]
+                )
+            self._alive[replaced] = False
+            for offset, (chunk_id, metadata) in enumerate(zip(ids, metadatas)):
+                row = start + offset
+                self._ids[row] = chunk_id
+                self._metadata[row] = dict(metadata)
+                self._alive[row] = True
+                self._rows_by_id[chunk_id] = row
+            self._count = start + len(vectors)
+            self._mask_cache.clear()
+        return ids
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[Dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        """
+        Embed and add texts.
+
+        Args:
+            texts: The texts to add
+            metadatas: Optional metadata per text
+            ids: Optional IDs (generated if omitted)
+
+        Returns:
+            The IDs of the added texts
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_vectors(self.embedding.embed_documents(texts), texts, metadatas, ids)
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        """
+        Embed and add documents.
+
+        Args:
+            documents: The documents to add
+            ids: Optional IDs (generated if omitted)
+
+        Returns:
+            The IDs of the added documents
+        """
+        return self.add_texts(
+            [doc.page_content for doc in documents], [doc.metadata for doc in documents], ids=ids
+        )
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: Optional[bool] = None, **kwargs):
+        """
+        Delete vectors by ID, or all of them.
+
+        Args:
+            ids: IDs to delete
+            delete_all: Delete every vector
+        """
+        with self._lock:
+            if delete_all:
+                rows = np.flatnonzero(self._alive[:self._count]).tolist()
+            else:
+                rows = [self._rows_by_id[chunk_id] for chunk_id in ids or [] if chunk_id in self._rows_by_id]
+            with self._connection:
+                self._connection.executemany("UPDATE store_rows SET deleted = 1 WHERE row = ?", [(row,) for row in rows])
+            for row in rows:
+                self._alive[row] = False
+                self._rows_by_id.pop(self._ids[row], None)
+            self._mask_cache.clear()
+
+    def _filter_mask(self, filter: Optional[Dict[str, Any]], count: int) -> np.ndarray:
+        """Return which of the first count rows are live and match a metadata filter."""
+        if not filter:
+            return self._alive[:count]
+        key = json.dumps(filter, sort_keys=True, default=str)
+        mask = self._mask_cache.get(key)
+        if mask is None or len(mask) != count:
+            matches = np.fromiter(
+                (matches_filter(self._metadata[row], filter) for row in range(count)), dtype=bool, count=count
+            )
+            mask = matches & self._alive[:count]
+            self._mask_cache[key] = mask
+        return mask
+
+    def _first_stage(self, query: np.ndarray, count: int) -> np.ndarray:
+        """Approximate the similarity of the query to the first count rows from their codes."""
+        scores = np.empty(count, dtype=np.float32)
+        if self.quantization == "binary":
+            query_bits = quantize_binary(query[None, :])[0]
+        for start in range(0, count, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, count)
+            if self.quantization == "int8":
+                scores[start:end] = (self._codes[start:end].astype(np.float32) @ query) * self._scales[start:end]
+            elif self.quantization == "binary":
+                distances = _POPCOUNT[np.bitwise_xor(self._codes[start:end], query_bits)].sum(axis=1)
+                scores[start:end] = -distances.astype(np.float32)
+            else:
+                scores[start:end] = self._vectors[start:end] @ query
+        return scores
+
+    def search_vectors(self, embedding: Sequence[float], k: int = 4,
+                       filter: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        """
+        Find the rows most similar to an embedding.
+
+        Args:
+            embedding: The query embedding
+            k: Number of results to return
+            filter: Optional metadata filter
+
+        Returns:
+            (row, cosine similarity) pairs, most similar first
+        """
+        query = normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            count = self._count
+            if count == 0:
+                return []
+            mask = self._filter_mask(filter, count)
+        live = int(mask.sum())
+        if live == 0:
+            return []
+
+        scores = self._first_stage(query, count)
+        scores[~mask] = -np.inf
+        candidate_count = min(k * self.rescore_factor, live)
+        candidates = np.argpartition(-scores, candidate_count - 1)[:candidate_count]
+
+        if self.quantization != "none":
+            # Re-rank with the full-precision vectors, reading rows in file order
+            candidates = np.sort(candidates)
+            scores = np.asarray(self._vectors[candidates]) @ query
+        else:
+            scores = scores[candidates]
+        order = np.argsort(-scores)[:k]
+        return [(int(candidates[index]), float(scores[index])) for index in order]
+
+    def _documents(self, rows: List[int]) -> Dict[int, Document]:
+        """Load the stored documents of rows."""
+        if not rows:
+            return {}
+        placeholders = ", ".join("?" * len(rows))
+        with self._lock:
+            results = self._connection.execute(
+                f"SELECT row, text, metadata FROM store_rows WHERE row IN ({placeholders})", rows
+            ).fetchall()
+        return {
+            row: Document(page_content=text, metadata=json.loads(metadata))
+            for row, text, metadata in results
+        }
+
+    def similarity_search_by_vector_with_score(self, embedding: Sequence[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None,
+                                               **kwargs) -> List[Tuple[Document, float]]:
+        """
+        Search by embedding, returning documents with their cosine similarity.
+
+        Args:
+            embedding: The query embedding
+            k: Number of results to return
+            filter: Optional metadata filter
+
+        Returns:
+            (document, similarity) pairs, most similar first
+        """
+        matches = self.search_vectors(embedding, k=k, filter=filter)
+        documents = self._documents([row for row, _ in matches])
+        return [(documents[row], score) for row, score in matches if row in documents]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs) -> List[Tuple[Document, float]]:
+        """Search by query text, returning documents with their cosine similarity."""
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding: Sequence[float], k: int = 4,
+                                    filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        """Search by embedding."""
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          **kwargs) -> List[Document]:
+        """
+        Search for documents similar to a query.
+
+        Args:
+            query: The query text
+            k: Number of documents to return
+            filter: Optional metadata filter
+
+        Returns:
+            List of matching documents
+        """
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Report the memory the store uses.
+
+        Returns:
+            Bytes of first-stage codes scanned in memory per query, and bytes
+            of full-precision vectors in the memory-mapped side file
+        """
+        with self._lock:
+            count = self._count
+            dimensions = self.dimensions or 0
+        if self.quantization == "int8":
+            scan_bytes = count * (dimensions + 4)
+        elif self.quantization == "binary":
+            scan_bytes = count * ((dimensions + 7) // 8)
+        else:
+            scan_bytes = count * dimensions * 4
+        return {"vectors": count, "scan_bytes": scan_bytes, "full_precision_bytes": count * dimensions * 4}
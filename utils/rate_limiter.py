@@ -0,0 +1,366 @@
+"""
+Process-wide rate limiting and retries for OpenAI traffic.
+
+Every chat and embedding client shares one HTTP transport (see utils.llm).
+The transport estimates the tokens of each request, waits for room in a
+per-model token bucket sized to the account's requests-per-minute and
+tokens-per-minute limits, and retries 429/5xx responses and transport
+errors (connection failures, timeouts) with jittered exponential backoff
+that honors Retry-After.
+
+Waiting requests are admitted by priority class, so interactive chat goes
+ahead of batch ingestion and evals when the bucket is contended.
+"""
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import httpx
+
+from utils.deadline import DeadlineExceeded, remaining_timeout
+from utils.metrics import metrics
+from utils.resilience import RetryPolicy
+from utils.tokens import count_tokens
+
+# Priority classes; lower values are admitted first
+INTERACTIVE = 0
+BATCH = 1
+EVAL = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", EVAL: "eval"}
+
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 300000
+
+# Completion tokens assumed for chat requests that do not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 512
+
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+_current_priority: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default=None)
+_default_priority = INTERACTIVE
+
+
+def current_priority() -> int:
+    """Return the priority class of LLM calls made in the current context."""
+    priority = _current_priority.get()
+    return _default_priority if priority is None else priority
+
+
+def set_default_priority(priority: int):
+    """
+    Set the priority class for calls made outside any priority_scope().
+
+    Batch processes such as evals call this once at startup, so calls from
+    their worker threads are classed correctly too.
+
+    Args:
+        priority: INTERACTIVE, BATCH or EVAL
+    """
+    global _default_priority
+    _default_priority = priority
+
+
+@contextmanager
+def priority_scope(priority: int):
+    """
+    Run the enclosed LLM and embedding calls at a priority class.
+
+    Args:
+        priority: INTERACTIVE, BATCH or EVAL
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket over requests and tokens per minute, admitting waiters by priority.
+
+    The bucket adapts to the server: it adopts the limits reported in
+    x-ratelimit-* response headers and halves its rate after a 429,
+    recovering gradually on success.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float,
+                 min_rate_fraction: float = 0.1):
+        """
+        Initialize the limiter.
+
+        Args:
+            name: Name of the limiter (the model), used as a metrics label
+            requests_per_minute: Requests allowed per minute
+            tokens_per_minute: Tokens allowed per minute
+            min_rate_fraction: Lowest fraction of the limits backoff may reduce the rate to
+        """
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.min_rate_fraction = min_rate_fraction
+        self.rate_fraction = 1.0
+
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def acquire(self, tokens: int, priority: Optional[int] = None, timeout: Optional[float] = None) -> float:
+        """
+        Wait until a request of the given size may be sent.
+
+        Args:
+            tokens: Estimated tokens of the request
+            priority: Priority class (defaults to current_priority())
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            DeadlineExceeded: If the request could not be admitted within timeout
+        """
+        priority = current_priority() if priority is None else priority
+        # A request larger than the whole bucket would wait forever
+        tokens = min(tokens, self.tokens_per_minute)
+        ticket = (priority, next(self._sequence))
+        started = time.monotonic()
+        give_up_at = None if timeout is None else started + timeout
+
+        with self._condition:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    self._refill()
+                    now = time.monotonic()
+                    if self._waiters[0] == ticket and now >= self._paused_until:
+                        if self._requests >= 1 and self._tokens >= tokens:
+                            self._requests -= 1
+                            self._tokens -= tokens
+                            break
+                        wait = self._time_until(tokens)
+                    else:
+                        wait = max(self._paused_until - now, 0.05)
+
+                    if give_up_at is not None:
+                        if now >= give_up_at:
+                            metrics.increment("llm.rate_limit_timeouts", model=self.name)
+                            raise DeadlineExceeded(f"Rate limiter for {self.name} did not admit the request in time")
+                        wait = min(wait, give_up_at - now)
+                    self._condition.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+        waited = time.monotonic() - started
+        metrics.observe("llm.queue_delay_s", waited, model=self.name, priority=PRIORITY_NAMES.get(priority, priority))
+        return waited
+
+    def on_success(self, headers: httpx.Headers):
+        """
+        Recover the rate after a successful response and adopt the server's limits.
+
+        Args:
+            headers: Response headers
+        """
+        with self._condition:
+            self.rate_fraction = min(1.0, self.rate_fraction + 0.05)
+            limit_requests = _header_number(headers, "x-ratelimit-limit-requests")
+            limit_tokens = _header_number(headers, "x-ratelimit-limit-tokens")
+            if limit_requests:
+                self.requests_per_minute = limit_requests
+            if limit_tokens:
+                self.tokens_per_minute = limit_tokens
+
+            # Never believe we have more room than the server says is left
+            remaining_requests = _header_number(headers, "x-ratelimit-remaining-requests")
+            remaining_tokens = _header_number(headers, "x-ratelimit-remaining-tokens")
+            if remaining_requests is not None:
+                self._requests = min(self._requests, remaining_requests)
+            if remaining_tokens is not None:
+                self._tokens = min(self._tokens, remaining_tokens)
+            self._condition.notify_all()
+
+    def on_rate_limited(self, retry_after: Optional[float]):
+        """
+        Slow down after a 429 response.
+
+        Args:
+            retry_after: Seconds the server asked to wait, if given
+        """
+        with self._condition:
+            self.rate_fraction = max(self.min_rate_fraction, self.rate_fraction / 2)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            metrics.increment("llm.rate_limited", model=self.name)
+
+    def _refill(self):
+        """Add the capacity accrued since the last refill."""
+        now = time.monotonic()
+        elapsed_minutes = (now - self._refilled_at) / 60
+        self._refilled_at = now
+        self._requests = min(
+            self.requests_per_minute,
+            self._requests + elapsed_minutes * self.requests_per_minute * self.rate_fraction
+        )
+        self._tokens = min(
+            self.tokens_per_minute,
+            self._tokens + elapsed_minutes * self.tokens_per_minute * self.rate_fraction
+        )
+
+    def _time_until(self, tokens: int) -> float:
+        """Seconds until the bucket holds one request and the given tokens."""
+        request_rate = self.requests_per_minute * self.rate_fraction / 60
+        token_rate = self.tokens_per_minute * self.rate_fraction / 60
+        wait_requests = max(0.0, 1 - self._requests) / request_rate
+        wait_tokens = max(0.0, tokens - self._tokens) / token_rate
+        return max(wait_requests, wait_tokens, 0.01)
+
+
+_limiters: Dict[str, TokenBucketLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model: str) -> TokenBucketLimiter:
+    """
+    Get the process-wide limiter for a model, creating it on first use.
+
+    Limits default to OPENAI_REQUESTS_PER_MINUTE and OPENAI_TOKENS_PER_MINUTE
+    and are replaced by the server's limits once a response reports them.
+
+    Args:
+        model: The model name
+
+    Returns:
+        The model's limiter
+    """
+    with _limiters_lock:
+        if model not in _limiters:
+            _limiters[model] = TokenBucketLimiter(
+                model,
+                requests_per_minute=float(os.environ.get("OPENAI_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE)),
+                tokens_per_minute=float(os.environ.get("OPENAI_TOKENS_PER_MINUTE", DEFAULT_TOKENS_PER_MINUTE))
+            )
+        return _limiters[model]
+
+
+def estimate_request_tokens(body: Dict) -> int:
+    """
+    Estimate the tokens an OpenAI request will consume.
+
+    Args:
+        body: The JSON request body
+
+    Returns:
+        Estimated prompt plus completion tokens
+    """
+    model = body.get("model", "gpt-4")
+    if "input" in body:
+        # Embeddings: strings, or token arrays when the client pre-tokenizes
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        if inputs and isinstance(inputs[0], int):
+            return len(inputs)
+        return sum(len(item) if isinstance(item, list) else count_tokens(item, model) for item in inputs)
+
+    prompt_tokens = 0
+    for message in body.get("messages", []):
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        prompt_tokens += count_tokens(content, model) + 4
+    completion_tokens = body.get("max_tokens") or body.get("max_completion_tokens") or DEFAULT_COMPLETION_TOKENS
+    return prompt_tokens + completion_tokens
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """
+    httpx transport that rate limits and retries OpenAI API requests.
+    """
+
+    def __init__(self, retry_policy: Optional[RetryPolicy] = None, transport: Optional[httpx.BaseTransport] = None):
+        """
+        Initialize the transport.
+
+        Args:
+            retry_policy: Retry policy (defaults to RetryPolicy())
+            transport: Underlying transport (defaults to a pooled httpx.HTTPTransport)
+        """
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            body = json.loads(request.read() or b"{}")
+        except ValueError:
+            body = {}
+        limiter = get_limiter(body.get("model", "default"))
+        tokens = estimate_request_tokens(body)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            limiter.acquire(tokens, timeout=remaining_timeout(operation="llm_rate_limit"))
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.TransportError as e:
+                # Connect errors, timeouts and dropped connections; the client does not retry them itself
+                if attempt > self.retry_policy.max_retries:
+                    metrics.increment("llm.retries_exhausted", model=limiter.name)
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                remaining = remaining_timeout(operation="llm_retry")
+                if remaining is not None and delay >= remaining:
+                    raise
+                metrics.increment("llm.retries", model=limiter.name, status=type(e).__name__)
+                time.sleep(delay)
+                continue
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                limiter.on_success(response.headers)
+                return response
+
+            retry_after = _retry_after(response.headers)
+            if response.status_code == 429:
+                limiter.on_rate_limited(retry_after)
+            if attempt > self.retry_policy.max_retries:
+                metrics.increment("llm.retries_exhausted", model=limiter.name)
+                return response
+
+            delay = self.retry_policy.delay(attempt, retry_after)
+            remaining = remaining_timeout(operation="llm_retry")
+            if remaining is not None and delay >= remaining:
+                return response
+            response.close()
+            metrics.increment("llm.retries", model=limiter.name, status=response.status_code)
+            time.sleep(delay)
+
+    def close(self):
+        self._transport.close()
+
+
+def _header_number(headers: httpx.Headers, name: str) -> Optional[float]:
+    """Parse a numeric header, returning None if absent or malformed."""
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _retry_after(headers: httpx.Headers) -> Optional[float]:
+    """Read the server's requested delay from Retry-After or retry-after-ms."""
+    retry_after_ms = _header_number(headers, "retry-after-ms")
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    return _header_number(headers, "retry-after")
@@ -0,0 +1,547 @@
+"""
+Local read replica of a Pinecone namespace.
+
+The sync tool bulk-exports every vector and its metadata into a snapshot
+on disk: normalized float32 vectors in a raw file that is memory-mapped,
+and texts and metadata in Parquet. ReplicatedVectorStore answers
+similarity searches from the snapshot with a local scan instead of a
+network round trip, while writes still go to Pinecone and are applied to
+the replica as they succeed.
+
+Each write is also appended to a log next to the snapshots, which load()
+replays, so writes made since the last export survive a restart. The
+replica is re-exported at start-up and then every REPLICA_SYNC_INTERVAL_S
+seconds, which is also how writes made by other processes reach it (or
+run `python -m utils.replica`).
+
+Usage:
+    python -m utils.replica --namespace competitors
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from langchain.schema import Document
+from utils.metrics import metrics
+from utils.quantized_store import matches_filter, normalize
+
+DEFAULT_REPLICA_DIR = ".fpc/replica"
+
+# Vectors per Pinecone fetch and upsert request
+FETCH_BATCH_SIZE = 100
+UPSERT_BATCH_SIZE = 100
+
+# Metadata key PineconeVectorStore keeps the chunk text under
+TEXT_KEY = "text"
+
+# Seconds between exports by default
+DEFAULT_SYNC_INTERVAL_S = 300.0
+
+# Write logs: writes since the current export began, and writes the export in progress covers
+WRITE_LOG = "writes.jsonl"
+EXPORTING_LOG = "writes.exporting.jsonl"
+
+
+def _fetched_vectors(response) -> Dict[str, Any]:
+    """Return the id -> vector mapping of a fetch response (object or dict)."""
+    return response["vectors"] if isinstance(response, dict) else response.vectors
+
+
+def _field(vector, name: str):
+    return vector[name] if isinstance(vector, dict) else getattr(vector, name)
+
+
+class PineconeReplica:
+    """
+    Memory-mapped snapshot of a Pinecone namespace, kept current by write-through updates.
+    """
+
+    def __init__(self, index, namespace: Optional[str] = None, path: str = DEFAULT_REPLICA_DIR):
+        """
+        Initialize the replica, loading the latest snapshot saved at path.
+
+        Args:
+            index: The Pinecone Index
+            namespace: The namespace to replicate
+            path: Directory holding the snapshots of this namespace
+        """
+        self.index = index
+        self.namespace = namespace
+        self.path = path
+
+        self._vectors: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._rows_by_id: Dict[str, int] = {}
+        # Rows written since the snapshot, appended after its rows
+        self._delta_vectors: List[np.ndarray] = []
+        self._delta_matrix: Optional[np.ndarray] = None
+        self._mask_cache: Dict[str, np.ndarray] = {}
+        self.manifest: Optional[Dict[str, Any]] = None
+
+        self._lock = threading.RLock()
+        self._export_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self.load()
+
+    @property
+    def ready(self) -> bool:
+        """Whether a snapshot is loaded and searches can be served locally."""
+        return self.manifest is not None
+
+    def _current_dir(self) -> Optional[str]:
+        """Return the directory of the current snapshot, if any."""
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return None
+        directory = os.path.join(self.path, name)
+        return directory if os.path.exists(os.path.join(directory, "manifest.json")) else None
+
+    def load(self) -> bool:
+        """
+        Load the current snapshot from disk.
+
+        Returns:
+            True if a snapshot was loaded
+        """
+        directory = self._current_dir()
+        if directory is None:
+            return False
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        count, dimensions = manifest["count"], manifest["dimensions"]
+        if count:
+            vectors = np.memmap(os.path.join(directory, "vectors.f32"), dtype=np.float32, mode="r",
+                                shape=(count, dimensions))
+        else:
+            vectors = np.zeros((0, dimensions), dtype=np.float32)
+        table = pd.read_parquet(os.path.join(directory, "metadata.parquet"))
+
+        with self._lock:
+            self._vectors = vectors
+            self._ids = table["id"].tolist()
+            self._texts = table["text"].tolist()
+            self._metadata = [json.loads(value) for value in table["metadata"]]
+            self._alive = np.ones(count, dtype=bool)
+            self._rows_by_id = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self._delta_vectors = []
+            self._delta_matrix = None
+            self._mask_cache.clear()
+            self.manifest = manifest
+            # Replay writes the snapshot may not include, oldest first
+            for name in (EXPORTING_LOG, WRITE_LOG):
+                for entry in self._read_log(os.path.join(self.path, name)):
+                    self._replay(entry)
+        return True
+
+    @staticmethod
+    def _read_log(path: str) -> Iterable[Dict[str, Any]]:
+        """Yield the entries of a write log, skipping a torn last line."""
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            return
+
+    def _replay(self, entry: Dict[str, Any]):
+        if entry["op"] == "upsert":
+            vectors = normalize(np.asarray(entry["vectors"], dtype=np.float32))
+            self._apply_upsert(entry["ids"], vectors, entry["texts"], entry["metadatas"])
+        elif entry["op"] == "delete":
+            self._apply_delete(entry["ids"])
+        else:
+            self._apply_delete(list(self._rows_by_id))
+
+    def _log(self, entry: Dict[str, Any]):
+        """Append a write to the log (called under the lock)."""
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, WRITE_LOG), "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        except OSError as e:
+            print(f"Error logging vector store replica write: {str(e)}")
+
+    def _rotate_log(self):
+        """Move the write log aside before an export (appending to one left by a failed export)."""
+        current = os.path.join(self.path, WRITE_LOG)
+        exporting = os.path.join(self.path, EXPORTING_LOG)
+        with self._lock:
+            if not os.path.exists(current):
+                return
+            if not os.path.exists(exporting):
+                os.replace(current, exporting)
+                return
+            with open(current) as src, open(exporting, "a") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(current)
+
+    def export(self) -> Dict[str, Any]:
+        """
+        Bulk-export the namespace into a new snapshot and switch to it.
+
+        Returns:
+            The manifest of the new snapshot
+        """
+        with self._export_lock:
+            started = time.perf_counter()
+            os.makedirs(self.path, exist_ok=True)
+            # Writes made from here on may be missing from the listing, so they stay in the log
+            self._rotate_log()
+            name = f"snapshot-{int(time.time() * 1000)}"
+            directory = os.path.join(self.path, name)
+            os.makedirs(directory, exist_ok=True)
+
+            ids, texts, metadatas = [], [], []
+            dimensions = None
+            try:
+                with open(os.path.join(directory, "vectors.f32"), "wb") as f:
+                    for page in self.index.list(namespace=self.namespace):
+                        page = list(page)
+                        for start in range(0, len(page), FETCH_BATCH_SIZE):
+                            batch = page[start:start + FETCH_BATCH_SIZE]
+                            fetched = _fetched_vectors(self.index.fetch(ids=batch, namespace=self.namespace))
+                            rows = [(chunk_id, fetched[chunk_id]) for chunk_id in batch if chunk_id in fetched]
+                            if not rows:
+                                continue
+                            vectors = normalize(np.array([_field(vector, "values") for _, vector in rows]))
+                            dimensions = dimensions or vectors.shape[1]
+                            f.write(vectors.tobytes())
+                            for chunk_id, vector in rows:
+                                metadata = dict(_field(vector, "metadata") or {})
+                                ids.append(chunk_id)
+                                texts.append(str(metadata.pop(TEXT_KEY, "")))
+                                metadatas.append(json.dumps(metadata))
+
+                pd.DataFrame({"id": ids, "text": texts, "metadata": metadatas}).to_parquet(
+                    os.path.join(directory, "metadata.parquet"), index=False
+                )
+                manifest = {
+                    "namespace": self.namespace,
+                    "count": len(ids),
+                    "dimensions": dimensions or (self.manifest or {}).get("dimensions", 0),
+                    "exported_at": time.time(),
+                }
+                with open(os.path.join(directory, "manifest.json"), "w") as f:
+                    json.dump(manifest, f)
+                # Switch atomically, so readers never see a partial snapshot
+                with open(os.path.join(self.path, "CURRENT.tmp"), "w") as f:
+                    f.write(name)
+                os.replace(os.path.join(self.path, "CURRENT.tmp"), os.path.join(self.path, "CURRENT"))
+            except BaseException:
+                shutil.rmtree(directory, ignore_errors=True)
+                raise
+
+            # The new snapshot covers the rotated writes
+            try:
+                os.remove(os.path.join(self.path, EXPORTING_LOG))
+            except FileNotFoundError:
+                pass
+            self.load()
+            self._remove_old_snapshots(name)
+            metrics.observe("vector_store.replica_export_s", time.perf_counter() - started)
+            return manifest
+
+    def _remove_old_snapshots(self, current: str):
+        """Delete snapshots other than the current one (open memory maps stay valid)."""
+        for name in os.listdir(self.path):
+            if name.startswith("snapshot-") and name != current:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def start(self, sync_interval_s: float = DEFAULT_SYNC_INTERVAL_S):
+        """
+        Export in the background now, to pick up writes made elsewhere since
+        the snapshot, and then every sync_interval_s seconds if it is positive.
+
+        Args:
+            sync_interval_s: Seconds between exports (0 to export only at start-up)
+        """
+        if self._thread is not None:
+            return
+
+        def loop():
+            while True:
+                try:
+                    self.export()
+                except Exception as e:
+                    print(f"Error exporting vector store replica: {str(e)}")
+                if sync_interval_s <= 0 and self.ready:
+                    return
+                time.sleep(sync_interval_s if sync_interval_s > 0 else 60.0)
+
+        self._thread = threading.Thread(target=loop, name="vector-replica-sync", daemon=True)
+        self._thread.start()
+
+    def upsert(self, ids: Sequence[str], vectors: Sequence[Sequence[float]], texts: Sequence[str],
+               metadatas: Sequence[Dict[str, Any]]):
+        """
+        Apply vectors written to Pinecone to the replica.
+
+        Args:
+            ids: Their IDs
+            vectors: The embeddings
+            texts: The chunk texts
+            metadatas: Their metadata (without the text)
+        """
+        ids, texts, metadatas = list(ids), list(texts), [dict(metadata) for metadata in metadatas]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._log({"op": "upsert", "ids": ids, "vectors": vectors.tolist(), "texts": texts,
+                       "metadatas": metadatas})
+            if self.ready:
+                self._apply_upsert(ids, normalize(vectors), texts, metadatas)
+
+    def delete(self, ids: Sequence[str]):
+        """
+        Apply deletions made in Pinecone to the replica.
+
+        Args:
+            ids: IDs of the deleted vectors
+        """
+        ids = list(ids)
+        with self._lock:
+            self._log({"op": "delete", "ids": ids})
+            if self.ready:
+                self._apply_delete(ids)
+
+    def clear(self):
+        """Empty the replica after every vector in the namespace was deleted."""
+        with self._lock:
+            self._log({"op": "clear"})
+            self._apply_delete(list(self._rows_by_id))
+
+    def _apply_upsert(self, ids: List[str], vectors: np.ndarray, texts: List[str], metadatas: List[Dict[str, Any]]):
+        self._apply_delete(ids)
+        start = len(self._ids)
+        self._delta_vectors.append(vectors)
+        self._delta_matrix = None
+        self._ids.extend(ids)
+        self._texts.extend(texts)
+        self._metadata.extend(dict(metadata) for metadata in metadatas)
+        self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+        for offset, chunk_id in enumerate(ids):
+            self._rows_by_id[chunk_id] = start + offset
+        self._mask_cache.clear()
+
+    def _apply_delete(self, ids: List[str]):
+        for chunk_id in ids:
+            row = self._rows_by_id.pop(chunk_id, None)
+            if row is not None:
+                self._alive[row] = False
+        self._mask_cache.clear()
+
+    def _filter_mask(self, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Return which rows are live and match a metadata filter."""
+        if not filter:
+            return self._alive
+        key = json.dumps(filter, sort_keys=True, default=str)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            matches = np.fromiter((matches_filter(metadata, filter) for metadata in self._metadata),
+                                  dtype=bool, count=len(self._metadata))
+            mask = self._mask_cache[key] = matches & self._alive
+        return mask
+
+    def search(self, embedding: Sequence[float], k: int = 4,
+               filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """
+        Find the stored chunks most similar to an embedding.
+
+        Args:
+            embedding: The query embedding
+            k: Number of results to return
+            filter: Optional Pinecone-style metadata filter
+
+        Returns:
+            (document, cosine similarity) pairs, most similar first
+        """
+        query = normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            mask = self._filter_mask(filter)
+            if self._delta_matrix is None and self._delta_vectors:
+                self._delta_matrix = np.concatenate(self._delta_vectors)
+            snapshot, delta = self._vectors, self._delta_matrix
+            texts, metadata = self._texts, self._metadata
+
+        scores = np.asarray(snapshot @ query, dtype=np.float32)
+        if delta is not None:
+            scores = np.concatenate([scores, delta @ query])
+        scores = np.where(mask[:len(scores)], scores, -np.inf)
+        live = int(np.count_nonzero(mask[:len(scores)]))
+        if live == 0:
+            return []
+        k = min(k, live)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (Document(page_content=texts[row], metadata=dict(metadata[row])), float(scores[row]))
+            for row in top
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Describe the replica.
+
+        Returns:
+            Dictionary with the live vector count, the rows added since the
+            snapshot and when the snapshot was exported
+        """
+        with self._lock:
+            snapshot_rows = len(self._vectors) if self._vectors is not None else 0
+            return {
+                "ready": self.ready,
+                "vectors": len(self._rows_by_id),
+                "delta_rows": len(self._ids) - snapshot_rows,
+                "exported_at": (self.manifest or {}).get("exported_at"),
+            }
+
+
+class ReplicatedVectorStore:
+    """
+    Pinecone vector store that reads from a local replica and writes through to Pinecone.
+
+    Texts are embedded once, upserted to Pinecone under the same metadata
+    layout as PineconeVectorStore, and applied to the replica. Searches
+    fall back to Pinecone until the replica has a snapshot.
+    """
+
+    def __init__(self, store, index, embedding, replica: PineconeReplica, namespace: Optional[str] = None):
+        """
+        Initialize the store.
+
+        Args:
+            store: The PineconeVectorStore, used for searches until the replica is ready
+            index: The Pinecone Index written to
+            embedding: Embeddings used to embed texts and queries
+            replica: The local replica
+            namespace: The Pinecone namespace
+        """
+        self.store = store
+        self.index = index
+        self.embedding = embedding
+        self.replica = replica
+        self.namespace = namespace
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.store, name)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[Dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        """
+        Embed texts, upsert them to Pinecone and apply them to the replica.
+
+        Args:
+            texts: The texts to add
+            metadatas: Optional metadata per text
+            ids: Optional IDs (generated if omitted)
+
+        Returns:
+            The IDs of the added texts
+        """
+        texts = list(texts)
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        metadatas = [dict(metadata) for metadata in metadatas] if metadatas else [{} for _ in texts]
+        vectors = self.embedding.embed_documents(texts)
+        for start in range(0, len(texts), UPSERT_BATCH_SIZE):
+            end = start + UPSERT_BATCH_SIZE
+            self.index.upsert(
+                vectors=[
+                    (chunk_id, list(vector), {**metadata, TEXT_KEY: text})
+                    for chunk_id, vector, text, metadata in zip(
+                        ids[start:end], vectors[start:end], texts[start:end], metadatas[start:end]
+                    )
+                ],
+                namespace=self.namespace
+            )
+        self.replica.upsert(ids, vectors, texts, metadatas)
+        return ids
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        """Embed documents, upsert them to Pinecone and apply them to the replica."""
+        return self.add_texts(
+            [doc.page_content for doc in documents], [doc.metadata for doc in documents], ids=ids
+        )
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: Optional[bool] = None, **kwargs):
+        """
+        Delete vectors from Pinecone and the replica.
+
+        Args:
+            ids: IDs to delete
+            delete_all: Delete every vector in the namespace
+        """
+        if delete_all:
+            self.index.delete(delete_all=True, namespace=self.namespace)
+            self.replica.clear()
+            return
+        ids = list(ids or [])
+        for start in range(0, len(ids), 1000):
+            self.index.delete(ids=ids[start:start + 1000], namespace=self.namespace)
+        self.replica.delete(ids)
+
+    def similarity_search_by_vector_with_score(self, embedding: Sequence[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None,
+                                               **kwargs) -> List[Tuple[Document, float]]:
+        """Search by embedding, returning documents with their cosine similarity."""
+        if not self.replica.ready:
+            metrics.increment("vector_store.replica_fallbacks")
+            return self.store.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)
+        started = time.perf_counter()
+        results = self.replica.search(embedding, k=k, filter=filter)
+        metrics.observe("vector_store.replica_search_s", time.perf_counter() - started)
+        return results
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs) -> List[Tuple[Document, float]]:
+        """Search by query text, returning documents with their cosine similarity."""
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          **kwargs) -> List[Document]:
+        """
+        Search for documents similar to a query, locally once the replica is ready.
+
+        Args:
+            query: The query text
+            k: Number of documents to return
+            filter: Optional metadata filter
+
+        Returns:
+            List of matching documents
+        """
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+
+if __name__ == "__main__":
+    from utils.vector_store import _pinecone_index
+
+    parser = argparse.ArgumentParser(description="Export a Pinecone namespace into the local read replica.")
+    parser.add_argument("--index", default=os.environ.get("PINECONE_INDEX_NAME"), help="Pinecone index name")
+    parser.add_argument("--namespace", default=None, help="Namespace to export (default namespace if omitted)")
+    parser.add_argument("--path", default=DEFAULT_REPLICA_DIR, help="Root directory of the replicas")
+    args = parser.parse_args()
+
+    replica = PineconeReplica(
+        _pinecone_index(args.index), args.namespace,
+        path=os.path.join(args.path, args.index, args.namespace or "default")
+    )
+    started = time.perf_counter()
+    manifest = replica.export()
+    print(f"Exported {manifest['count']} vectors ({manifest['dimensions']} dimensions) "
+          f"in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,237 @@
+"""
+Retry and circuit-breaker helpers for calls to external services.
+"""
+import random
+import threading
+import time
+from typing import Callable, Optional, Tuple, Type
+from utils.deadline import DeadlineExceeded, remaining_timeout
+from utils.metrics import metrics
+
+# Status codes worth retrying: the service is overloaded or failing, not the request wrong
+TRANSIENT_STATUS_CODES = (408, 409, 425, 429, 500, 502, 503, 504)
+
+# Connection and timeout errors of the HTTP clients used by the SDKs (matched by class name,
+# so the clients need not be importable here)
+TRANSIENT_ERROR_NAMES = {
+    "ConnectionError", "ConnectError", "ConnectTimeout", "ReadTimeout", "Timeout", "TimeoutError", "TransportError",
+    "ProtocolError", "MaxRetryError", "NewConnectionError", "ChunkedEncodingError", "RemoteDisconnected",
+    "APIConnectionError", "APITimeoutError", "URLError",
+}
+
+
+def error_status_code(error: BaseException) -> Optional[int]:
+    """Return the HTTP status code an SDK error carries, if any."""
+    for source in (error, getattr(error, "response", None)):
+        if source is None:
+            continue
+        for name in ("status_code", "status", "http_status", "code"):
+            value = source.get(name) if isinstance(source, dict) else getattr(source, name, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+    return None
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Decide whether a failed call may succeed if retried.
+
+    Connection errors, timeouts, 429 and 5xx responses are transient;
+    authentication errors, other 4xx responses and programming errors
+    (ValueError, TypeError, ...) are not.
+
+    Args:
+        error: The exception raised by the call
+
+    Returns:
+        True if the call should be retried and counted against the service
+    """
+    status = error_status_code(error)
+    if status is not None:
+        return status in TRANSIENT_STATUS_CODES
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter, honoring Retry-After.
+    """
+
+    def __init__(self, max_retries: int = 5, base_delay_s: float = 0.5, max_delay_s: float = 30.0):
+        """
+        Initialize the retry policy.
+
+        Args:
+            max_retries: Maximum retries after the first attempt
+            base_delay_s: Backoff before the first retry
+            max_delay_s: Maximum backoff between retries
+        """
+        self.max_retries = max_retries
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Compute the delay before a retry.
+
+        Args:
+            attempt: Number of attempts made so far (starting at 1)
+            retry_after: Seconds the server asked to wait, if given
+
+        Returns:
+            Seconds to wait
+        """
+        backoff = random.uniform(0, min(self.max_delay_s, self.base_delay_s * 2 ** (attempt - 1)))
+        return max(backoff, retry_after or 0.0)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is refused because its circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service for a while, then lets a trial call through.
+
+    Closed: calls pass. After failure_threshold consecutive failures the
+    circuit opens and calls fail fast for reset_timeout_s; the next call is
+    then a trial (half-open) that closes the circuit on success or opens it
+    again on failure. Only transient errors (see is_transient_error) count
+    as failures; a rejected request says nothing about the service's health.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout_s: float = 30.0):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            name: Name of the protected service, used as a metrics label
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout_s: Seconds the circuit stays open before a trial call
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Return 'closed', 'open' or 'half_open'."""
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout_s:
+                return "half_open"
+            return "open"
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """
+        Call fn through the circuit.
+
+        Args:
+            fn: The function to call
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The result of fn
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except DeadlineExceeded:
+            # Our own deadline says nothing about the service's health
+            self._release_trial()
+            raise
+        except Exception as e:
+            if is_transient_error(e):
+                self._record_failure()
+            else:
+                self._release_trial()
+            raise
+        self._record_success()
+        return result
+
+    def _before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout_s or self._trial_in_flight:
+                metrics.increment("circuit.rejected", circuit=self.name)
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+            self._trial_in_flight = True
+
+    def _release_trial(self):
+        with self._lock:
+            self._trial_in_flight = False
+
+    def _record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                metrics.increment("circuit.closed", circuit=self.name)
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def _record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    metrics.increment("circuit.opened", circuit=self.name)
+                self.opened_at = time.monotonic()
+
+
+def retry_call(fn: Callable, *args, policy: Optional[RetryPolicy] = None,
+               retry_on: Optional[Tuple[Type[BaseException], ...]] = None,
+               breaker: Optional[CircuitBreaker] = None, operation: str = "operation", **kwargs):
+    """
+    Call fn, retrying failures with backoff within the current deadline.
+
+    Args:
+        fn: The function to call
+        *args: Positional arguments for fn
+        policy: Retry policy (defaults to RetryPolicy(max_retries=3))
+        retry_on: Exception types that are retried (defaults to transient
+            errors only, see is_transient_error)
+        breaker: Optional circuit breaker every attempt goes through
+        operation: Name of the operation, for metrics
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        The result of fn
+
+    Raises:
+        The last error once retries are exhausted, CircuitOpenError if the
+        circuit is open, or DeadlineExceeded
+    """
+    policy = policy or RetryPolicy(max_retries=3)
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            if breaker is not None:
+                return breaker.call(fn, *args, **kwargs)
+            return fn(*args, **kwargs)
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            retryable = isinstance(e, retry_on) if retry_on is not None else is_transient_error(e)
+            if not retryable or attempt > policy.max_retries:
+                raise
+            delay = policy.delay(attempt)
+            remaining = remaining_timeout(operation=operation)
+            if remaining is not None and delay >= remaining:
+                raise
+            print(f"Retrying {operation} after error: {str(e)}")
+            metrics.increment("retry.attempts", operation=operation)
+            time.sleep(delay)
@@ -0,0 +1,122 @@
+"""
+Request coalescing for identical in-flight work.
+
+When several sessions ask for the same expensive computation at the same
+time (the same positioning request, the same competitor URL, the same text
+to embed), only the first caller runs it; the others wait for and share its
+result. Nothing is cached once the call finishes.
+"""
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Hashable
+from urllib.parse import urlsplit, urlunsplit
+from utils.deadline import DeadlineExceeded, remaining_timeout
+from utils.metrics import metrics
+
+_kb_generation = 0
+_kb_generation_lock = threading.Lock()
+
+
+def knowledge_base_generation() -> int:
+    """Return the current knowledge-base generation."""
+    return _kb_generation
+
+
+def bump_knowledge_base_generation() -> int:
+    """
+    Mark the knowledge base as changed, so work keyed on the previous
+    generation is no longer shared with new callers.
+
+    Returns:
+        The new generation
+    """
+    global _kb_generation
+    with _kb_generation_lock:
+        _kb_generation += 1
+        return _kb_generation
+
+
+def normalize_text(text: Any) -> str:
+    """Normalize free text for use in a key (case and whitespace insensitive)."""
+    return " ".join(str(text or "").lower().split())
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL for use in a key (host case, trailing slash and fragment ignored)."""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call among concurrent callers with the same key.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize the group.
+
+        Args:
+            name: Name of the group, used as a metrics label
+        """
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn, or wait for the identical call already in flight.
+
+        Args:
+            key: Identifies identical work
+            fn: The function to call
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The result of fn (shared by all callers with the same key)
+
+        Raises:
+            Whatever fn raised, in every caller that shared the call (except
+            the leader's DeadlineExceeded: a waiting caller with time left
+            then makes the call itself)
+            DeadlineExceeded: If a waiting caller's deadline expires first
+        """
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    self._calls[key] = future
+
+            if leader:
+                break
+            metrics.increment("single_flight.coalesced", group=self.name)
+            try:
+                return future.result(timeout=remaining_timeout(operation=f"single_flight:{self.name}"))
+            except DeadlineExceeded:
+                # The leader ran out of its own time; retry if ours has not (raises if it has)
+                remaining_timeout(operation=f"single_flight:{self.name}")
+                metrics.increment("single_flight.leader_timeouts", group=self.name)
+            except FutureTimeoutError:
+                if future.done():
+                    raise
+                raise DeadlineExceeded(f"Shared {self.name} call did not finish before the deadline")
+
+        metrics.increment("single_flight.leaders", group=self.name)
+        try:
+            result = fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        """Return the number of distinct calls currently running."""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,32 @@
+"""
+SQLite helpers for the local state kept under .fpc/.
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+
+
+@contextmanager
+def connect(path: str):
+    """
+    Open a connection that commits (or rolls back) and closes on exit.
+
+    Each call opens its own connection, so threads never share one.
+
+    Args:
+        path: Location of the database file (its directory is created if needed)
+
+    Yields:
+        The sqlite3 connection, returning rows as sqlite3.Row
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    try:
+        yield connection
+        connection.commit()
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
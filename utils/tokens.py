@@ -0,0 +1,53 @@
+"""
+Token counting helpers.
+
+Uses tiktoken when it is installed and falls back to a character-based
+estimate otherwise.
+"""
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+# Rough characters-per-token ratio for English text
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model: str = "gpt-4"):
+    """
+    Get the tiktoken encoding for a model.
+
+    Args:
+        model: Model name
+
+    Returns:
+        A tiktoken encoding, or None if tiktoken is unavailable
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """
+    Count the tokens in a text.
+
+    Args:
+        text: The text to count
+        model: Model whose tokenizer to use
+
+    Returns:
+        Number of tokens (estimated if tiktoken is unavailable)
+    """
+    if not text:
+        return 0
+    encoding = get_encoding(model)
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
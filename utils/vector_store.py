@@ -1,16 +1,339 @@
 from pinecone import Pinecone
 from langchain_pinecone import PineconeVectorStore
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.embeddings import Embeddings
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+import contextvars
 import os
+import threading
+import time
+import uuid
+from utils.deadline import DeadlineExceeded, remaining_timeout
+from utils.llm import embedding_model
+from utils.metrics import metrics
+from utils.resilience import CircuitBreaker, RetryPolicy, retry_call
+from utils.single_flight import SingleFlight
+
+# Supported values for the VECTOR_STORE_BACKEND environment variable
+VECTOR_STORE_BACKENDS = ("pinecone", "memory", "quantized")
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+class SingleFlightEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that shares identical in-flight embedding calls,
+    e.g. a speculative prefetch and the RAG tool embedding the same question.
+    """
+    
+    def __init__(self, embeddings: Embeddings):
+        """
+        Initialize the wrapper.
+        
+        Args:
+            embeddings: The embeddings to delegate to
+        """
+        self.embeddings = embeddings
+        self._flight = SingleFlight("embeddings")
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self._flight.do(("query", text), self.embeddings.embed_query, text)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._flight.do(("documents", tuple(texts)), self.embeddings.embed_documents, texts)
+
+# Shared by all hedged queries in the process
+_query_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="vector-query")
+
+class ResilientVectorStore:
+    """
+    Vector store wrapper that retries calls through a circuit breaker and
+    can hedge similarity searches.
+    
+    A hedged search sends a duplicate query when the first has not answered
+    within the recent p95 latency and returns whichever answer arrives
+    first. Hedges are capped at max_hedge_rate of all searches, so a
+    struggling backend never sees more than that much extra load.
+    
+    Other attributes and methods are passed through to the wrapped store.
+    """
+    
+    def __init__(self, store, hedge: bool = True, max_hedge_rate: float = 0.05,
+                 min_hedge_delay_s: float = 0.02, max_hedge_delay_s: float = 2.0, min_samples: int = 20,
+                 retry_policy: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None,
+                 scope: str = "default", persistent: bool = True):
+        """
+        Initialize the wrapper.
+        
+        Args:
+            store: The vector store to wrap
+            hedge: Send hedged duplicate queries for slow searches
+            max_hedge_rate: Maximum fraction of searches that may be hedged
+            min_hedge_delay_s: Lower bound of the hedge delay
+            max_hedge_delay_s: Upper bound of the hedge delay
+            min_samples: Latency samples needed before hedging starts
+            retry_policy: Retry policy for failed calls (defaults to 3 retries)
+            breaker: Circuit breaker shared by reads and writes
+            scope: Identifies the index and namespace behind the store, for
+                local state kept about its contents (e.g. the dedup index)
+            persistent: Whether the store's contents outlive the process
+        """
+        self.store = store
+        self.scope = scope
+        self.persistent = persistent
+        self.hedge = hedge
+        self.max_hedge_rate = max_hedge_rate
+        self.min_hedge_delay_s = min_hedge_delay_s
+        self.max_hedge_delay_s = max_hedge_delay_s
+        self.min_samples = min_samples
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=3, base_delay_s=0.2, max_delay_s=5.0)
+        self.breaker = breaker or CircuitBreaker("vector_store")
+        
+        self._latencies = deque(maxlen=500)
+        self._searches = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.store, name)
+    
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List:
+        """
+        Search for documents similar to a query, with retries and hedging.
+        
+        Args:
+            query: The query text
+            k: Number of documents to return
+            **kwargs: Additional search arguments (e.g. filter)
+            
+        Returns:
+            List of matching documents
+        """
+        return retry_call(
+            self._search, query, k, kwargs,
+            policy=self.retry_policy, breaker=self.breaker, operation="vector_search"
+        )
+    
+    def add_documents(self, documents: List, **kwargs) -> List[str]:
+        """
+        Upsert documents with retries.
+        
+        IDs are assigned up front so a retried upsert overwrites rather
+        than duplicates the chunks an earlier attempt may have written.
+        
+        Args:
+            documents: The documents to add
+            **kwargs: Additional arguments for the store
+            
+        Returns:
+            The IDs of the added documents
+        """
+        kwargs.setdefault("ids", [uuid.uuid4().hex for _ in documents])
+        return retry_call(
+            self.store.add_documents, documents=documents,
+            policy=self.retry_policy, breaker=self.breaker, operation="vector_upsert", **kwargs
+        )
+    
+    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict]] = None, **kwargs) -> List[str]:
+        """
+        Upsert texts with retries (see add_documents).
+        
+        Args:
+            texts: The texts to add
+            metadatas: Optional metadata per text
+            **kwargs: Additional arguments for the store
+            
+        Returns:
+            The IDs of the added texts
+        """
+        texts = list(texts)
+        kwargs.setdefault("ids", [uuid.uuid4().hex for _ in texts])
+        return retry_call(
+            self.store.add_texts, texts=texts, metadatas=metadatas,
+            policy=self.retry_policy, breaker=self.breaker, operation="vector_upsert", **kwargs
+        )
+    
+    def delete(self, *args, **kwargs):
+        """Delete vectors with retries; arguments are passed to the wrapped store."""
+        return retry_call(
+            self.store.delete, *args,
+            policy=self.retry_policy, breaker=self.breaker, operation="vector_delete", **kwargs
+        )
+    
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Compute how long to wait before hedging a search.
+        
+        Returns:
+            The recent p95 search latency (clamped), or None if hedging is off,
+            there are too few samples, or the hedge budget is used up
+        """
+        if not self.hedge:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            if self._hedges + 1 > self.max_hedge_rate * self._searches:
+                return None
+            latencies = sorted(self._latencies)
+        p95 = latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))]
+        return min(self.max_hedge_delay_s, max(self.min_hedge_delay_s, p95))
+    
+    def _timed_search(self, query: str, k: int, kwargs: Dict[str, Any]) -> List:
+        """Run one search against the store and record its latency."""
+        started = time.perf_counter()
+        results = self.store.similarity_search(query, k=k, **kwargs)
+        latency = time.perf_counter() - started
+        with self._lock:
+            self._latencies.append(latency)
+        metrics.observe("vector_store.search_s", latency)
+        return results
+    
+    def _search(self, query: str, k: int, kwargs: Dict[str, Any]) -> List:
+        """Run a search, hedging it if it is slower than usual."""
+        with self._lock:
+            self._searches += 1
+            if self._searches > 10000:
+                # Keep the hedge budget relative to recent traffic
+                self._searches //= 2
+                self._hedges //= 2
+        
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed_search(query, k, kwargs)
+        
+        timeout = remaining_timeout(operation="vector_search")
+        give_up_at = None if timeout is None else time.perf_counter() + timeout
+        
+        def submit():
+            return _query_pool.submit(contextvars.copy_context().run, self._timed_search, query, k, kwargs)
+        
+        primary = submit()
+        pending = [primary]
+        done, _ = wait(pending, timeout=delay if timeout is None else min(delay, timeout))
+        if not done:
+            with self._lock:
+                self._hedges += 1
+            metrics.increment("vector_store.hedges")
+            pending.append(submit())
+        
+        error = None
+        while pending:
+            remaining = None if give_up_at is None else max(0.0, give_up_at - time.perf_counter())
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                metrics.increment("deadline.timeouts", operation="vector_search")
+                raise DeadlineExceeded("vector_search did not finish before the deadline")
+            for future in done:
+                pending.remove(future)
+                if future.exception() is None:
+                    if future is not primary:
+                        metrics.increment("vector_store.hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+_pinecone_indexes: Dict[str, Any] = {}
+_stores: Dict[tuple, ResilientVectorStore] = {}
+_stores_lock = threading.Lock()
+
+def _pinecone_index(index_name: str):
+    """
+    Get the process-wide Pinecone index client, reusing its connection pool.
+    
+    Args:
+        index_name: Name of the Pinecone index
+        
+    Returns:
+        The Pinecone Index
+    """
+    if index_name not in _pinecone_indexes:
+        pc = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
+        _pinecone_indexes[index_name] = pc.Index(
+            index_name,
+            pool_threads=int(os.environ.get("PINECONE_POOL_THREADS", 8))
+        )
+    return _pinecone_indexes[index_name]
 
 class VectorStoreManager:
     @staticmethod
-    def initialize():
-        pc = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
+    def initialize(namespace=None):
+        """
+        Initialize the configured vector store backend.
+        
+        The store is created once per process for each backend and namespace
+        and shared by every caller. Set VECTOR_STORE_HEDGING=0 to disable
+        hedged searches (on by default for Pinecone).
+        
+        EMBEDDING_DIMENSIONS shortens embeddings with the model's dimensions
+        parameter (the Pinecone index must have that dimension). The
+        'quantized' backend keeps vectors locally under .fpc/vectors, scanning
+        int8 or binary codes (VECTOR_QUANTIZATION, default int8) and
+        re-ranking candidates with the full-precision vectors.
+        
+        With VECTOR_STORE_REPLICA=1, Pinecone searches are served from a
+        local replica under .fpc/replica, exported at start-up and every
+        REPLICA_SYNC_INTERVAL_S seconds (default 300, 0 for start-up only);
+        writes still go to Pinecone and are applied to the replica and its
+        write log.
+        
+        Args:
+            namespace: Optional namespace to isolate documents in (Pinecone only)
+            
+        Returns:
+            An initialized vector store instance
+        """
+        backend = os.environ.get("VECTOR_STORE_BACKEND", "pinecone").lower()
+        if backend not in VECTOR_STORE_BACKENDS:
+            raise ValueError(f"Unknown VECTOR_STORE_BACKEND '{backend}', expected one of {VECTOR_STORE_BACKENDS}")
         index_name = os.environ.get("PINECONE_INDEX_NAME")
-        index = pc.Index(index_name)
-        embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-large",
-            api_key=os.environ.get("OPENAI_API_KEY")
-        )
-        return PineconeVectorStore(index=index, embedding=embeddings) 
\ No newline at end of file
+        
+        with _stores_lock:
+            key = (backend, index_name, namespace)
+            if key not in _stores:
+                _stores[key] = VectorStoreManager._create(backend, index_name, namespace)
+            return _stores[key]
+    
+    @staticmethod
+    def _create(backend: str, index_name: Optional[str], namespace: Optional[str]) -> ResilientVectorStore:
+        """Create a vector store for a backend, wrapped with retries and hedging."""
+        dimensions = os.environ.get("EMBEDDING_DIMENSIONS")
+        model_kwargs = {"dimensions": int(dimensions)} if dimensions else {}
+        embeddings = SingleFlightEmbeddings(embedding_model(EMBEDDING_MODEL, **model_kwargs))
+        
+        if backend == "memory":
+            from langchain_core.vectorstores import InMemoryVectorStore
+            # Local searches gain nothing from hedging
+            return ResilientVectorStore(
+                InMemoryVectorStore(embedding=embeddings), hedge=False,
+                scope=f"memory:{namespace or ''}", persistent=False
+            )
+        
+        if backend == "quantized":
+            from utils.quantized_store import DEFAULT_STORE_DIR, QuantizedVectorStore
+            store = QuantizedVectorStore(
+                embeddings,
+                path=os.path.join(DEFAULT_STORE_DIR, namespace or "default"),
+                quantization=os.environ.get("VECTOR_QUANTIZATION", "int8").lower()
+            )
+            return ResilientVectorStore(store, hedge=False, scope=f"quantized:{namespace or ''}")
+        
+        index = _pinecone_index(index_name)
+        store = PineconeVectorStore(index=index, embedding=embeddings, namespace=namespace)
+        scope = f"pinecone:{index_name}:{namespace or ''}"
+        
+        if os.environ.get("VECTOR_STORE_REPLICA", "0") == "1":
+            from utils.replica import (
+                DEFAULT_REPLICA_DIR, DEFAULT_SYNC_INTERVAL_S, PineconeReplica, ReplicatedVectorStore
+            )
+            replica = PineconeReplica(
+                index, namespace, path=os.path.join(DEFAULT_REPLICA_DIR, index_name, namespace or "default")
+            )
+            replica.start(sync_interval_s=float(os.environ.get("REPLICA_SYNC_INTERVAL_S", DEFAULT_SYNC_INTERVAL_S)))
+            # Local reads gain nothing from hedging
+            return ResilientVectorStore(
+                ReplicatedVectorStore(store, index, embeddings, replica, namespace), hedge=False, scope=scope
+            )
+        
+        hedge = os.environ.get("VECTOR_STORE_HEDGING", "1") != "0"
+        return ResilientVectorStore(store, hedge=hedge, scope=scope)